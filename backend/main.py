@@ -10,7 +10,7 @@ from contextlib import asynccontextmanager # Import from standard library
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, SecretStr # Added SecretStr
 from typing import Optional, Dict, Any, List # Added List
-from pythonjsonlogger import jsonlogger
+from pythonjsonlogger.orjson import OrjsonFormatter # 以 orjson 序列化日誌，結構化 props 較大時編碼明顯較快
 
 import google.generativeai as genai
 
@@ -19,7 +19,7 @@ from .services.google_drive_service import GoogleDriveService
 from .services.data_access_layer import DataAccessLayer
 from .services.parsing_service import ParsingService
 from .services.gemini_service import GeminiService
-from .services.report_ingestion_service import ReportIngestionService
+from .services.report_ingestion_service import ReportIngestionService, TEMP_DOWNLOAD_DIR
 from .services.analysis_service import AnalysisService # Added AnalysisService
 from .scheduler_tasks import trigger_report_ingestion_task
 
@@ -138,7 +138,7 @@ async def lifespan(app: FastAPI):
     root_logger.setLevel(logging.INFO)
     for handler in root_logger.handlers[:]: root_logger.removeHandler(handler)
     log_handler = logging.StreamHandler()
-    formatter = jsonlogger.JsonFormatter(
+    formatter = OrjsonFormatter(
         fmt="%(asctime)s %(levelname)s %(name)s %(module)s %(funcName)s %(lineno)d %(message)s",
         rename_fields={"asctime": "timestamp", "levelname": "level", "name": "logger_name"}
     )
@@ -179,9 +179,7 @@ async def lifespan(app: FastAPI):
         app_state["critical_config_missing_drive_folders"] = True
     else:
         logger.info(f"Google Drive 資料夾 ID 已從設定讀取。", extra={"props": {"WOLF_IN_FOLDER_ID": settings.WOLF_IN_FOLDER_ID, "WOLF_PROCESSED_FOLDER_ID": settings.WOLF_PROCESSED_FOLDER_ID }})
-    SERVICE_DIR_MAIN = os.path.dirname(os.path.abspath(__file__))
-    BACKEND_DIR_MAIN = SERVICE_DIR_MAIN
-    app_state["temp_download_dir"] = os.path.join(BACKEND_DIR_MAIN, 'data', 'temp_downloads')
+    app_state["temp_download_dir"] = TEMP_DOWNLOAD_DIR # 與 ReportIngestionService 實際使用的暫存目錄一致 (可由 INGEST_TEMP_DIR 設定)
     os.makedirs(app_state["temp_download_dir"], exist_ok=True)
     logger.info(f"應用程式暫存下載目錄設定於: {app_state['temp_download_dir']}", extra={"props": {"temp_dir": app_state['temp_download_dir']}})
     base_data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
@@ -256,6 +254,10 @@ async def lifespan(app: FastAPI):
         logger.info("正在關閉 APScheduler 排程器...")
         app_state["scheduler"].shutdown()
         logger.info("APScheduler 排程器已關閉。")
+    if app_state.get("drive_service"):
+        await app_state["drive_service"].close()
+    if app_state.get("dal"):
+        await app_state["dal"].close_connections()
     logger.info("後端應用程式已關閉。")
 
 app = FastAPI(
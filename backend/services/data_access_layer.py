@@ -7,6 +7,17 @@ from typing import Optional, Dict, Any, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 報告處理完成時一次寫入所有最終欄位；參數為 None 的欄位保留原值
+REPORT_FINAL_UPDATE_QUERY = (
+    "UPDATE reports SET status = COALESCE(?, status), analysis_json = COALESCE(?, analysis_json), "
+    "metadata = COALESCE(?, metadata), processed_at = CURRENT_TIMESTAMP WHERE id = ?"
+)
+# 新增報告的插入語句，insert_report_data 與 batch_insert_reports 共用
+REPORT_INSERT_QUERY = (
+    "INSERT INTO reports (original_filename, content, source_path, metadata, status, content_hash) VALUES (?, ?, ?, ?, ?, ?)"
+)
+SOURCE_PATH_QUERY_CHUNK = 500 # filter_existing_source_paths 單次 IN 查詢的參數數量 (低於舊版 SQLite 的 999 上限)
+
 class DataAccessLayer:
     """
     資料存取層 (DataAccessLayer) 類別。
@@ -21,7 +32,7 @@ class DataAccessLayer:
         self.reports_db_path = reports_db_path
         self.prompts_db_path = prompts_db_path
         self._connections = {}
-        self._memory_db_locks: Dict[str, asyncio.Lock] = {}
+        self._db_locks: Dict[str, asyncio.Lock] = {}
         logger.info(
             f"DataAccessLayer 配置使用報告資料庫於: '{self.reports_db_path}' 及提示詞資料庫於: '{self.prompts_db_path}'.",
             extra={"props": {"service_name": "DataAccessLayer", "status": "configured", "reports_db": reports_db_path, "prompts_db": prompts_db_path}}
@@ -34,64 +45,56 @@ class DataAccessLayer:
                     os.makedirs(db_dir, exist_ok=True)
                     logger.info(f"已確認或建立資料庫目錄: {db_dir}")
 
+    def _db_lock(self, db_path: str) -> asyncio.Lock:
+        """返回序列化該資料庫持久連接存取的鎖 (必要時建立)。"""
+        lock = self._db_locks.get(db_path)
+        if lock is None:
+            lock = self._db_locks[db_path] = asyncio.Lock()
+        return lock
+
     async def _get_connection(self, db_path: str) -> aiosqlite.Connection:
-        """取得並配置一個資料庫連接。"""
-        if db_path == ":memory:":
-            if db_path not in self._connections:
-                conn = await aiosqlite.connect(db_path)
-                conn.row_factory = aiosqlite.Row
-                self._connections[db_path] = conn
-                self._memory_db_locks[db_path] = asyncio.Lock()
-            return self._connections[db_path]
-        else:
+        """
+        取得該資料庫的持久連接 (首次使用時建立並配置)；呼叫端須持有 `_db_lock(db_path)`。
+
+        每個資料庫只維持一條連接，而非每次查詢重新連接：省去每次建立連接 (及 aiosqlite 的背景執行緒) 的成本，
+        且 sqlite3 的預備語句快取以連接為單位，重複執行的相同 SQL 只需解析與規劃一次。
+        """
+        conn = self._connections.get(db_path)
+        if conn is None:
             conn = await aiosqlite.connect(db_path)
             conn.row_factory = aiosqlite.Row
-            return conn
+            self._connections[db_path] = conn
+        return conn
 
     async def close_connections(self) -> None:
-        """關閉所有由 DAL 管理的持久化 :memory: 資料庫連接。"""
+        """關閉所有由 DAL 管理的持久化資料庫連接。"""
         for conn in self._connections.values():
             if conn:
                 await conn.close()
         self._connections.clear()
-        logger.info("所有持久化記憶體資料庫連接已關閉。")
+        logger.info("所有持久化資料庫連接已關閉。")
 
     async def _execute_query(self, db_path: str, query: str, params: Tuple[Any, ...] = (), fetch_one: bool = False, fetch_all: bool = False, commit: bool = False) -> Optional[Any]:
-        """內部輔助方法，用於執行 SQL 查詢並處理連接。"""
-        is_memory_db = (db_path == ":memory:")
-        conn_context = None
-
+        """內部輔助方法，於該資料庫的持久連接上執行 SQL 查詢；失敗時回滾未提交的交易，避免其殘留於共用連接。"""
         try:
-            if is_memory_db:
-                lock = self._memory_db_locks.get(db_path)
-                if not lock:
-                    raise RuntimeError(f"嚴重錯誤：找不到用於記憶體資料庫 '{db_path}' 的鎖。")
-
-                async with lock:
-                    conn = await self._get_connection(db_path)
-                    cursor = await conn.execute(query, params)
-                    if commit:
-                        await conn.commit()
-                        return cursor.lastrowid if query.strip().upper().startswith("INSERT") else cursor.rowcount
-
-                    if fetch_one:
-                        return await cursor.fetchone()
-                    if fetch_all:
-                        return await cursor.fetchall()
-                    return None
-            else: # File-based DB
-                async with aiosqlite.connect(db_path) as conn:
-                    conn.row_factory = aiosqlite.Row
-                    cursor = await conn.execute(query, params)
-                    if commit:
-                        await conn.commit()
-                        return cursor.lastrowid if query.strip().upper().startswith("INSERT") else cursor.rowcount
-
-                    if fetch_one:
-                        return await cursor.fetchone()
-                    if fetch_all:
-                        return await cursor.fetchall()
-                    return None
+            async with self._db_lock(db_path):
+                conn = await self._get_connection(db_path)
+                try:
+                    # 以 async with 在返回前關閉游標，未讀完的 SELECT 不會在共用連接上持續佔用讀取鎖
+                    async with conn.execute(query, params) as cursor:
+                        if commit:
+                            await conn.commit()
+                            return cursor.lastrowid if query.strip().upper().startswith("INSERT") else cursor.rowcount
+
+                        if fetch_one:
+                            return await cursor.fetchone()
+                        if fetch_all:
+                            return await cursor.fetchall()
+                        return None
+                except Exception:
+                    if conn.in_transaction:
+                        await conn.rollback()
+                    raise
         except Exception as e_query:
             logger.error(
                 f"執行資料庫查詢失敗。DB: '{db_path}', Query: '{query[:100]}...'",
@@ -100,6 +103,38 @@ class DataAccessLayer:
             )
             raise
 
+    async def _execute_batch(self, db_path: str, query: str, params_seq: List[Tuple[Any, ...]], collect_ids: bool = False) -> Any:
+        """
+        內部輔助方法，在該資料庫的持久連接上以單一交易與多組參數執行同一語句，整批只提交一次。
+
+        `collect_ids` 為 True 時逐筆執行並收集每筆 INSERT 的 `lastrowid` (sqlite3 的 `executemany` 不提供各筆的 ID)，
+        返回 ID 列表；否則以 `executemany` 執行並返回受影響的總列數。任何一筆失敗時整批回滾。
+        """
+        try:
+            async with self._db_lock(db_path):
+                conn = await self._get_connection(db_path)
+                try:
+                    if collect_ids:
+                        result = []
+                        for params in params_seq:
+                            async with conn.execute(query, params) as cursor:
+                                result.append(cursor.lastrowid)
+                    else:
+                        async with conn.executemany(query, params_seq) as cursor:
+                            result = cursor.rowcount
+                    await conn.commit()
+                    return result
+                except Exception:
+                    await conn.rollback()
+                    raise
+        except Exception as e_query:
+            logger.error(
+                f"批次執行資料庫語句失敗。DB: '{db_path}', Query: '{query[:100]}...', 筆數: {len(params_seq)}",
+                exc_info=True,
+                extra={"props": {"db_path": db_path, "query_snippet": query[:100], "batch_size": len(params_seq), "error": str(e_query)}}
+            )
+            raise
+
     async def initialize_databases(self) -> None:
         """初始化所有配置的資料庫和必要的資料表。"""
         await self._create_reports_table()
@@ -117,10 +152,18 @@ class DataAccessLayer:
             processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             status TEXT DEFAULT 'pending',
             metadata TEXT,
-            analysis_json TEXT
+            analysis_json TEXT,
+            content_hash TEXT
         );
         """
         await self._execute_query(self.reports_db_path, query, commit=True)
+        # 舊版資料庫的 reports 表沒有 content_hash 欄位，於此補上
+        columns = await self._execute_query(self.reports_db_path, "PRAGMA table_info(reports)", fetch_all=True)
+        if "content_hash" not in {column["name"] for column in columns or []}:
+            await self._execute_query(self.reports_db_path, "ALTER TABLE reports ADD COLUMN content_hash TEXT", commit=True)
+        await self._execute_query(
+            self.reports_db_path, "CREATE INDEX IF NOT EXISTS idx_reports_content_hash ON reports (content_hash)", commit=True
+        )
         logger.info(f"'reports' 表已在 '{self.reports_db_path}' 中確認/創建。")
 
     async def _create_prompts_table(self) -> None:
@@ -141,12 +184,11 @@ class DataAccessLayer:
     # ... (其餘的 CRUD 方法，如 insert_report_data, get_report_by_id 等維持不變) ...
     async def insert_report_data(self, original_filename: str, content: Optional[str],
                                  source_path: str, metadata: Optional[Dict[str, Any]] = None,
-                                 status: str = '已擷取待處理') -> Optional[int]:
+                                 status: str = '已擷取待處理', content_hash: Optional[str] = None) -> Optional[int]:
         metadata_str = json.dumps(metadata, ensure_ascii=False) if metadata else None
-        query = "INSERT INTO reports (original_filename, content, source_path, metadata, status) VALUES (?, ?, ?, ?, ?)"
         try:
-            last_row_id = await self._execute_query(self.reports_db_path, query,
-                                                (original_filename, content, source_path, metadata_str, status),
+            last_row_id = await self._execute_query(self.reports_db_path, REPORT_INSERT_QUERY,
+                                                (original_filename, content, source_path, metadata_str, status, content_hash),
                                                 commit=True)
             logger.info(f"新報告 '{original_filename}' 已插入到 reports 資料庫，ID: {last_row_id}。")
             return last_row_id
@@ -154,6 +196,87 @@ class DataAccessLayer:
             logger.error(f"插入報告 '{original_filename}' 失敗: {e}")
             return None
 
+    async def batch_insert_reports(self, reports: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        在單一交易中插入多筆報告，取代逐筆呼叫 `insert_report_data` 時每筆各自連接與提交的開銷。
+
+        Args:
+            reports (List[Dict[str, Any]]): 每筆報告的欄位字典，鍵與 `insert_report_data` 的參數相同：
+                `original_filename`、`content`、`source_path`，以及可選的 `metadata`、`status` 和 `content_hash`。
+
+        Returns:
+            List[Optional[int]]: 與輸入順序一致的新報告 ID 列表。整批失敗時 (已回滾) 每一項皆為 None。
+        """
+        if not reports:
+            return []
+        params_seq = [
+            (
+                report["original_filename"], report.get("content"), report["source_path"],
+                json.dumps(report["metadata"], ensure_ascii=False) if report.get("metadata") else None,
+                report.get("status", '已擷取待處理'), report.get("content_hash"),
+            )
+            for report in reports
+        ]
+        try:
+            report_ids = await self._execute_batch(self.reports_db_path, REPORT_INSERT_QUERY, params_seq, collect_ids=True)
+            logger.info(
+                f"已批次插入 {len(report_ids)} 筆報告到 reports 資料庫。",
+                extra={"props": {"operation": "batch_insert_reports", "batch_size": len(report_ids), "db_operation_status": "success"}}
+            )
+            return report_ids
+        except Exception as e:
+            logger.error(f"批次插入 {len(reports)} 筆報告失敗: {e}")
+            return [None] * len(reports)
+
+    async def batch_update_report_status(self, updates: List[Dict[str, Any]]) -> int:
+        """
+        以單一 `executemany` 更新多筆報告的狀態、分析結果與 metadata，整批只提交一次。
+
+        Args:
+            updates (List[Dict[str, Any]]): 每項包含 `report_id`，以及可選的 `status`、`analysis_json` 和 `metadata`。
+                省略 (或為 None) 的欄位保留資料庫中的原值；提供的 `metadata` 會整體取代原有內容。
+
+        Returns:
+            int: 受影響的總列數。失敗時 (已回滾) 返回 0。
+        """
+        if not updates:
+            return 0
+        params_seq = [
+            self._final_update_params(update["report_id"], update.get("status"), update.get("analysis_json"), update.get("metadata"))
+            for update in updates
+        ]
+        try:
+            return await self._execute_batch(self.reports_db_path, REPORT_FINAL_UPDATE_QUERY, params_seq)
+        except Exception as e:
+            logger.error(f"批次更新 {len(updates)} 筆報告狀態失敗: {e}")
+            return 0
+
+    @staticmethod
+    def _final_update_params(report_id: int, status: Optional[str], analysis_json: Optional[str], metadata: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+        """組出 `REPORT_FINAL_UPDATE_QUERY` 的參數；metadata 字典序列化為 JSON。"""
+        metadata_str = json.dumps(metadata, ensure_ascii=False) if metadata is not None else None
+        return (status, analysis_json, metadata_str, report_id)
+
+    async def finalize_report(self, report_id: int, status: Optional[str], analysis_json: Optional[str] = None,
+                              metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        以單一 UPDATE 寫入報告處理完成時的狀態、AI 分析結果與 metadata，
+        取代依序呼叫 `update_report_analysis`、`update_report_status` 與 `update_report_metadata` 的多次寫入。
+        為 None 的欄位保留資料庫中的原值；提供的 `metadata` 會整體取代原有內容。
+
+        Returns:
+            bool: 若有報告被更新則返回 True；報告不存在或發生錯誤時返回 False。
+        """
+        try:
+            rows_affected = await self._execute_query(
+                self.reports_db_path, REPORT_FINAL_UPDATE_QUERY,
+                self._final_update_params(report_id, status, analysis_json, metadata), commit=True
+            )
+            return rows_affected > 0
+        except Exception as e:
+            logger.error(f"寫入報告 ID {report_id} 的最終處理結果失敗: {e}")
+            return False
+
     async def get_report_by_id(self, report_id: int) -> Optional[Dict[str, Any]]:
         query = "SELECT * FROM reports WHERE id = ?"
         try:
@@ -212,6 +335,60 @@ class DataAccessLayer:
             logger.error(f"檢查報告是否存在 (source_path: {source_path}) 時失敗: {e}")
             return False
 
+    async def filter_existing_source_paths(self, source_paths: List[str]) -> set:
+        """
+        找出給定來源路徑中已存在於 reports 資料庫的項目，以少數幾次 `IN (...)` 查詢取代逐一呼叫
+        `check_report_exists_by_source_path`。路徑按 `SOURCE_PATH_QUERY_CHUNK` 分段查詢，避免超過 SQLite 的參數數量上限。
+
+        Args:
+            source_paths (List[str]): 要檢查的來源路徑列表。
+
+        Returns:
+            set: 已存在的來源路徑集合。查詢失敗時返回空集合 (與 `check_report_exists_by_source_path` 失敗時視為不存在一致)。
+        """
+        unique_paths = list(dict.fromkeys(source_paths))
+        existing = set()
+        try:
+            for start in range(0, len(unique_paths), SOURCE_PATH_QUERY_CHUNK):
+                chunk = unique_paths[start:start + SOURCE_PATH_QUERY_CHUNK]
+                placeholders = ", ".join("?" for _ in chunk)
+                query = f"SELECT DISTINCT source_path FROM reports WHERE source_path IN ({placeholders})"
+                rows = await self._execute_query(self.reports_db_path, query, tuple(chunk), fetch_all=True)
+                existing.update(row["source_path"] for row in rows or [])
+            return existing
+        except Exception as e:
+            logger.error(f"批次檢查 {len(unique_paths)} 個報告來源是否存在時失敗: {e}")
+            return set()
+
+    async def get_analyses_by_content_hash(self, content_hashes: List[str]) -> Dict[str, str]:
+        """
+        查詢給定內容雜湊中已有完成分析的報告，供內容相同的新報告直接沿用其分析結果。
+        與 `filter_existing_source_paths` 相同，按 `SOURCE_PATH_QUERY_CHUNK` 分段以 `IN (...)` 查詢。
+
+        Args:
+            content_hashes (List[str]): 要查詢的報告內容雜湊列表。
+
+        Returns:
+            Dict[str, str]: 內容雜湊 -> 狀態為「分析完成」的報告之 `analysis_json`；同一雜湊有多筆時取最新的一筆。
+                查詢失敗時返回空字典 (視為沒有可沿用的分析結果)。
+        """
+        unique_hashes = list(dict.fromkeys(content_hashes))
+        analyses: Dict[str, str] = {}
+        try:
+            for start in range(0, len(unique_hashes), SOURCE_PATH_QUERY_CHUNK):
+                chunk = unique_hashes[start:start + SOURCE_PATH_QUERY_CHUNK]
+                placeholders = ", ".join("?" for _ in chunk)
+                query = (
+                    "SELECT content_hash, analysis_json FROM reports "
+                    f"WHERE content_hash IN ({placeholders}) AND status = '分析完成' AND analysis_json IS NOT NULL ORDER BY id"
+                )
+                rows = await self._execute_query(self.reports_db_path, query, tuple(chunk), fetch_all=True)
+                analyses.update((row["content_hash"], row["analysis_json"]) for row in rows or [])
+            return analyses
+        except Exception as e:
+            logger.error(f"以內容雜湊查詢 {len(unique_hashes)} 筆已完成的分析時失敗: {e}")
+            return {}
+
     async def insert_prompt_template(self, name: str, template_text: str, category: Optional[str] = None) -> Optional[int]:
         """將新的提示詞範本插入到 `prompt_templates` 資料庫。
 
@@ -395,15 +572,14 @@ if __name__ == '__main__':
 
         logger.info(f"\n測試完畢。測試用的資料庫檔案位於目錄: {data_dir}")
 
-        # **【關鍵修正】** 測試結束後，顯式關閉 DAL 管理的記憶體資料庫連接（如果有的話）
+        # **【關鍵修正】** 測試結束後，顯式關閉 DAL 管理的持久資料庫連接
         await dal.close_connections()
 
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
     # **【增強】** 使用 try/finally 確保即使 main() 執行出錯，資源也能被清理
-    # 注意：對於檔案型資料庫，連接通常在 _execute_query 中通過 `async with` 管理，
-    # 但 DAL 實例本身可能持有記憶體資料庫的持久連接，需由 close_connections 清理。
+    # 注意：DAL 實例對每個資料庫持有一條持久連接，需由 close_connections 清理。
     try:
         asyncio.run(main())
     except Exception as e_main:
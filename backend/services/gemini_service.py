@@ -3,6 +3,7 @@ import logging
 import time
 import asyncio
 import json
+import random
 from typing import Optional, Dict, Any
 
 import google.generativeai as genai
@@ -12,6 +13,13 @@ from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+RETRY_MAX_DELAY = 60.0 # API 請求失敗時單次退避等待的上限秒數
+
+
+def _backoff_delay(retry_delay: float, attempt: int) -> float:
+    """第 `attempt` 次 (從 0 起算) 失敗後的等待秒數：以 `retry_delay` 為基準指數成長並加上隨機抖動，避免 429 時並行請求同步重試。"""
+    return min(retry_delay * 2 ** attempt, RETRY_MAX_DELAY) + random.uniform(0, retry_delay)
+
 # Custom Exceptions
 class GeminiServiceError(Exception):
     """Base exception for GeminiService issues."""
@@ -70,6 +78,7 @@ class GeminiService:
         """
         self.model_name = model_name
         self.is_configured = False
+        self._model = None # 首次請求時建立並重複使用的 GenerativeModel
 
         logger.info(
             f"Gemini AI 服務 (GeminiService) 初始化中 (模型: {self.model_name})...",
@@ -106,6 +115,15 @@ class GeminiService:
             )
             # No need to raise GeminiNotConfiguredError here, methods will check self.is_configured
 
+    def _get_model(self):
+        """
+        返回此服務共用的 `GenerativeModel`。genai 的底層 API 客戶端 (及其連線) 為全域共用，
+        模型物件只需建立一次，不必在每份報告的請求中重建。
+        """
+        if self._model is None:
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
     async def summarize_text(self, text: str, max_retries: int = 1, retry_delay: int = 5) -> str:
         """
         使用 Gemini AI 模型對提供的文字內容進行摘要。
@@ -113,7 +131,7 @@ class GeminiService:
         Args:
             text (str): 需要進行摘要的原始文字。
             max_retries (int, optional): API 請求失敗時的最大重試次數。預設為 1。
-            retry_delay (int, optional): 每次重試之間的延遲時間 (秒)。預設為 5。
+            retry_delay (int, optional): 重試之間的延遲時間 (秒)。API 請求失敗時以此為基準指數退避並加上隨機抖動。預設為 5。
 
         Returns:
             str: 摘要後的文字字串。
@@ -134,7 +152,7 @@ class GeminiService:
             logger.warning("輸入文字為空，無法進行摘要。", extra={"props": {**operation_props, "error_type": "ValueError"}})
             raise ValueError("Input text cannot be empty.")
 
-        model = genai.GenerativeModel(self.model_name)
+        model = self._get_model()
         prompt = f"請將以下文字內容進行摘要，並以中文輸出重點：\n\n---\n{text}\n---"
         operation_props["prompt_length"] = len(prompt)
 
@@ -188,8 +206,10 @@ class GeminiService:
                     extra={"props": {**attempt_props, "api_call_status": "exception", "error_type": type(e).__name__, "error": str(e)}}
                 )
                 if attempt < max_retries:
-                    logger.info(f"將在 {retry_delay} 秒後重試...", extra={"props": {**attempt_props, "retry_delay_seconds": retry_delay}})
-                    await asyncio.sleep(retry_delay)
+                    # API 錯誤多為暫時性的 (429 配額、5xx)，以指數退避重試
+                    delay = _backoff_delay(retry_delay, attempt)
+                    logger.info(f"將在 {delay:.1f} 秒後重試...", extra={"props": {**attempt_props, "retry_delay_seconds": delay}})
+                    await asyncio.sleep(delay)
                 else:
                     logger.error("已達到最大重試次數，文字摘要失敗。", extra={"props": {**attempt_props, "final_status": "max_retries_reached"}})
                     raise GeminiAPIError(f"Gemini API request failed after {max_retries + 1} attempts: {str(e)}", original_exception=e)
@@ -206,7 +226,7 @@ class GeminiService:
         Args:
             prompt_text (str): 包含完整指令和內容的提示文字，期望模型返回 JSON。
             max_retries (int, optional): API 請求失敗時的最大重試次數。預設為 1。
-            retry_delay (int, optional): 每次重試之間的延遲時間 (秒)。預設為 5。
+            retry_delay (int, optional): 重試之間的延遲時間 (秒)。API 請求失敗時以此為基準指數退避並加上隨機抖動。預設為 5。
 
         Returns:
             Dict[str, Any]: 包含結構化分析結果的字典。
@@ -228,7 +248,7 @@ class GeminiService:
             logger.warning("輸入提示文字為空，無法進行分析。", extra={"props": {**operation_props, "error_type": "ValueError"}})
             raise ValueError("Input prompt text cannot be empty.")
 
-        model = genai.GenerativeModel(self.model_name)
+        model = self._get_model()
         # The prompt_text is now the full prompt, no internal construction needed.
         operation_props["prompt_length"] = len(prompt_text)
 
@@ -324,8 +344,10 @@ class GeminiService:
                     extra={"props": {**attempt_props, "api_call_status": "exception", "error_type": type(e).__name__, "error": str(e)}}
                 )
                 if attempt < max_retries:
-                    logger.info(f"將在 {retry_delay} 秒後重試...", extra={"props": {**attempt_props, "retry_delay_seconds": retry_delay}})
-                    await asyncio.sleep(retry_delay)
+                    # API 錯誤多為暫時性的 (429 配額、5xx)，以指數退避重試
+                    delay = _backoff_delay(retry_delay, attempt)
+                    logger.info(f"將在 {delay:.1f} 秒後重試...", extra={"props": {**attempt_props, "retry_delay_seconds": delay}})
+                    await asyncio.sleep(delay)
                 else:
                     logger.error("已達到最大重試次數，報告分析失敗。", extra={"props": {**attempt_props, "final_status": "max_retries_api_fail"}})
                     raise GeminiAPIError(f"Gemini API request for analysis failed after {max_retries + 1} attempts: {str(e)}", original_exception=e)
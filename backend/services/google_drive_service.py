@@ -1,13 +1,327 @@
 import os
+import re
+import ssl
+import errno
+import random
+import asyncio
 import logging
-import json
+import orjson
 import time
+import uuid
+import functools
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+import aiofiles
+import aiohttp
 from aiogoogle import Aiogoogle
 from aiogoogle.auth.creds import ServiceAccountCreds
+from aiogoogle.excs import HTTPError
+from aiogoogle.models import Request
+from aiogoogle.resource import GoogleAPI
+from aiogoogle.sessions.aiohttp_session import AiohttpSession
 
 logger = logging.getLogger(__name__)
 
 DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+DRIVE_BATCH_URL = 'https://www.googleapis.com/batch/drive/v3'
+MAX_BATCH_SIZE = 100 # Drive 批次端點單次請求最多可包含 100 個子請求
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+FIELDS_MIN = "nextPageToken, files(id)" # 僅檢查項目是否存在時使用的最小欄位選擇器
+FIELDS_FULL = "nextPageToken, files(id, name, mimeType, modifiedTime, parents)" # 列出資料夾時預設請求的欄位
+MAX_PAGE_SIZE = 1000 # files.list 的 pageSize 上限
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024 # 分段下載時每個 Range 請求的位元組數
+RANGED_DOWNLOAD_THRESHOLD = 2 * DOWNLOAD_CHUNK_SIZE # 檔案大小達到此值時才啟用分段並行下載
+MAX_PARALLEL_RANGES = 8 # 分段並行下載的最大同時連線數
+RANGE_WRITE_BUFFER_SIZE = 1024 * 1024 # 分段下載時累積多少位元組才送出一次 pwrite
+DRIVE_UPLOAD_URL = 'https://www.googleapis.com/upload/drive/v3/files'
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024 # 檔案大小超過此值時改用可續傳上傳
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024 # 可續傳上傳每個分塊的大小 (須為 256 KiB 的倍數)
+UPLOAD_CHUNK_MAX_RETRIES = 5 # 單一分塊連續失敗的最大重試次數
+DEFAULT_MAX_CONCURRENT_REQUESTS = 20 # 每個服務實例同時進行中的 Drive API 請求上限
+DEFAULT_UPLOAD_CONCURRENCY = 4 # upload_many 同時進行中的上傳數量上限 (Drive 對寫入有每使用者速率限制)
+MAX_REQUEST_RETRIES = 4 # 429/5xx/網路錯誤時的最大重試次數
+RETRY_BASE_DELAY = 1.0 # 重試的指數退避基準秒數
+RETRY_MAX_DELAY = 32.0 # 單次退避等待的上限秒數
+# aiogoogle 在請求未指定 timeout 時會傳入 None，使 aiohttp 完全停用逾時 (包含連線逾時)，卡住的連線會無限期佔用並行名額。
+# 不設總時長上限 (大型檔案的下載/上傳可能超過數分鐘)，只限制建立連線與兩次讀取之間的閒置時間。
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+LISTING_CACHE_TTL_SECONDS = 15.0 # list_files 結果快取的存活秒數
+METADATA_CACHE_TTL_SECONDS = 60.0 # get_file_metadata 結果快取的存活秒數
+DEFAULT_METADATA_FIELDS = "mimeType,name,size,modifiedTime"
+CHECKSUM_METADATA_FIELDS = DEFAULT_METADATA_FIELDS + ",sha256Checksum,md5Checksum" # 下載後驗證完整性時請求的欄位
+KNOWN_DIRS_CACHE_SIZE = 1024 # 記住最近已確認存在的本地下載資料夾數量
+DISCOVERY_CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600 # 磁碟上的 Drive 探索文件超過此時間即以 ETag 向伺服器重新驗證
+DEFAULT_LISTING_SHARDS = 8 # list_files_parallel 按 modifiedTime 分片時的預設分片數
+BATCH_FLUSH_INTERVAL_SECONDS = 0.02 # 合併寫入模式下，收到第一個請求後最多等待多久再送出批次
+
+_BATCH_CONTENT_ID_RE = re.compile(r"Content-ID:\s*<?response-item(\d+)>?", re.IGNORECASE)
+
+
+def _build_batch_body(requests: list, boundary: str) -> str:
+    """
+    依照 Google 批次協定，將多個 aiogoogle 請求序列化為 `multipart/mixed` 請求主體。
+
+    每個子請求以 `Content-Type: application/http` 包裝，並以 `Content-ID: <itemN>` 標記其順序，
+    以便回應解析時能對應回原始請求。
+    """
+    parts = []
+    for index, request in enumerate(requests):
+        url = urlsplit(request.url)
+        path = f"{url.path}?{url.query}" if url.query else url.path
+        lines = [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <item{index}>",
+            "",
+            f"{request.method} {path} HTTP/1.1",
+        ]
+        if request.json is not None:
+            payload = orjson.dumps(request.json).decode('utf-8')
+            lines += ["Content-Type: application/json; charset=UTF-8", "", payload]
+        else:
+            lines.append("")
+        parts.append("\r\n".join(lines))
+    parts.append(f"--{boundary}--")
+    return "\r\n".join(parts) + "\r\n"
+
+
+def _parse_batch_response(body: str, boundary: str, expected_count: int) -> list:
+    """
+    解析批次端點返回的 `multipart/mixed` 回應主體。
+
+    Returns:
+        list: 長度為 `expected_count` 的列表，依子請求順序排列。每個元素為
+              `{"status_code": int, "body": dict | str | None}`；若某子請求在回應中缺失則為 None。
+    """
+    results = [None] * expected_count
+    normalized = body.replace("\r\n", "\n")
+    for raw_part in normalized.split(f"--{boundary}"):
+        raw_part = raw_part.strip()
+        if not raw_part or raw_part == "--":
+            continue
+        part_headers, _, http_message = raw_part.partition("\n\n")
+        match = _BATCH_CONTENT_ID_RE.search(part_headers)
+        if not match:
+            continue
+        index = int(match.group(1))
+        if index >= expected_count:
+            continue
+        status_line, _, rest = http_message.partition("\n")
+        _, _, payload = rest.partition("\n\n")
+        status_tokens = status_line.split()
+        status_code = int(status_tokens[1]) if len(status_tokens) > 1 and status_tokens[1].isdigit() else None
+        payload = payload.strip()
+        try:
+            parsed_payload = orjson.loads(payload) if payload else None
+        except orjson.JSONDecodeError:
+            parsed_payload = payload
+        results[index] = {"status_code": status_code, "body": parsed_payload}
+    return results
+
+
+def _escape_query_value(value: str) -> str:
+    """依照 Drive 查詢語法跳脫字串值中的反斜線與單引號，避免值本身改變查詢語意。"""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def _check_page_size(page_size: int):
+    """驗證列出檔案的每頁項目數；以 ValueError 而非 assert 檢查，`python -O` 下同樣生效。"""
+    if not 0 < page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size 必須介於 1 與 {MAX_PAGE_SIZE} 之間，實際為 {page_size}")
+
+
+@functools.lru_cache(maxsize=256)
+def _parents_query(folder_id: str) -> str:
+    """構建列出資料夾直接子項目 (排除回收站) 的 Drive 查詢語句。"""
+    return f"'{_escape_query_value(folder_id)}' in parents and trashed=false"
+
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504} # 暫時性的 HTTP 狀態碼；501/505 等表示請求本身不受支援，重試無益
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"} # Drive 以 403 回報配額限制時使用的錯誤原因
+NOT_DOWNLOADABLE_REASONS = {"fileNotDownloadable", "cannotDownloadAbusiveFile"} # alt=media 無法下載該項目 (資料夾、Google 文件原生格式等) 時的錯誤原因
+
+
+def _error_reasons(response) -> set:
+    """從 Drive API 錯誤回應的 JSON 主體 (`error.errors[].reason`) 中取出錯誤原因集合。"""
+    body = getattr(response, "json", None)
+    if not isinstance(body, dict):
+        return set()
+    errors = (body.get("error") or {}).get("errors") or []
+    return {item.get("reason") for item in errors if isinstance(item, dict)}
+
+
+def _is_retryable_error(error: Exception) -> bool:
+    """
+    判斷 Drive API 錯誤是否為暫時性錯誤，可透過退避重試恢復：`RETRYABLE_STATUS_CODES` 中的狀態碼 (408、429、
+    500、502、503、504)、網路層錯誤，以及 Drive 以 403 回報的速率限制 (`rateLimitExceeded` / `userRateLimitExceeded`)。
+    權限不足等其他 403、404 與 501 等不受支援的請求視為不可恢復。
+    """
+    if isinstance(error, HTTPError):
+        status_code = error.res.status_code if error.res is not None else None
+        if status_code == 403:
+            return bool(_error_reasons(error.res) & RATE_LIMIT_REASONS)
+        return status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError))
+
+
+def _retry_after_seconds(error: Exception) -> float | None:
+    """若錯誤回應帶有以秒數表示的 `Retry-After` 標頭，返回該秒數；否則返回 None。"""
+    response = getattr(error, "res", None)
+    headers = getattr(response, "headers", None) or {}
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError): # HTTP 日期格式的 Retry-After 不處理，改用指數退避
+        return None
+
+
+def _backoff_delay(attempt: int) -> float:
+    """計算第 `attempt` 次重試 (從 1 起算) 前的等待秒數：帶隨機抖動的指數退避。"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY) + random.uniform(0, RETRY_BASE_DELAY)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_service_account_info(path: str, mtime_ns: int) -> dict:
+    """
+    讀取並解析服務帳號 JSON 檔案。以 (路徑, 修改時間) 為鍵快取，同一個金鑰檔案被多個服務實例使用時只解析一次；
+    檔案更新後修改時間改變，會自動重新讀取。呼叫者不應修改返回的字典。
+    """
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+_SSL_CONTEXT = None
+
+
+def _shared_ssl_context() -> ssl.SSLContext:
+    """返回程序內共用的 SSL 上下文，CA 憑證只在第一次呼叫時載入。"""
+    global _SSL_CONTEXT
+    if _SSL_CONTEXT is None:
+        _SSL_CONTEXT = ssl.create_default_context()
+    return _SSL_CONTEXT
+
+
+class _SharedAiohttpSession(AiohttpSession):
+    """
+    包裝一個由 GoogleDriveService 持有的長期 `aiohttp.ClientSession` 的 aiogoogle 工作階段。
+
+    aiogoogle 在每次 `async with self.aiogoogle` 結束 (以及每次刷新存取權杖) 時都會關閉工作階段；
+    此包裝讓這些關閉成為空操作，使 TCP 連線、keep-alive 與 TLS 工作階段得以跨呼叫重用。
+    真正的關閉由 `GoogleDriveService.close()` 負責。
+    """
+
+    def __init__(self, client_session: aiohttp.ClientSession):
+        self._session = client_session
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    async def close(self):
+        pass
+
+
+class _OrjsonClientResponse(aiohttp.ClientResponse):
+    """
+    以 orjson 解析 JSON 主體的 `aiohttp.ClientResponse`。aiogoogle 以 `response.json()` 解析所有 Drive 回應，
+    對於含上千個項目的 files.list 分頁，解析速度約為標準庫 `json` 的 2-3 倍。
+    """
+
+    async def json(self, *, encoding=None, loads=orjson.loads, content_type="application/json"):
+        return await super().json(encoding=encoding, loads=loads, content_type=content_type)
+
+
+def _open_preallocated(path: str, size: int) -> int:
+    """
+    建立 (或截斷) 檔案並預先配置 `size` 位元組，返回檔案描述符。
+
+    在支援的系統上使用 `posix_fallocate` 一次保留所有磁碟區塊，避免並行分段寫入造成檔案碎片化，
+    也讓磁碟空間不足在下載開始前就被發現；檔案系統不支援時退回 `ftruncate` (稀疏檔案)。
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return fd
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise
+        os.ftruncate(fd, size)
+        return fd
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+async def _remove_quietly(path: str):
+    """在工作執行緒中刪除檔案；檔案不存在或無法刪除時忽略。"""
+    try:
+        await asyncio.to_thread(os.remove, path)
+    except OSError:
+        pass
+
+
+def _expected_checksum(metadata: dict) -> tuple[str, str] | None:
+    """從 Drive 元數據取出可用的校驗碼，優先使用 SHA-256，其次為 MD5；Google 文件等原生格式沒有校驗碼時返回 None。"""
+    for field, algorithm in (("sha256Checksum", "sha256"), ("md5Checksum", "md5")):
+        value = metadata.get(field)
+        if value:
+            return algorithm, value.lower()
+    return None
+
+
+def _hash_file(path: str, algorithm: str) -> str:
+    """計算本地檔案的雜湊十六進位字串 (同步函式，應於工作執行緒中呼叫)。"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, algorithm).hexdigest()
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int):
+    """以 `os.pwrite` 將 `data` 完整寫入 `offset` 處，處理部分寫入的情況。"""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+class _LazyStr:
+    """延遲字串化的包裝：日誌記錄實際被格式化輸出時才呼叫 `str()`，被過濾或取樣丟棄的記錄不需轉換大型回應。"""
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return str(self.obj)
+
+
+class _RangeWriter:
+    """
+    供 aiogoogle `pipe_to` 使用的寫入器：將收到的資料塊累積至 `RANGE_WRITE_BUFFER_SIZE` 後，
+    於工作執行緒中以 `os.pwrite` 一次寫入檔案的指定位移處。
+    讓多個 Range 請求可並行寫入同一個預先配置大小的檔案，且磁碟寫入不會阻塞事件迴圈。
+    """
+
+    def __init__(self, fd: int, offset: int):
+        self._fd = fd
+        self._offset = offset
+        self._buffer = bytearray()
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if len(self._buffer) >= RANGE_WRITE_BUFFER_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        data, self._buffer = self._buffer, bytearray()
+        await asyncio.to_thread(_pwrite_all, self._fd, data, self._offset)
+        self._offset += len(data)
+
 
 class GoogleDriveService:
     """
@@ -23,11 +337,18 @@ class GoogleDriveService:
 
     - **檔案與資料夾操作**:
         - `list_files`: 列出指定資料夾中的檔案和資料夾。
+        - `get_file_metadata`: 查詢單一項目的元數據，並以短期 TTL 快取重複查詢。
         - `download_file`: 從 Google Drive 下載檔案到本地檔案系統。
+        - `download_file_with_metadata`: 以已知的元數據下載檔案，省略元數據查詢的往返。
         - `upload_file`: 將本地檔案上傳到 Google Drive 的指定資料夾。
+        - `upload_many`: 以有上限的並行數批量上傳多個本地檔案。
         - `create_folder`: 在 Google Drive 中創建新的資料夾。
         - `delete_file`: 永久刪除 Google Drive 中的檔案或資料夾。
         - `move_file`: 在 Google Drive 中移動檔案到不同的資料夾。
+        - `iter_files`: 以非同步產生器逐頁產出資料夾內容，支援提前結束。
+        - `list_files_parallel`: 以互斥查詢分片並行列出資料夾內容，適用於項目眾多的資料夾。
+        - `batch_execute`: 透過 Drive 批次端點，在單次 HTTP 往返中送出多個子請求。
+        - `batch_delete` / `move_files` / `get_files_metadata`: 基於批次端點的大量刪除、移動與元數據查詢。
 
     - **錯誤處理與日誌記錄**:
         - 對 API 操作進行錯誤處理。
@@ -36,7 +357,7 @@ class GoogleDriveService:
     所有與 Google Drive API 的互動都是非同步的，使用 `async/await` 語法。
     該服務的目標是提供一個清晰、易用且功能完整的接口，來管理 Google Drive 上的資源。
     """
-    def __init__(self, service_account_info: dict = None, service_account_json_path: str = None):
+    def __init__(self, service_account_info: dict = None, service_account_json_path: str = None, max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS, listing_cache_ttl: float = LISTING_CACHE_TTL_SECONDS, metadata_cache_ttl: float = METADATA_CACHE_TTL_SECONDS, coalesce_writes: bool = False, discovery_cache_path: str = None):
         """
         初始化 GoogleDriveService。
 
@@ -66,6 +387,19 @@ class GoogleDriveService:
                                                    }
                                                    預設為 None。
             service_account_json_path (str, optional): 服務帳號憑證 JSON 檔案的路徑。預設為 None。
+                                                       此路徑會以同步方式讀取；在事件迴圈中建立實例時，
+                                                       請改用 `await GoogleDriveService.from_json_path(...)`。
+            max_concurrent_requests (int, optional): 此實例同時進行中的 Drive API 請求上限，
+                                                     避免大量並行操作超出 Drive 的每使用者 QPS 限制。預設為 20。
+            listing_cache_ttl (float, optional): `list_files` 結果快取的存活秒數，設為 0 可停用快取。預設為 15 秒。
+            metadata_cache_ttl (float, optional): `get_file_metadata` 結果快取的存活秒數，設為 0 可停用快取。預設為 60 秒。
+            coalesce_writes (bool, optional): 設為 True 時，並行呼叫的 `delete_file` / `move_file` 會先放入佇列，
+                                              由背景任務在 `BATCH_FLUSH_INTERVAL_SECONDS` 內或累積滿 100 個時
+                                              合併為一次批次請求送出；呼叫方式與返回值不變。預設為 False。
+            discovery_cache_path (str, optional): Drive API v3 探索文件的磁碟快取路徑 (例如 `~/.cache/wolfai/drive_v3.json`)。
+                                                  設定後，新行程會直接讀取 `DISCOVERY_CACHE_MAX_AGE_SECONDS` 內的快取，
+                                                  省去啟動時下載約 200 KB 探索文件的往返；較舊的快取以 ETag 條件式請求驗證。
+                                                  預設為 None (不使用磁碟快取)。
 
         Raises:
             ValueError: 如果未提供任何憑證資訊，或者提供的憑證資訊無效/不完整。
@@ -79,56 +413,317 @@ class GoogleDriveService:
             try:
                 # 使用字典內容創建 ServiceAccountCreds 對象
                 self.service_account_creds = ServiceAccountCreds(scopes=DRIVE_SCOPES, **service_account_info)
+                init_props["method"] = "service_account_info_dict"
                 logger.info(
                     "Google Drive 服務：已使用傳入的 service_account_info 初始化憑證。",
-                    extra={"props": {**init_props, "method": "service_account_info_dict"}}
+                    extra={"props": init_props}
                 )
             except Exception as e:
+                init_props["method"] = "service_account_info_dict"
+                init_props["error"] = str(e)
                 logger.error(
                     f"Google Drive 服務：從 service_account_info 初始化憑證失敗: {e}", exc_info=True,
-                    extra={"props": {**init_props, "method": "service_account_info_dict", "error": str(e)}}
+                    extra={"props": init_props}
                 )
                 # 重新引發異常，指明憑證資訊問題
                 raise ValueError(f"無效的 service_account_info: {e}")
         # 如果未提供 service_account_info，則嘗試使用 service_account_json_path
         elif service_account_json_path:
             try:
-                # 檢查 JSON 檔案是否存在
-                if not os.path.exists(service_account_json_path):
-                    logger.error(
-                        f"Google Drive 服務：服務帳號 JSON 檔案路徑不存在: {service_account_json_path}",
-                        extra={"props": {**init_props, "method": "json_path", "path": service_account_json_path, "error": "file_not_found"}}
-                    )
-                    raise FileNotFoundError(f"服務帳號 JSON 檔案未找到: {service_account_json_path}")
-                # 讀取並解析 JSON 檔案
-                with open(service_account_json_path, 'r', encoding='utf-8') as f:
-                    sa_info_from_file = json.load(f)
+                # 讀取並解析 JSON 檔案 (依修改時間快取)；檔案不存在時 os.stat 會拋出 FileNotFoundError，無需事先檢查
+                mtime_ns = os.stat(service_account_json_path).st_mtime_ns
+                sa_info_from_file = _load_service_account_info(service_account_json_path, mtime_ns)
                 # 使用從檔案讀取的資訊創建 ServiceAccountCreds 對象
                 self.service_account_creds = ServiceAccountCreds(scopes=DRIVE_SCOPES, **sa_info_from_file)
+                init_props["method"] = "json_path"
+                init_props["path"] = service_account_json_path
                 logger.info(
                     f"Google Drive 服務：已從 JSON 檔案 {service_account_json_path} 初始化憑證。",
-                    extra={"props": {**init_props, "method": "json_path", "path": service_account_json_path}}
+                    extra={"props": init_props}
                 )
+            except FileNotFoundError:
+                init_props["method"] = "json_path"
+                init_props["path"] = service_account_json_path
+                init_props["error"] = "file_not_found"
+                logger.error(
+                    f"Google Drive 服務：服務帳號 JSON 檔案路徑不存在: {service_account_json_path}",
+                    extra={"props": init_props}
+                )
+                raise FileNotFoundError(f"服務帳號 JSON 檔案未找到: {service_account_json_path}") from None
             except Exception as e:
+                init_props["method"] = "json_path"
+                init_props["path"] = service_account_json_path
+                init_props["error"] = str(e)
                 logger.error(
                     f"Google Drive 服務：從 JSON 檔案 {service_account_json_path} 初始化憑證失敗: {e}", exc_info=True,
-                    extra={"props": {**init_props, "method": "json_path", "path": service_account_json_path, "error": str(e)}}
+                    extra={"props": init_props}
                 )
                 # 重新引發異常，指明從檔案初始化憑證的問題
                 raise ValueError(f"從 JSON 檔案 {service_account_json_path} 初始化憑證失敗: {e}")
         # 如果兩種憑證提供方式都未指定
         else:
+            init_props["error"] = "no_credentials_provided"
             logger.error(
                 "Google Drive 服務：必須提供 service_account_info 或 service_account_json_path。",
-                extra={"props": {**init_props, "error": "no_credentials_provided"}}
+                extra={"props": init_props}
             )
             raise ValueError("未提供有效的 Google Drive 服務帳號憑證。")
 
         # 使用已配置的服務帳號憑證初始化 Aiogoogle 客戶端
-        self.aiogoogle = Aiogoogle(service_account_creds=self.service_account_creds)
-        logger.info("GoogleDriveService 初始化完成，Aiogoogle 客戶端已配置。", extra={"props": {**init_props, "initialization_status": "completed"}})
+        self._client_session = None # 長期共用的 aiohttp.ClientSession，於第一次請求時在事件迴圈中建立
+        self.aiogoogle = Aiogoogle(service_account_creds=self.service_account_creds, session_factory=self._session_factory)
+        self._sem = asyncio.Semaphore(max_concurrent_requests) # 限制所有 Drive API 請求的並行數
+        self._listing_cache_ttl = listing_cache_ttl
+        self._listing_cache = {} # (folder_id, page_size, fields) -> (到期時間, 檔案列表)
+        self._listing_inflight = {} # (folder_id, page_size, fields) -> 進行中的列出任務
+        self._listing_generation = 0 # 每次快取失效時遞增，避免失效前開始的走訪結果被寫回快取
+        self._metadata_cache_ttl = metadata_cache_ttl
+        self._metadata_cache = {} # (file_id, fields) -> (到期時間, 元數據字典)
+        self._metadata_lock = asyncio.Lock()
+        self._drive_v3 = None # 已發現的 Drive API v3 描述，於第一次請求時取得後重複使用
+        self._discover_lock = asyncio.Lock()
+        self._discovery_cache_path = os.path.expanduser(discovery_cache_path) if discovery_cache_path else None
+        self._coalesce_writes = coalesce_writes
+        self._known_dirs = OrderedDict() # 已確認存在的本地下載資料夾 (LRU)，避免每次下載都呼叫 makedirs
+        self._dir_creations = {} # 資料夾路徑 -> 進行中的 makedirs 任務
+        self._batch_queue = None # (Request, Future) 佇列，於第一次合併寫入時在事件迴圈中建立
+        self._batch_task = None # 負責清空佇列並送出批次的背景任務
+        init_props["initialization_status"] = "completed"
+        logger.info("GoogleDriveService 初始化完成，Aiogoogle 客戶端已配置。", extra={"props": init_props})
+
+    def _session_factory(self) -> AiohttpSession:
+        """
+        供 aiogoogle 使用的工作階段工廠：返回包裝共用 `aiohttp.ClientSession` 的工作階段。
+
+        共用的 ClientSession 使用調校後的連線池 (總連線數 100、每主機 30、DNS 快取 300 秒、
+        keep-alive 75 秒)、預先載入 CA 的 SSL 上下文，以及以 orjson 解析 JSON 的回應類別。若尚未建立、已關閉，或屬於另一個
+        (已結束的) 事件迴圈，則會在目前的事件迴圈中重新建立。
+        """
+        loop = asyncio.get_running_loop()
+        session = self._client_session
+        if session is None or session.closed or session._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=30, ttl_dns_cache=300, keepalive_timeout=75, ssl=_shared_ssl_context())
+            session = self._client_session = aiohttp.ClientSession(connector=connector, response_class=_OrjsonClientResponse)
+        return _SharedAiohttpSession(session)
+
+    async def close(self):
+        """
+        關閉服務持有的共用 HTTP 連線池。應在應用程式關閉時呼叫；
+        之後若再次呼叫本服務的方法，會自動建立新的連線池。
+        """
+        batch_task, self._batch_task = self._batch_task, None
+        if batch_task is not None and not batch_task.done():
+            batch_task.cancel()
+            try:
+                await batch_task
+            except asyncio.CancelledError:
+                pass
+        session, self._client_session = self._client_session, None
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("GoogleDriveService 的共用 HTTP 連線池已關閉。", extra={"props": {"service_name": "GoogleDriveService", "operation": "close"}})
+
+    async def _send_coalesced(self, request, ok_statuses: tuple) -> dict:
+        """
+        將單一寫入請求放入合併佇列，等待其所在批次完成後返回該子請求的結果。
+        子請求失敗 (狀態碼不在 `ok_statuses` 內，或整個批次失敗) 時拋出 RuntimeError。
+        """
+        loop = asyncio.get_running_loop()
+        if self._batch_task is None or self._batch_task.done() or self._batch_task.get_loop() is not loop:
+            self._batch_queue = asyncio.Queue()
+            self._batch_task = loop.create_task(self._batch_loop(self._batch_queue))
+        future = loop.create_future()
+        self._batch_queue.put_nowait((request, future))
+        result = await future
+        if not result or result["status_code"] not in ok_statuses:
+            raise RuntimeError(f"批次子請求失敗: {result}")
+        return result
+
+    async def _batch_loop(self, queue: asyncio.Queue):
+        """合併寫入的背景任務：取得第一個請求後，在 `BATCH_FLUSH_INTERVAL_SECONDS` 內盡量收集至 100 個再一次送出。"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + BATCH_FLUSH_INTERVAL_SECONDS
+            while len(batch) < MAX_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                results = await self.batch_execute([request for request, _ in batch])
+            except BaseException as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e if isinstance(e, Exception) else RuntimeError("批次任務已停止"))
+                if not isinstance(e, Exception):
+                    raise
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def aclose(self):
+        """`close` 的別名，讓服務可搭配 `contextlib.aclosing` 等慣用非同步資源管理工具使用。"""
+        await self.close()
+
+    async def __aenter__(self) -> "GoogleDriveService":
+        """
+        以 `async with GoogleDriveService(...) as drive:` 使用服務時，區塊內所有方法共用同一個連線池，
+        離開區塊時自動關閉。注意：這不會進入 `self.aiogoogle` 的上下文 (aiogoogle 的工作階段綁定在
+        呼叫者任務的 ContextVar 上，無法跨任務共用)；各方法仍各自進入上下文，但只包裝共用的連線池，成本很低。
+        """
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _drive(self, google):
+        """
+        返回 Drive API v3 的 `GoogleAPI` 物件。探索文件是靜態的，只在第一次呼叫時向 Discovery Service 下載並解析，
+        之後重複使用，省去每次操作一次 HTTPS 往返與 JSON 解析。以鎖確保並行的首次呼叫只會下載一次。
+        設定了 `discovery_cache_path` 時改由 `_discover_with_disk_cache` 取得。
+
+        Args:
+            google: 已進入上下文的 Aiogoogle 客戶端 (僅在尚未快取時用於下載探索文件)。
+        """
+        if self._drive_v3 is None:
+            async with self._discover_lock:
+                if self._drive_v3 is None:
+                    if self._discovery_cache_path:
+                        self._drive_v3 = await self._discover_with_disk_cache(google)
+                    else:
+                        self._drive_v3 = await google.discover('drive', 'v3')
+        return self._drive_v3
+
+    async def _discover_with_disk_cache(self, google) -> GoogleAPI:
+        """
+        以磁碟快取取得 Drive 探索文件。快取未超過 `DISCOVERY_CACHE_MAX_AGE_SECONDS` 時直接使用；
+        已過期時帶上快取的 ETag 發出條件式請求 (`If-None-Match`)，伺服器回應 304 即沿用快取並更新其時間，
+        只有文件確實變更 (200) 時才重新下載並寫回快取。
+        """
+        path = self._discovery_cache_path
+        cached = await self._load_cached_discovery()
+        if cached is not None and cached["fresh"]:
+            return GoogleAPI(cached["document"])
+
+        request = google.discovery_service.apis.getRest(api='drive', version='v3', validate=False)
+        if cached is not None and cached.get("etag"):
+            request.headers = {**(request.headers or {}), "If-None-Match": cached["etag"]}
+        response = await google.as_anon(request, full_res=True)
+        if response.status_code == 304 and cached is not None:
+            logger.info("Drive 探索文件未變更 (304)，沿用磁碟快取。", extra={"props": {"operation": "discovery_cache", "path": path, "cache_status": "revalidated"}})
+            try:
+                await asyncio.to_thread(os.utime, path)
+            except OSError:
+                pass
+            return GoogleAPI(cached["document"])
+        document = response.json
+        await self._store_cached_discovery(document, (response.headers or {}).get("ETag"))
+        return GoogleAPI(document) # GoogleAPI 會在文件中補上預設參數，須在寫入快取之後建立
+
+    async def _load_cached_discovery(self) -> dict | None:
+        """
+        從磁碟讀取 Drive 探索文件快取，返回 `{"document", "etag", "fresh"}`；
+        檔案不存在或內容無效時返回 None。
+        """
+        path = self._discovery_cache_path
+        try:
+            stat_result = await asyncio.to_thread(os.stat, path)
+            async with aiofiles.open(path, 'rb') as f:
+                entry = orjson.loads(await f.read())
+            entry["fresh"] = time.time() - stat_result.st_mtime <= DISCOVERY_CACHE_MAX_AGE_SECONDS
+            return entry if isinstance(entry.get("document"), dict) else None
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError, AttributeError, TypeError) as e:
+            logger.warning(f"讀取 Drive 探索文件快取 '{path}' 失敗，將重新下載: {e}", extra={"props": {"operation": "discovery_cache", "path": path, "error": str(e)}})
+            return None
+
+    async def _store_cached_discovery(self, discovery_document: dict, etag: str | None):
+        """將探索文件與其 ETag 寫入磁碟快取 (先寫暫存檔再原子替換)；寫入失敗只記錄警告，不影響本次請求。"""
+        path = self._discovery_cache_path
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                await f.write(orjson.dumps({"etag": etag, "document": discovery_document}))
+            await asyncio.to_thread(os.replace, tmp_path, path)
+        except OSError as e:
+            await _remove_quietly(tmp_path)
+            logger.warning(f"寫入 Drive 探索文件快取 '{path}' 失敗: {e}", extra={"props": {"operation": "discovery_cache", "path": path, "error": str(e)}})
+
+    async def _send(self, google, request, max_retries: int = MAX_REQUEST_RETRIES, **kwargs):
+        """
+        在並行上限內送出單一 Drive API 請求，並對暫時性錯誤 (429、5xx、網路錯誤) 進行帶抖動的指數退避重試。
+
+        Args:
+            google: 已進入上下文的 Aiogoogle 客戶端。
+            request: aiogoogle `Request` 物件。
+            max_retries (int, optional): 最大重試次數。對於不可安全重送的請求 (例如帶有寫入位移狀態的分段下載)
+                                         應傳入 0，由呼叫者自行處理重試。
+            **kwargs: 傳遞給 `as_service_account` 的其他參數 (例如 `full_res=True`)。
+        """
+        if getattr(request, "timeout", REQUEST_TIMEOUT) is None:
+            request.timeout = REQUEST_TIMEOUT
+        attempt = 0
+        while True:
+            try:
+                async with self._sem:
+                    return await google.as_service_account(request, **kwargs)
+            except Exception as e:
+                if attempt >= max_retries or not _is_retryable_error(e):
+                    raise
+                attempt += 1
+                delay = _backoff_delay(attempt)
+                retry_after = _retry_after_seconds(e)
+                if retry_after is not None: # 伺服器明確指定的等待時間優先，但不超過退避上限
+                    delay = min(max(delay, retry_after), RETRY_MAX_DELAY)
+                logger.warning(
+                    f"Drive API 請求遇到暫時性錯誤 ({e})，{delay:.1f} 秒後進行第 {attempt} 次重試。",
+                    extra={"props": {"operation": "drive_api_retry", "attempt": attempt, "delay_seconds": round(delay, 2), "error": str(e)}}
+                )
+                await asyncio.sleep(delay)
+
+    @classmethod
+    async def from_json_path(cls, service_account_json_path: str, **kwargs) -> "GoogleDriveService":
+        """
+        以非同步方式從服務帳號 JSON 檔案建立 GoogleDriveService 實例。
+
+        與在 `__init__` 中傳入 `service_account_json_path` 不同，此方法透過 `aiofiles` 讀取檔案，
+        不會阻塞事件迴圈，適合在已運行的非同步應用程式 (如 FastAPI lifespan) 中使用。
+
+        Args:
+            service_account_json_path (str): 服務帳號憑證 JSON 檔案的路徑。
+            **kwargs: 其餘關鍵字參數 (如 `max_concurrent_requests`、`discovery_cache_path`) 會原樣傳給建構子。
+
+        Returns:
+            GoogleDriveService: 已完成初始化的服務實例。
+
+        Raises:
+            FileNotFoundError: 如果檔案不存在。
+            ValueError: 如果檔案內容不是有效的 JSON 或憑證資訊無效。
+        """
+        log_props = {"service_name": "GoogleDriveService", "method": "from_json_path", "path": service_account_json_path}
+        try:
+            async with aiofiles.open(service_account_json_path, 'rb') as f:
+                sa_info_from_file = orjson.loads(await f.read())
+        except FileNotFoundError:
+            log_props["error"] = "file_not_found"
+            logger.error(f"Google Drive 服務：服務帳號 JSON 檔案路徑不存在: {service_account_json_path}", extra={"props": log_props})
+            raise
+        except orjson.JSONDecodeError as e:
+            log_props["error"] = str(e)
+            logger.error(f"Google Drive 服務：服務帳號 JSON 檔案 {service_account_json_path} 格式無效: {e}", extra={"props": log_props})
+            raise ValueError(f"從 JSON 檔案 {service_account_json_path} 初始化憑證失敗: {e}")
+        return cls(service_account_info=sa_info_from_file, **kwargs)
 
-    async def list_files(self, folder_id: str = 'root', page_size: int = 100, fields: str = "nextPageToken, files(id, name, mimeType, modifiedTime, parents)") -> list:
+    async def list_files(self, folder_id: str = 'root', page_size: int = MAX_PAGE_SIZE, fields: str = FIELDS_FULL, order_by: str = None) -> list:
         """
         列出指定 Google Drive 資料夾中的檔案和子資料夾。
 
@@ -140,12 +735,16 @@ class GoogleDriveService:
             folder_id (str, optional): 要列出內容的 Google Drive 資料夾的 ID。
                                        預設為 'root'，表示根目錄。
             page_size (int, optional): 每次 API 請求返回的項目數量上限。
-                                       Google Drive API 允許的最大值通常是 1000。
-                                       此方法內部會將 `page_size` 與 1000 取較小值。預設為 100。
+                                       預設為 Google Drive API 允許的最大值 1000 (`MAX_PAGE_SIZE`)，
+                                       以最少的 HTTP 往返次數取得整個資料夾；傳入超過 1000 的值屬於程式錯誤。
             fields (str, optional): 指定 API 回應中應包含哪些檔案欄位的選擇器。
-                                    預設為 "nextPageToken, files(id, name, mimeType, modifiedTime, parents)"，
+                                    預設為 `FIELDS_FULL` ("nextPageToken, files(id, name, mimeType, modifiedTime, parents)")，
                                     包含了分頁權杖和每個檔案/資料夾的常用元數據 (ID, 名稱, MIME 類型, 修改時間, 父資料夾列表)。
+                                    只需判斷項目是否存在時，可傳入 `FIELDS_MIN` ("nextPageToken, files(id)")
+                                    以縮小回應大小與解析時間。
                                     有關可用欄位的更多信息，請參閱 Google Drive API 文件。
+            order_by (str, optional): 傳給 API 的 `orderBy` 排序鍵 (例如 "folder,modifiedTime desc")。
+                                      預設為 None，不要求伺服器排序 (未排序的分頁成本最低)；僅在需要特定順序時指定。
 
         Returns:
             list: 包含資料夾中所有檔案和子資料夾元數據字典的列表。
@@ -160,42 +759,260 @@ class GoogleDriveService:
                   }
                   如果請求過程中發生錯誤，或者資料夾為空，則返回空列表 `[]`。
         """
-        log_props = {"folder_id": folder_id, "page_size": page_size, "fields": fields, "operation": "list_files"}
-        logger.info(f"正在列出 Drive 資料夾 '{folder_id}' 中的檔案...", extra={"props": {**log_props, "api_call_status": "started"}})
-        all_files = []
-        page_token = None # 用於處理 Google Drive API 的分頁
+        _check_page_size(page_size)
+        log_props = {"folder_id": folder_id, "page_size": page_size, "fields": fields, "operation": "list_files", "api_call_status": "started"}
+        info_enabled = logger.isEnabledFor(logging.INFO) # 熱路徑：日誌停用時略過訊息格式化
+        if info_enabled:
+            logger.info("正在列出 Drive 資料夾 '%s' 中的檔案...", folder_id, extra={"props": log_props})
+        key = (folder_id, page_size, fields, order_by)
+        cached = self._listing_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            if info_enabled:
+                log_props["api_call_status"] = "cache_hit"
+                log_props["item_count"] = len(cached[1])
+                logger.info("使用快取的資料夾 '%s' 列表 (%s 個項目)。", folder_id, len(cached[1]), extra={"props": log_props})
+            return list(cached[1])
         try:
+            # 合併並行的相同請求：同一資料夾的列出若已在進行中，直接等待其結果而不重複走訪所有分頁。
+            # 使用 shield 讓單一呼叫者被取消時，不會中斷其他呼叫者共用的走訪任務。
+            task = self._listing_inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._walk_folder(folder_id, page_size, fields, order_by))
+                self._listing_inflight[key] = task
+                generation = self._listing_generation
+                task.add_done_callback(lambda done_task: self._on_listing_done(key, generation, done_task))
+            all_files = list(await asyncio.shield(task))
+            if info_enabled:
+                log_props["api_call_status"] = "success"
+                log_props["item_count"] = len(all_files)
+                logger.info("成功列出資料夾 '%s' 中的 %s 個項目。", folder_id, len(all_files), extra={"props": log_props})
+            return all_files
+        except Exception as e:
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            logger.error(f"列出 Drive 資料夾 '{folder_id}' 中的檔案時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
+            return [] # 發生錯誤時返回空列表
+
+    async def _walk_folder(self, folder_id: str, page_size: int, fields: str, order_by: str = None) -> list:
+        """走訪資料夾的所有分頁並返回完整列表；錯誤會直接拋出，由 `list_files` 統一處理。"""
+        return [file_item async for file_item in self.iter_files(folder_id, page_size, fields, order_by=order_by)]
+
+    def _on_listing_done(self, key: tuple, generation: int, task: asyncio.Task):
+        """列出任務完成時移除進行中記錄，並在成功且期間快取未失效時寫入 TTL 快取。"""
+        if self._listing_inflight.get(key) is task:
+            self._listing_inflight.pop(key)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self._listing_cache_ttl > 0 and generation == self._listing_generation:
+            self._listing_cache[key] = (time.monotonic() + self._listing_cache_ttl, task.result())
+
+    def invalidate_listing_cache(self):
+        """清除 `list_files` 的結果快取。本服務的寫入操作 (上傳、建立、刪除、移動) 成功後會自動呼叫。"""
+        self._listing_cache.clear()
+        self._listing_generation += 1
+        # 失效前開始的走訪可能已看不到最新的變更，讓之後的呼叫者重新發起請求
+        self._listing_inflight.clear()
+
+    async def iter_files(self, folder_id: str = 'root', page_size: int = MAX_PAGE_SIZE, fields: str = FIELDS_FULL, prefetch: bool = False, order_by: str = None):
+        """
+        以非同步產生器逐一產出資料夾中的檔案元數據，無需先累積完整列表。
+
+        與 `list_files` 不同，此方法不做快取與請求合併，且錯誤會直接拋出。
+        只需掃描一次、或可能提前結束的呼叫者 (例如尋找特定檔案) 可以在找到目標後直接 `break`，
+        省去後續分頁的請求；記憶體用量也只與單頁大小相關。
+        每一頁的請求都在獨立的 `self.aiogoogle` 上下文中完成，因此在迭代期間呼叫本服務的其他方法是安全的。
+
+        Args:
+            folder_id (str, optional): 要列出內容的資料夾 ID。預設為 'root'。
+            page_size (int, optional): 每頁返回的項目數量上限。預設為 1000。
+            fields (str, optional): 同 `list_files`。
+            prefetch (bool, optional): 設為 True 時，收到一頁後會在背景立即請求下一頁，再開始產出本頁項目，
+                                       讓呼叫者處理本頁的時間與下一頁的網路往返重疊；適用於逐項處理較耗時的完整掃描。
+                                       代價是提前結束時可能多請求一頁 (該請求會被取消)。預設為 False。
+            order_by (str, optional): 同 `list_files`。
+
+        Yields:
+            dict: 單一檔案或資料夾的元數據字典。
+        """
+        _check_page_size(page_size)
+        async for file_item in self._iter_query(_parents_query(folder_id), page_size, fields, prefetch=prefetch, order_by=order_by):
+            yield file_item
+
+    async def _iter_query(self, query: str, page_size: int, fields: str, prefetch: bool = False, order_by: str = None):
+        """
+        依序請求 files.list 的所有分頁並逐一產出項目。每頁於獨立的 `self.aiogoogle` 上下文中請求，
+        產出項目時不持有上下文。`prefetch` 為 True 時，下一頁會在產出本頁項目前以背景任務開始請求。
+        """
+        list_kwargs = {"orderBy": order_by} if order_by else {}
+
+        async def fetch_page(page_token):
             async with self.aiogoogle as google:
-                drive_v3 = await google.discover('drive', 'v3') # 發現 Drive API v3 版本
-                while True:
-                    # 構建查詢語句：'folder_id' in parents 表示尋找父資料夾為 folder_id 的項目，
-                    # and trashed=false 表示排除回收站中的項目。
-                    query = f"'{folder_id}' in parents and trashed=false"
-
-                    # 發起 API 請求
-                    # pageSize 最大為 1000，corpora="user" 指定查詢使用者擁有的檔案
-                    response = await google.as_service_account(
-                        drive_v3.files.list(
-                            q=query,
-                            pageSize=min(page_size, 1000), # 確保 pageSize 不超過 API 限制
-                            fields=fields,
-                            pageToken=page_token,
-                            corpora="user" # 通常用於服務帳號指定查詢哪個使用者的檔案空間，此處 "user" 指的是服務帳號自身可訪問的空間或其模擬的使用者
-                        )
+                drive_v3 = await self._drive(google) # 取得 (已快取的) Drive API v3 版本
+                # 發起 API 請求
+                # corpora="user" 指定查詢使用者擁有的檔案
+                return await self._send(
+                    google,
+                    drive_v3.files.list(
+                        q=query,
+                        pageSize=page_size,
+                        fields=fields,
+                        pageToken=page_token,
+                        corpora="user", # 通常用於服務帳號指定查詢哪個使用者的檔案空間，此處 "user" 指的是服務帳號自身可訪問的空間或其模擬的使用者
+                        spaces="drive", # 只查詢一般雲端硬碟空間，不掃描 appDataFolder
+                        **list_kwargs
                     )
-                    files = response.get('files', []) # 從回應中獲取檔案列表，如果沒有則為空列表
-                    all_files.extend(files) # 將當前頁的檔案添加到總列表中
+                )
 
-                    page_token = response.get('nextPageToken') # 獲取下一頁的權杖
-                    if not page_token: # 如果沒有下一頁權杖，表示所有項目都已列出
-                        break
-            logger.info(f"成功列出資料夾 '{folder_id}' 中的 {len(all_files)} 個項目。", extra={"props": {**log_props, "api_call_status": "success", "item_count": len(all_files)}})
-            return all_files
+        response = await fetch_page(None)
+        next_page = None # 預先請求下一頁的背景任務
+        try:
+            while True:
+                page_token = response.get('nextPageToken') # 獲取下一頁的權杖；沒有權杖表示所有項目都已列出
+                if page_token and prefetch:
+                    next_page = asyncio.create_task(fetch_page(page_token))
+                for file_item in response.get('files', []): # 從回應中獲取檔案列表，如果沒有則為空列表
+                    yield file_item
+                if not page_token:
+                    return
+                if next_page is not None:
+                    response, next_page = await next_page, None
+                else:
+                    response = await fetch_page(page_token)
+        finally:
+            if next_page is not None: # 呼叫者提前結束或發生錯誤時，取消尚未使用的預先請求
+                next_page.cancel()
+
+    async def list_files_parallel(self, folder_id: str = 'root', shard_field: str = 'mimeType', shards: list = None, page_size: int = MAX_PAGE_SIZE, fields: str = FIELDS_FULL, shard_count: int = DEFAULT_LISTING_SHARDS) -> list:
+        """
+        以多個互斥的查詢分片並行列出資料夾內容。
+
+        `list_files` 的分頁必須依序進行 (下一頁的權杖取決於上一頁的回應)，
+        在項目眾多的資料夾中，總耗時約為「頁數 × 往返延遲」。此方法將查詢按 `shard_field`
+        拆分為數個子查詢，各自獨立分頁並透過 `asyncio.gather` 並行執行，
+        總耗時縮減為最慢分片的耗時。合併時依 `id` 去重。
+
+        Args:
+            folder_id (str, optional): 要列出內容的資料夾 ID。預設為 'root'。
+            shard_field (str, optional): 用於產生預設分片的欄位。'mimeType' 分為「資料夾」與「非資料夾」兩組；
+                                         'modifiedTime' 會先以兩個 `pageSize=1` 的查詢取得最舊與最新的修改時間，
+                                         再將該區間等分為 `shard_count` 個互斥的時間範圍，適用於只含檔案的大型資料夾。
+            shards (list, optional): 自訂的分片條件列表，每個元素為一段 Drive 查詢語句
+                                     (例如 "modifiedTime < '2024-01-01T00:00:00'")，
+                                     會以 `and` 附加到基本查詢之後。提供時將忽略 `shard_field`。
+            page_size (int, optional): 每個分片每頁返回的項目數量上限。
+            fields (str, optional): 同 `list_files`。
+            shard_count (int, optional): `shard_field='modifiedTime'` 時的分片數，至少為 2。
+
+        Returns:
+            list: 去重後的檔案元數據字典列表。任一分片失敗時返回空列表 `[]`，與 `list_files` 的錯誤語意一致。
+
+        Raises:
+            ValueError: 如果未提供 `shards` 且 `shard_field` 不受支援。
+        """
+        _check_page_size(page_size)
+        if shards is None:
+            if shard_field == 'mimeType':
+                shards = [f"mimeType = '{FOLDER_MIME_TYPE}'", f"mimeType != '{FOLDER_MIME_TYPE}'"]
+            elif shard_field == 'modifiedTime':
+                if shard_count < 2:
+                    raise ValueError(f"shard_count 至少為 2，實際為 {shard_count}。")
+            else:
+                raise ValueError(f"不支援的分片欄位 '{shard_field}'，請改為提供 shards 參數。")
+        log_props = {"folder_id": folder_id, "shard_field": shard_field if shards is None else "custom", "page_size": page_size, "operation": "list_files_parallel", "api_call_status": "started"}
+        base_query = _parents_query(folder_id)
+        async def collect(query: str) -> list:
+            return [file_item async for file_item in self._iter_query(query, page_size, fields)]
+
+        try:
+            if shards is None: # 按 modifiedTime 分片，邊界須先查詢資料夾內的時間範圍
+                shards = await self._modified_time_shards(base_query, shard_count)
+            log_props["shard_count"] = len(shards)
+            logger.info("正在以 %s 個分片並行列出 Drive 資料夾 '%s' 中的檔案...", len(shards), folder_id, extra={"props": log_props})
+            shard_results = await asyncio.gather(*(collect(f"{base_query} and {shard}") for shard in shards))
         except Exception as e:
-            logger.error(f"列出 Drive 資料夾 '{folder_id}' 中的檔案時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props, "api_call_status": "exception", "error": str(e)}})
-            return [] # 發生錯誤時返回空列表
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            logger.error(f"並行列出 Drive 資料夾 '{folder_id}' 中的檔案時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
+            return []
+        merged = {}
+        for files in shard_results:
+            for file_item in files:
+                merged.setdefault(file_item.get('id'), file_item)
+        all_files = list(merged.values())
+        log_props["api_call_status"] = "success"
+        log_props["item_count"] = len(all_files)
+        logger.info("成功並行列出資料夾 '%s' 中的 %s 個項目。", folder_id, len(all_files), extra={"props": log_props})
+        return all_files
+
+    async def _modified_time_shards(self, query: str, shard_count: int) -> list:
+        """
+        並行查詢 `query` 範圍內最舊與最新的 `modifiedTime`，將其間等分為最多 `shard_count` 個互斥的查詢條件。
+        首尾分片不設下限/上限，列出期間才被修改的項目仍會落入某個分片；查詢結果為空時返回空列表。
+        """
+        async def probe(order_by: str):
+            async with self.aiogoogle as google:
+                drive_v3 = await self._drive(google)
+                response = await self._send(google, drive_v3.files.list(
+                    q=query, pageSize=1, fields="files(modifiedTime)", orderBy=order_by, corpora="user", spaces="drive"
+                ))
+            files = response.get('files', [])
+            return datetime.fromisoformat(files[0]['modifiedTime']) if files else None
+
+        oldest, newest = await asyncio.gather(probe("modifiedTime"), probe("modifiedTime desc"))
+        if oldest is None or newest is None:
+            return []
+        step = (newest - oldest) / shard_count
+        # Drive 查詢中的時間以 UTC 解讀；取到秒即可，邊界本身不必精確，只需前後分片使用同一個值
+        bounds = sorted({(oldest + step * i).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S") for i in range(1, shard_count)})
+        shards = [f"modifiedTime < '{bounds[0]}'"]
+        shards += [f"modifiedTime >= '{lower}' and modifiedTime < '{upper}'" for lower, upper in zip(bounds, bounds[1:])]
+        shards.append(f"modifiedTime >= '{bounds[-1]}'")
+        return shards
+
+    async def get_file_metadata(self, file_id: str, fields: str = DEFAULT_METADATA_FIELDS) -> dict | None:
+        """
+        獲取 Drive 項目的元數據，並以 `(file_id, fields)` 為鍵快取 `metadata_cache_ttl` 秒。
+
+        同一項目在短時間內被多次查詢時 (例如下載後再移動或刪除)，後續查詢直接使用快取，
+        省去重複的 `files.get` 往返。`delete_file`、`move_file` 等寫入操作成功後會使該項目的快取失效。
+
+        Args:
+            file_id (str): Drive 項目的 ID。
+            fields (str, optional): 要求返回的欄位。預設為 "mimeType,name,size,modifiedTime"。
+
+        Returns:
+            dict | None: 元數據字典的副本；查詢失敗時返回 None，詳細錯誤會記錄在日誌中。
+        """
+        key = (file_id, fields)
+        async with self._metadata_lock:
+            cached = self._metadata_cache.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    return dict(cached[1])
+                del self._metadata_cache[key]
+        try:
+            async with self.aiogoogle as google:
+                drive_v3 = await self._drive(google)
+                metadata = await self._send(google, drive_v3.files.get(fileId=file_id, fields=fields))
+        except Exception as e:
+            logger.error(
+                f"獲取 Drive 項目 ID '{file_id}' 的元數據時發生錯誤: {e}", exc_info=True,
+                extra={"props": {"file_id": file_id, "fields": fields, "operation": "get_file_metadata", "api_call_status": "exception", "error": str(e)}}
+            )
+            return None
+        if self._metadata_cache_ttl > 0:
+            async with self._metadata_lock:
+                self._metadata_cache[key] = (time.monotonic() + self._metadata_cache_ttl, metadata)
+        return dict(metadata)
 
-    async def download_file(self, file_id: str, destination_path: str) -> bool:
+    def _invalidate_metadata(self, file_ids):
+        """移除指定項目在元數據快取中所有欄位組合的項目。"""
+        file_ids = set(file_ids)
+        for key in [key for key in self._metadata_cache if key[0] in file_ids]:
+            del self._metadata_cache[key]
+
+    async def download_file(self, file_id: str, destination_path: str, skip_folder_check: bool = False,
+                            verify_checksum: bool = False) -> bool:
         """
         從 Google Drive 下載指定 ID 的檔案到本地路徑。
 
@@ -210,57 +1027,236 @@ class GoogleDriveService:
         Args:
             file_id (str): 要下載的 Google Drive 檔案的 ID。
             destination_path (str): 檔案下載到本地的完整路徑 (包含檔案名)。
+            skip_folder_check (bool, optional): 若呼叫者已確定 `file_id` 不是資料夾，設為 True 可省略
+                                                元數據預先查詢，直接發出 `alt="media"` 請求，
+                                                將一次下載所需的 HTTPS 往返從兩次減為一次。
+                                                此時不會使用分段並行下載 (因為未知檔案大小)，
+                                                若 ID 實際上是資料夾，錯誤會由 API 的 4xx 回應呈現。預設為 False。
+            verify_checksum (bool, optional): 設為 True 時會連同 `sha256Checksum` / `md5Checksum` 一起查詢元數據，
+                                              並在下載完成後比對本地檔案的雜湊值；不符時刪除檔案並返回 False。
+                                              此選項需要元數據，因此會忽略 `skip_folder_check`。預設為 False。
 
         Returns:
             bool: 如果檔案成功下載並儲存到 `destination_path`，則返回 True。
                   如果在任何步驟中發生錯誤 (例如，檔案是資料夾、API 請求失敗、檔案寫入失敗)，
                   則返回 False。詳細錯誤會記錄在日誌中。
         """
-        log_props = {"file_id": file_id, "destination_path": destination_path, "operation": "download_file"}
-        logger.info(f"準備從 Drive 下載檔案 ID '{file_id}' 到 '{destination_path}'...", extra={"props": {**log_props, "api_call_status": "started"}})
+        if verify_checksum:
+            return await self._download_verified(file_id, destination_path, None)
+        return await self._download(file_id, destination_path, {} if skip_folder_check else None)
+
+    async def download_file_with_metadata(self, file_id: str, destination_path: str, metadata: dict,
+                                          verify_checksum: bool = False) -> bool:
+        """
+        使用呼叫者已持有的元數據下載檔案，省略 `download_file` 的元數據預先查詢。
+
+        適用於剛透過 `list_files` / `iter_files` 列出資料夾的呼叫者：直接傳入列表中的項目字典，
+        即可在單次 HTTPS 往返內完成下載。若元數據包含 `size` 欄位 (需在 `fields` 中請求)，
+        大型檔案仍會使用分段並行下載。
+
+        Args:
+            file_id (str): 要下載的 Google Drive 檔案的 ID。
+            destination_path (str): 檔案下載到本地的完整路徑 (包含檔案名)。
+            metadata (dict): 檔案的元數據字典，至少應包含 `mimeType`；`name` 與 `size` 為選用。
+            verify_checksum (bool, optional): 與 `download_file` 相同；若 `metadata` 不含校驗碼欄位，會額外查詢一次元數據。
+
+        Returns:
+            bool: 與 `download_file` 相同。
+        """
+        if verify_checksum:
+            return await self._download_verified(file_id, destination_path, metadata)
+        return await self._download(file_id, destination_path, metadata)
+
+    async def _download_verified(self, file_id: str, destination_path: str, file_metadata: dict | None) -> bool:
+        """下載檔案後比對 Drive 提供的校驗碼；`file_metadata` 缺少校驗碼欄位時會先重新查詢。"""
+        log_props = {"file_id": file_id, "destination_path": destination_path, "operation": "verify_checksum"}
+        if file_metadata is None or not ("sha256Checksum" in file_metadata or "md5Checksum" in file_metadata):
+            file_metadata = await self.get_file_metadata(file_id, CHECKSUM_METADATA_FIELDS)
+            if file_metadata is None:
+                log_props["error"] = "metadata_unavailable"
+                logger.error(f"無法獲取檔案 ID '{file_id}' 的校驗碼元數據，下載已中止。", extra={"props": log_props})
+                return False
+        if not await self._download(file_id, destination_path, file_metadata):
+            return False
+
+        expected = _expected_checksum(file_metadata)
+        if expected is None: # Google 文件等原生格式沒有二進位內容的校驗碼
+            logger.info("檔案 ID '%s' 沒有可用的校驗碼，略過完整性驗證。", file_id, extra={"props": {**log_props, "verification": "skipped"}})
+            return True
+        algorithm, expected_digest = expected
+        log_props["algorithm"] = algorithm
+        try:
+            # hashlib 在處理大區塊時會釋放 GIL，且剛寫入的檔案通常仍在頁面快取中，於工作執行緒計算不會阻塞事件迴圈
+            actual_digest = await asyncio.to_thread(_hash_file, destination_path, algorithm)
+        except OSError as e:
+            log_props["error"] = str(e)
+            logger.error(f"計算檔案 '{destination_path}' 的雜湊值時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
+            await _remove_quietly(destination_path)
+            return False
+        if actual_digest != expected_digest:
+            log_props.update({"verification": "mismatch", "expected": expected_digest, "actual": actual_digest})
+            logger.error(f"檔案 ID '{file_id}' 的 {algorithm} 校驗碼不符，已刪除 '{destination_path}'。", extra={"props": log_props})
+            await _remove_quietly(destination_path)
+            return False
+        logger.info("檔案 ID '%s' 已通過 %s 完整性驗證。", file_id, algorithm, extra={"props": {**log_props, "verification": "success"}})
+        return True
+
+    async def _download(self, file_id: str, destination_path: str, file_metadata: dict | None) -> bool:
+        """`download_file` 系列方法的共用實作；`file_metadata` 為 None 時會先向 API 查詢元數據。"""
+        log_props = {"file_id": file_id, "destination_path": destination_path, "operation": "download_file", "api_call_status": "started"}
+        download_started = False # 是否已發出會寫入 destination_path 的串流下載請求
+        logger.info("準備從 Drive 下載檔案 ID '%s' 到 '%s'...", file_id, destination_path, extra={"props": log_props})
+        # 步驟 1: 獲取檔案元數據，特別是 MIME 類型和名稱，用於檢查和日誌 (呼叫者已提供時略過；短時間內的重複查詢由快取提供)
+        if file_metadata is None:
+            file_metadata = await self.get_file_metadata(file_id)
+            if file_metadata is None:
+                log_props["api_call_status"] = "failure"
+                log_props["error"] = "metadata_unavailable"
+                logger.error(f"無法獲取檔案 ID '{file_id}' 的元數據，下載已中止。", extra={"props": log_props})
+                return False
         try:
             async with self.aiogoogle as google:
-                drive_v3 = await google.discover('drive', 'v3')
+                drive_v3 = await self._drive(google)
 
-                # 步驟 1: 獲取檔案元數據，特別是 MIME 類型和名稱，用於檢查和日誌
-                file_metadata_req = drive_v3.files.get(fileId=file_id, fields="mimeType, name")
-                file_metadata = await google.as_service_account(file_metadata_req)
-                file_name_for_log = file_metadata.get('name', 'UnknownName') # 用於日誌的檔案名
+                # 用於日誌的檔案名；略過元數據查詢時沒有 Drive 上的名稱，改用本地目標檔名
+                file_name_for_log = file_metadata.get('name') or os.path.basename(destination_path)
                 log_props["file_name"] = file_name_for_log
 
                 # 步驟 2: 檢查是否為資料夾，資料夾不能直接下載
-                if file_metadata.get('mimeType') == 'application/vnd.google-apps.folder':
-                    logger.error(f"錯誤：項目 ID '{file_id}' (名稱: '{file_name_for_log}') 是一個資料夾，無法直接下載。", extra={"props": {**log_props, "error": "cannot_download_folder"}})
+                if file_metadata.get('mimeType') == FOLDER_MIME_TYPE:
+                    log_props["error"] = "cannot_download_folder"
+                    logger.error(f"錯誤：項目 ID '{file_id}' (名稱: '{file_name_for_log}') 是一個資料夾，無法直接下載。", extra={"props": log_props})
                     return False
 
                 # 步驟 3: 確保目標本地資料夾存在
                 dest_dir = os.path.dirname(destination_path)
                 if dest_dir: # 僅當 destination_path 包含目錄時才創建
-                    os.makedirs(dest_dir, exist_ok=True) # 如果資料夾已存在，exist_ok=True 會避免拋出錯誤
+                    await self._ensure_local_dir(dest_dir)
 
-                # 步驟 4: 準備並執行檔案下載請求
+                # 步驟 4a: 大型檔案改以多個 HTTP Range 請求並行下載，突破單一連線的頻寬限制
+                file_size = int(file_metadata.get('size') or 0) # Google 文件等原生格式沒有 size 欄位
+                if file_size >= RANGED_DOWNLOAD_THRESHOLD:
+                    log_props["file_size_bytes"] = file_size
+                    if await self._download_file_ranges(google, drive_v3, file_id, destination_path, file_size):
+                        log_props["api_call_status"] = "success"
+                        log_props["download_mode"] = "ranged"
+                        logger.info("檔案 ID '%s' ('%s') 已透過分段並行下載到 '%s'。", file_id, file_name_for_log, destination_path, extra={"props": log_props})
+                        return True
+                    log_props["api_call_status"] = "failure"
+                    log_props["download_mode"] = "ranged"
+                    logger.error(f"分段並行下載檔案 ID '{file_id}' ('{file_name_for_log}') 失敗。", extra={"props": log_props})
+                    return False
+
+                # 步驟 4b: 準備並執行檔案下載請求
                 # `alt="media"` 表示我們要下載檔案內容
-                # `download_file=destination_path` 讓 aiogoogle 直接將回應流寫入到指定檔案
+                # `download_file=destination_path` 讓 aiogoogle 以 1 MiB 分塊 (`iter_chunked`) 將回應流寫入到指定檔案，
+                # 記憶體用量與檔案大小無關；失敗時 aiogoogle 可能已寫入部分內容或錯誤回應主體，需由下方清理
+                download_started = True
                 download_req = drive_v3.files.get(fileId=file_id, alt="media", download_file=destination_path)
                 # `full_res=True` 讓我們可以訪問完整的 HTTP 回應對象，包括狀態碼
-                response = await google.as_service_account(download_req, full_res=True)
+                response = await self._send(google, download_req, full_res=True)
 
                 # 步驟 5: 檢查 HTTP 狀態碼以確認下載是否成功
                 if response.status_code == 200:
-                    logger.info(f"檔案 ID '{file_id}' ('{file_name_for_log}') 已成功下載到 '{destination_path}'。", extra={"props": {**log_props, "api_call_status": "success"}})
+                    log_props["api_call_status"] = "success"
+                    logger.info("檔案 ID '%s' ('%s') 已成功下載到 '%s'。", file_id, file_name_for_log, destination_path, extra={"props": log_props})
                     return True
                 else:
                     # 如果狀態碼不是 200，記錄錯誤詳情
                     error_content = await response.text() # 獲取錯誤回應的文本內容
+                    log_props["api_call_status"] = "failure"
+                    log_props["status_code"] = response.status_code
+                    log_props["response_text"] = error_content
                     logger.error(
                         f"下載檔案 ID '{file_id}' ('{file_name_for_log}') 失敗。狀態碼: {response.status_code}, 回應: {error_content}",
-                        extra={"props": {**log_props, "api_call_status": "failure", "status_code": response.status_code, "response_text": error_content}}
+                        extra={"props": log_props}
                     )
+                    await _remove_quietly(destination_path)
                     return False
         except Exception as e: # 捕獲其他潛在錯誤，例如網路問題或 aiogoogle 內部錯誤
-            logger.error(f"下載檔案 ID '{file_id}' 時發生未預期錯誤: {e}", exc_info=True, extra={"props": {**log_props, "api_call_status": "exception", "error": str(e)}})
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            reasons = _error_reasons(e.res) & NOT_DOWNLOADABLE_REASONS if isinstance(e, HTTPError) else set()
+            if reasons:
+                # 略過元數據預檢時，資料夾或原生格式檔案會在此由 API 回報；屬於可預期的結果，不記錄堆疊
+                log_props["api_call_status"] = "failure"
+                log_props["error"] = "not_downloadable"
+                log_props["error_reasons"] = sorted(reasons)
+                logger.error(f"項目 ID '{file_id}' 無法以 alt=media 下載 (可能是資料夾或 Google 文件原生格式): {sorted(reasons)}", extra={"props": log_props})
+            else:
+                logger.error(f"下載檔案 ID '{file_id}' 時發生未預期錯誤: {e}", exc_info=True, extra={"props": log_props})
+            if download_started: # 避免留下被截斷的檔案或被寫入的錯誤回應主體
+                await _remove_quietly(destination_path)
+            self._known_dirs.pop(os.path.dirname(destination_path), None) # 資料夾可能已被外部刪除，下次重新確認
             return False
 
+    async def _ensure_local_dir(self, dir_path: str):
+        """
+        確保本地資料夾存在。已確認過的資料夾記錄在有上限的 LRU 中，批量下載到同一資料夾時只需呼叫一次 makedirs；
+        建立操作在工作執行緒中進行，避免阻塞事件迴圈上其他並行的 Drive 操作。
+        並行下載到同一個尚未確認的資料夾時，共用同一個進行中的建立任務，而不是各自呼叫 makedirs。
+        """
+        if dir_path in self._known_dirs:
+            self._known_dirs.move_to_end(dir_path)
+            return
+        creation = self._dir_creations.get(dir_path)
+        if creation is None:
+            # 如果資料夾已存在，exist_ok=True 會避免拋出錯誤
+            creation = self._dir_creations[dir_path] = asyncio.ensure_future(asyncio.to_thread(os.makedirs, dir_path, exist_ok=True))
+            creation.add_done_callback(lambda _: self._dir_creations.pop(dir_path, None))
+        await asyncio.shield(creation) # 單一等待者被取消時，不影響其他共用此任務的下載
+        self._known_dirs[dir_path] = None
+        if len(self._known_dirs) > KNOWN_DIRS_CACHE_SIZE:
+            self._known_dirs.popitem(last=False)
+
+    async def _download_file_ranges(self, google, drive_v3, file_id: str, destination_path: str, file_size: int) -> bool:
+        """
+        以 `DOWNLOAD_CHUNK_SIZE` 為單位，將檔案拆分為多個 `Range: bytes=start-end` 請求並行下載。
+
+        目標檔案會先以 `_open_preallocated` 預先配置為完整大小，各分段再透過 `_RangeWriter` 以批次 `pwrite`
+        寫入各自的位移，並以 `asyncio.Semaphore(MAX_PARALLEL_RANGES)` 限制同時連線數。
+        單一分段遇到暫時性錯誤時，會以新的寫入器從該分段起點重新請求 (最多 `MAX_REQUEST_RETRIES` 次)，
+        不必重新下載整個檔案。任一分段最終未返回 206 (Partial Content) 或發生錯誤即視為失敗，並刪除不完整的檔案。
+        呼叫者需已進入 `self.aiogoogle` 的上下文。
+        """
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_RANGES)
+        fd = await asyncio.to_thread(_open_preallocated, destination_path, file_size)
+        succeeded = False
+        try:
+            async def fetch_range(start: int) -> bool:
+                end = min(start + DOWNLOAD_CHUNK_SIZE, file_size) - 1
+                attempt = 0
+                while True:
+                    # 每次嘗試都使用從分段起點寫入的新寫入器，讓重送的資料覆蓋先前不完整的寫入
+                    writer = _RangeWriter(fd, start)
+                    range_req = drive_v3.files.get(fileId=file_id, alt="media", pipe_to=writer)
+                    range_req.headers["Range"] = f"bytes={start}-{end}"
+                    try:
+                        async with semaphore:
+                            response = await self._send(google, range_req, max_retries=0, full_res=True)
+                    except Exception as e:
+                        if attempt >= MAX_REQUEST_RETRIES or not _is_retryable_error(e):
+                            raise
+                        attempt += 1
+                        await asyncio.sleep(_backoff_delay(attempt))
+                        continue
+                    if response.status_code != 206:
+                        return False
+                    await writer.flush()
+                    return True
+
+            # return_exceptions=True：等待所有分段結束後才關閉檔案描述符，避免仍在進行的分段寫入已關閉 (或被重用) 的 fd
+            results = await asyncio.gather(*(fetch_range(start) for start in range(0, file_size, DOWNLOAD_CHUNK_SIZE)), return_exceptions=True)
+            error = next((result for result in results if isinstance(result, BaseException)), None)
+            if error is not None:
+                raise error
+            succeeded = all(results)
+        finally:
+            os.close(fd)
+            if not succeeded:
+                await _remove_quietly(destination_path)
+        return succeeded
+
     async def upload_file(self, local_file_path: str, folder_id: str = None, file_name: str = None) -> str | None:
         """
         將本地檔案上傳到指定的 Google Drive 資料夾。
@@ -272,8 +1268,8 @@ class GoogleDriveService:
         3. 構造檔案元數據，包括檔案名和父資料夾 ID (如果提供)。
         4. 使用 Google Drive API 的 `files.create` 方法上傳檔案。
            `aiogoogle` 會自動處理 MIME 類型檢測和實際的檔案內容傳輸。
-           (注意: `aiogoogle` 預設使用簡單上傳。對於非常大的檔案，可能需要考慮可續傳上傳，
-           但这需要更複雜的實現，目前此方法未直接支持。)
+           超過 `RESUMABLE_UPLOAD_THRESHOLD` (5 MB) 的檔案改用可續傳上傳 (`_upload_file_resumable`)，
+           以分塊串流傳輸，並可在暫時性錯誤後從中斷處續傳。
         5. 請求 API 在回應中返回新創建檔案的 ID 和名稱。
 
         Args:
@@ -292,12 +1288,16 @@ class GoogleDriveService:
         drive_file_name = file_name if file_name else os.path.basename(local_file_path)
         log_props = {"local_file_path": local_file_path, "target_folder_id": folder_id, "drive_file_name": drive_file_name, "operation": "upload_file"}
 
-        # 步驟 1: 檢查本地檔案是否存在
-        if not os.path.exists(local_file_path):
-            logger.error(f"本地檔案 '{local_file_path}' 未找到，無法上傳。", extra={"props": {**log_props, "error": "local_file_not_found"}})
+        # 步驟 1: 檢查本地檔案是否存在並取得大小；單次 os.stat 在工作執行緒中執行，避免阻塞事件迴圈
+        try:
+            file_size = (await asyncio.to_thread(os.stat, local_file_path)).st_size
+        except (FileNotFoundError, NotADirectoryError):
+            log_props["error"] = "local_file_not_found"
+            logger.error(f"本地檔案 '{local_file_path}' 未找到，無法上傳。", extra={"props": log_props})
             return None
 
-        logger.info(f"準備將本地檔案 '{local_file_path}' 作為 '{drive_file_name}' 上傳到 Drive 資料夾 ID '{folder_id}'...", extra={"props": {**log_props, "api_call_status": "started"}})
+        log_props["api_call_status"] = "started"
+        logger.info("準備將本地檔案 '%s' 作為 '%s' 上傳到 Drive 資料夾 ID '%s'...", local_file_path, drive_file_name, folder_id, extra={"props": log_props})
 
         # 步驟 2: 準備檔案元數據
         file_metadata = {'name': drive_file_name}
@@ -306,60 +1306,217 @@ class GoogleDriveService:
 
         try:
             async with self.aiogoogle as google:
-                drive_v3 = await google.discover('drive', 'v3')
+                drive_v3 = await self._drive(google)
                 # 步驟 3: 執行上傳操作
-                # `upload_file` 參數指向本地檔案路徑，aiogoogle 會處理檔案讀取和傳輸
+                # `upload_file` 參數指向本地檔案路徑，aiogoogle 會透過 aiofiles 非同步讀取並傳輸檔案
                 # `json` 參數包含檔案的元數據
                 # `fields` 參數指定我們希望從 API 回應中獲取哪些關於新檔案的資訊
-                response = await google.as_service_account(
-                    drive_v3.files.create(upload_file=local_file_path, json=file_metadata, fields='id, name')
-                )
+                if file_size > RESUMABLE_UPLOAD_THRESHOLD:
+                    # 大型檔案使用可續傳上傳：分塊串流，暫時性網路錯誤只需重傳失敗的分塊
+                    log_props["upload_mode"] = "resumable"
+                    response = await self._upload_file_resumable(google, local_file_path, file_metadata, file_size)
+                else:
+                    # files.create 不具冪等性：逾時或 5xx 時 Drive 可能已建立檔案，重送會產生重複的歸檔檔案，因此不重試
+                    response = await self._send(
+                        google, drive_v3.files.create(upload_file=local_file_path, json=file_metadata, fields='id, name'), max_retries=0
+                    )
 
             # 步驟 4: 檢查回應並提取檔案 ID
             uploaded_file_id = response.get('id')
             if uploaded_file_id:
-                logger.info(f"檔案 '{drive_file_name}' 已成功上傳到 Drive。新檔案 ID: {uploaded_file_id}", extra={"props": {**log_props, "api_call_status": "success", "uploaded_file_id": uploaded_file_id}})
+                log_props["api_call_status"] = "success"
+                log_props["uploaded_file_id"] = uploaded_file_id
+                logger.info("檔案 '%s' 已成功上傳到 Drive。新檔案 ID: %s", drive_file_name, uploaded_file_id, extra={"props": log_props})
+                self.invalidate_listing_cache()
                 return uploaded_file_id
             else:
                 # 雖然不太可能在成功請求後沒有 ID，但作為預防措施進行檢查
-                logger.error(f"上傳檔案 '{drive_file_name}' 失敗。Drive API 未返回檔案 ID。回應: {response}", extra={"props": {**log_props, "api_call_status": "failure_no_id", "response": str(response)}})
+                log_props["api_call_status"] = "failure_no_id"
+                log_props["response"] = _LazyStr(response)
+                logger.error("上傳檔案 '%s' 失敗。Drive API 未返回檔案 ID。回應: %s", drive_file_name, log_props["response"], extra={"props": log_props})
                 return None
         except Exception as e: # 捕獲 API 請求錯誤或其他異常
-            logger.error(f"上傳檔案 '{drive_file_name}' 時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props, "api_call_status": "exception", "error": str(e)}})
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            logger.error(f"上傳檔案 '{drive_file_name}' 時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
             return None
 
+    async def _upload_file_resumable(self, google, local_file_path: str, file_metadata: dict, file_size: int) -> dict:
+        """
+        以 Drive 可續傳上傳協定 (`uploadType=resumable`) 上傳檔案。
+
+        先以檔案元數據建立上傳工作階段 (回應的 `Location` 標頭即為工作階段 URL)，
+        再逐塊讀取檔案，以 `PUT` 與 `Content-Range: bytes X-Y/總長度` 依序送出。
+        送出第 N 塊的同時，會在工作執行緒中以 `os.pread` 預先讀取第 N+1 塊，使磁碟讀取與網路傳送重疊，
+        記憶體用量約為 2 × `UPLOAD_CHUNK_SIZE`。分塊發生網路錯誤、429 或 5xx 時，
+        以帶抖動的指數退避等待後，向工作階段查詢伺服器已接收的位元組範圍並從該處續傳。
+        若工作階段已過期 (404/410)，會建立一次新的工作階段並從頭重新上傳。
+        呼叫者需已進入 `self.aiogoogle` 的上下文。
+
+        Returns:
+            dict: 上傳完成時 API 返回的檔案資源 (包含 `id` 與 `name`)。
+
+        Raises:
+            RuntimeError: 如果無法建立上傳工作階段。
+            Exception: 不可重試的錯誤，或重試次數用盡時的最後一個錯誤。
+        """
+        async def start_session() -> str:
+            init_req = Request(
+                method="POST",
+                url=f"{DRIVE_UPLOAD_URL}?uploadType=resumable&fields=id,name",
+                headers={"X-Upload-Content-Length": str(file_size)},
+                json=file_metadata,
+            )
+            # 重送建立工作階段的 POST 只會產生另一個未使用的工作階段，不會產生重複檔案，因此可安全重試
+            init_res = await self._send(google, init_req, full_res=True)
+            location = init_res.headers.get("Location")
+            if not location:
+                raise RuntimeError("可續傳上傳未返回工作階段 URL (Location 標頭)。")
+            return location
+
+        session_url = await start_session()
+        session_restarted = False
+        offset = 0
+        attempt = 0
+        read_ahead = None # (位移, 預先讀取下一塊的任務)
+        # os.pread 不使用共用的檔案位置，預讀任務與目前分塊的讀取不會互相干擾
+        fd = await asyncio.to_thread(os.open, local_file_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            while True:
+                try:
+                    if offset >= file_size:
+                        # 所有位元組都已被接收，但尚未取得最終回應：查詢工作階段狀態以取得檔案資源
+                        response = await self._send(
+                            google, Request(method="PUT", url=session_url, headers={"Content-Range": f"bytes */{file_size}"}),
+                            max_retries=0, full_res=True,
+                        )
+                    else:
+                        if read_ahead is not None and read_ahead[0] == offset:
+                            chunk = await read_ahead[1]
+                        else: # 伺服器要求從其他位移續傳 (或尚無預讀)，捨棄預讀結果並重新讀取
+                            if read_ahead is not None:
+                                await asyncio.gather(read_ahead[1], return_exceptions=True)
+                            chunk = await asyncio.to_thread(os.pread, fd, UPLOAD_CHUNK_SIZE, offset)
+                        read_ahead = None
+                        next_offset = offset + len(chunk)
+                        if next_offset < file_size:
+                            read_ahead = (next_offset, asyncio.ensure_future(asyncio.to_thread(os.pread, fd, UPLOAD_CHUNK_SIZE, next_offset)))
+                        response = await self._send(
+                            google, Request(method="PUT", url=session_url, headers={"Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{file_size}"}, data=chunk),
+                            max_retries=0, full_res=True,
+                        )
+                except Exception as e:
+                    status_code = e.res.status_code if isinstance(e, HTTPError) and e.res is not None else None
+                    if status_code in (404, 410) and not session_restarted:
+                        # 工作階段已過期，伺服器不再保留已接收的資料：建立新的工作階段並從頭上傳 (僅一次)
+                        logger.warning(
+                            f"可續傳上傳 '{local_file_path}' 的工作階段已過期 (HTTP {status_code})，將建立新的工作階段並重新上傳。",
+                            extra={"props": {"local_file_path": local_file_path, "operation": "upload_file_resumable", "offset": offset, "status_code": status_code}}
+                        )
+                        session_restarted = True
+                        session_url = await start_session()
+                        offset = 0
+                        attempt = 0
+                        continue
+                    attempt += 1
+                    if not _is_retryable_error(e) or attempt > UPLOAD_CHUNK_MAX_RETRIES:
+                        raise
+                    delay = _backoff_delay(attempt)
+                    logger.warning(
+                        f"可續傳上傳 '{local_file_path}' 在位移 {offset} 處失敗 ({e})，{delay:.1f} 秒後進行第 {attempt} 次重試。",
+                        extra={"props": {"local_file_path": local_file_path, "operation": "upload_file_resumable", "offset": offset, "attempt": attempt, "error": str(e)}}
+                    )
+                    await asyncio.sleep(delay)
+                    try:
+                        response = await self._send(
+                            google, Request(method="PUT", url=session_url, headers={"Content-Range": f"bytes */{file_size}"}),
+                            max_retries=0, full_res=True,
+                        )
+                    except Exception:
+                        continue # 狀態查詢也失敗時，保留原位移並進入下一次重試
+                else:
+                    attempt = 0
+                if response.status_code in (200, 201):
+                    return response.json or {}
+                # 308 Resume Incomplete：`Range: bytes=0-N` 表示伺服器已接收到第 N 個位元組
+                received_range = response.headers.get("Range")
+                offset = int(received_range.rsplit("-", 1)[1]) + 1 if received_range else 0
+        finally:
+            if read_ahead is not None: # 先等待進行中的預讀結束，再關閉其使用的檔案描述符
+                await asyncio.gather(read_ahead[1], return_exceptions=True)
+            await asyncio.to_thread(os.close, fd)
+
+    async def upload_many(self, local_file_paths: list, folder_id: str = None, concurrency: int = DEFAULT_UPLOAD_CONCURRENCY) -> list:
+        """
+        並行上傳多個本地檔案到同一個 Drive 資料夾，同時進行的上傳數量以 `asyncio.Semaphore(concurrency)` 限制。
+
+        每個檔案各自透過 `upload_file` 上傳，因此單一檔案失敗不影響其他檔案，
+        遇到速率限制 (429 / 403 rateLimitExceeded) 時也會各自退避重試。
+
+        Args:
+            local_file_paths (list): 要上傳的本地檔案路徑列表。
+            folder_id (str, optional): 目標 Drive 資料夾 ID。預設為 None (根目錄)。
+            concurrency (int, optional): 同時進行的上傳數量上限。預設為 4。
+
+        Returns:
+            list: 與 `local_file_paths` 順序一致的列表，每個元素為上傳後的檔案 ID，失敗時為 None。
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def upload_one(local_file_path: str) -> str | None:
+            async with semaphore:
+                return await self.upload_file(local_file_path, folder_id=folder_id)
+
+        return await asyncio.gather(*(upload_one(path) for path in local_file_paths))
+
     async def create_folder(self, folder_name: str, parent_folder_id: str = None) -> str | None:
-        log_props = {"folder_name": folder_name, "parent_folder_id": parent_folder_id, "operation": "create_folder"}
-        logger.info(f"準備在父資料夾 ID '{parent_folder_id if parent_folder_id else 'root'}' 下創建資料夾 '{folder_name}'...", extra={"props": {**log_props, "api_call_status": "started"}})
+        log_props = {"folder_name": folder_name, "parent_folder_id": parent_folder_id, "operation": "create_folder", "api_call_status": "started"}
+        logger.info("準備在父資料夾 ID '%s' 下創建資料夾 '%s'...", parent_folder_id if parent_folder_id else 'root', folder_name, extra={"props": log_props})
         file_metadata = {'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}
         if parent_folder_id:
             file_metadata['parents'] = [parent_folder_id]
         try:
             async with self.aiogoogle as google:
-                drive_v3 = await google.discover('drive', 'v3')
-                folder = await google.as_service_account(drive_v3.files.create(json=file_metadata, fields='id, name'))
+                drive_v3 = await self._drive(google)
+                # files.create 不具冪等性，重送可能建立重複的資料夾，因此不重試
+                folder = await self._send(google, drive_v3.files.create(json=file_metadata, fields='id, name'), max_retries=0)
             folder_id_created = folder.get('id')
             if folder_id_created:
-                logger.info(f"資料夾 '{folder_name}' (ID: {folder_id_created}) 已成功創建。", extra={"props": {**log_props, "api_call_status": "success", "created_folder_id": folder_id_created}})
+                log_props["api_call_status"] = "success"
+                log_props["created_folder_id"] = folder_id_created
+                logger.info("資料夾 '%s' (ID: %s) 已成功創建。", folder_name, folder_id_created, extra={"props": log_props})
+                self.invalidate_listing_cache()
                 return folder_id_created
             else:
-                logger.error(f"創建資料夾 '{folder_name}' 失敗。Drive API 未返回 ID。回應: {folder}", extra={"props": {**log_props, "api_call_status": "failure_no_id", "response": str(folder)}})
+                log_props["api_call_status"] = "failure_no_id"
+                log_props["response"] = _LazyStr(folder)
+                logger.error("創建資料夾 '%s' 失敗。Drive API 未返回 ID。回應: %s", folder_name, log_props["response"], extra={"props": log_props})
                 return None
         except Exception as e:
-            logger.error(f"創建資料夾 '{folder_name}' 時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props, "api_call_status": "exception", "error": str(e)}})
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            logger.error(f"創建資料夾 '{folder_name}' 時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
             return None
 
     async def delete_file(self, file_id: str) -> bool:
-        log_props = {"file_id": file_id, "operation": "delete_file"}
-        logger.info(f"準備永久刪除 Drive 項目 ID '{file_id}'...", extra={"props": {**log_props, "api_call_status": "started"}})
+        log_props = {"file_id": file_id, "operation": "delete_file", "api_call_status": "started"}
+        logger.info("準備永久刪除 Drive 項目 ID '%s'...", file_id, extra={"props": log_props})
         try:
             async with self.aiogoogle as google:
-                drive_v3 = await google.discover('drive', 'v3')
-                await google.as_service_account(drive_v3.files.delete(fileId=file_id))
-            logger.info(f"項目 ID '{file_id}' 已從 Drive 永久刪除。", extra={"props": {**log_props, "api_call_status": "success"}})
+                drive_v3 = await self._drive(google)
+                if not self._coalesce_writes:
+                    await self._send(google, drive_v3.files.delete(fileId=file_id))
+            if self._coalesce_writes:
+                await self._send_coalesced(drive_v3.files.delete(fileId=file_id), (200, 204))
+            log_props["api_call_status"] = "success"
+            logger.info("項目 ID '%s' 已從 Drive 永久刪除。", file_id, extra={"props": log_props})
+            self.invalidate_listing_cache()
+            self._invalidate_metadata([file_id])
             return True
         except Exception as e:
-            logger.error(f"刪除 Drive 項目 ID '{file_id}' 時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props, "api_call_status": "exception", "error": str(e)}})
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            logger.error(f"刪除 Drive 項目 ID '{file_id}' 時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
             return False
 
     async def move_file(self, file_id: str, new_parent_folder_id: str, old_parent_folder_id: str = None) -> bool:
@@ -384,45 +1541,198 @@ class GoogleDriveService:
                                                   以完成真正的“移動”操作。預設為 None。
 
         Returns:
-            bool: 如果檔案成功更新其父資料夾列表以包含新的父資料夾，則返回 True。
-                  如果 API 請求失敗，或者更新後的回應未確認新的父資料夾關係，則返回 False。
-                  詳細錯誤會記錄在日誌中。
+            bool: 如果 `files.update` 請求成功 (HTTP 2xx)，則返回 True。
+                  請求僅要求回應包含 `id`，不再取回完整的父資料夾列表 (在共用雲端硬碟上可能很大)；
+                  如需檢查父資料夾，請另行以 `files.get(fields='parents')` 查詢。
+                  如果 API 請求失敗，則返回 False。詳細錯誤會記錄在日誌中。
         """
-        log_props = {"file_id": file_id, "new_parent_folder_id": new_parent_folder_id, "old_parent_folder_id": old_parent_folder_id, "operation": "move_file"}
-        logger.info(f"準備將檔案 ID '{file_id}' 移動到資料夾 ID '{new_parent_folder_id}'...", extra={"props": {**log_props, "api_call_status": "started"}})
+        log_props = {"file_id": file_id, "new_parent_folder_id": new_parent_folder_id, "old_parent_folder_id": old_parent_folder_id, "operation": "move_file", "api_call_status": "started"}
+        logger.info("準備將檔案 ID '%s' 移動到資料夾 ID '%s'...", file_id, new_parent_folder_id, extra={"props": log_props})
 
         try:
             async with self.aiogoogle as google:
-                drive_v3 = await google.discover('drive', 'v3')
+                drive_v3 = await self._drive(google)
 
                 # 準備 files.update 方法的參數
                 update_kwargs = {
                     'fileId': file_id,
                     'addParents': new_parent_folder_id, # 指定要添加的新父資料夾
-                    'fields': 'id, parents' # 要求 API 返回更新後的檔案 ID 和父資料夾列表，以便驗證
+                    'fields': 'id' # 僅要求返回檔案 ID，減少回應大小；成功與否由 HTTP 狀態判斷
                 }
                 if old_parent_folder_id:
                     # 如果提供了舊父資料夾 ID，則添加到參數中以移除
                     update_kwargs['removeParents'] = old_parent_folder_id
 
-                # 執行更新操作
-                updated_file = await google.as_service_account(drive_v3.files.update(**update_kwargs))
+                # 執行更新操作；非 2xx 回應會拋出 HTTPError，由下方的 except 處理
+                if not self._coalesce_writes:
+                    await self._send(google, drive_v3.files.update(**update_kwargs))
+            if self._coalesce_writes:
+                await self._send_coalesced(drive_v3.files.update(**update_kwargs), (200,))
 
-            # 驗證更新是否成功：檢查新的父資料夾 ID 是否出現在返回的父資料夾列表中
-            if new_parent_folder_id in updated_file.get('parents', []):
-                logger.info(f"檔案 ID '{file_id}' 已成功移動到資料夾 ID '{new_parent_folder_id}'。", extra={"props": {**log_props, "api_call_status": "success", "updated_parents": updated_file.get('parents')}})
-                return True
-            else:
-                # 如果 API 成功執行但父資料夾列表未按預期更新，記錄錯誤
-                logger.error(f"移動檔案 ID '{file_id}' 失敗。更新後的父資料夾列表: {updated_file.get('parents')}。回應: {updated_file}", extra={"props": {**log_props, "api_call_status": "failure_parents_not_updated", "response": str(updated_file)}})
-                return False
+            log_props["api_call_status"] = "success"
+            logger.info("檔案 ID '%s' 已成功移動到資料夾 ID '%s'。", file_id, new_parent_folder_id, extra={"props": log_props})
+            self.invalidate_listing_cache()
+            self._invalidate_metadata([file_id])
+            return True
         except Exception as e: # 捕獲 API 請求錯誤或其他異常
-            logger.error(f"移動檔案 ID '{file_id}' 時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props, "api_call_status": "exception", "error": str(e)}})
+            log_props["api_call_status"] = "exception"
+            log_props["error"] = str(e)
+            logger.error(f"移動檔案 ID '{file_id}' 時發生錯誤: {e}", exc_info=True, extra={"props": log_props})
             return False
 
+    async def batch_execute(self, requests: list) -> list:
+        """
+        透過 Google Drive 批次端點 (`batch/drive/v3`) 一次送出多個 API 請求。
+
+        每個子請求都會被序列化為 `multipart/mixed` 主體中的一個部分，
+        並 POST 至 `DRIVE_BATCH_URL`。單次批次最多包含 `MAX_BATCH_SIZE` (100) 個子請求，
+        超過時會自動拆分為多個批次依序送出。相較於逐一呼叫，這能將 N 次 HTTPS 往返
+        縮減為 ceil(N / 100) 次。
+
+        Args:
+            requests (list): 由 `drive_v3.files.*(...)` 建立的 aiogoogle `Request` 物件列表。
+
+        Returns:
+            list: 與 `requests` 等長且順序一致的結果列表。每個元素為
+                  `{"status_code": int, "body": dict | str | None}`；
+                  若該子請求所在的批次整體失敗，或回應中缺少該子請求，則對應元素為 None。
+        """
+        log_props = {"request_count": len(requests), "operation": "batch_execute"}
+        if not requests:
+            return []
+        log_props["api_call_status"] = "started"
+        logger.info("準備以批次方式送出 %s 個 Drive API 請求...", len(requests), extra={"props": log_props})
+        results = []
+        for chunk_start in range(0, len(requests), MAX_BATCH_SIZE):
+            chunk = requests[chunk_start:chunk_start + MAX_BATCH_SIZE]
+            boundary = f"batch_{uuid.uuid4().hex}"
+            batch_request = Request(
+                method="POST",
+                url=DRIVE_BATCH_URL,
+                headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+                data=_build_batch_body(chunk, boundary),
+            )
+            try:
+                async with self.aiogoogle as google:
+                    response = await self._send(google, batch_request, full_res=True)
+                # 回應的 boundary 由伺服器決定，需從回應的 Content-Type 標頭中取得
+                response_content_type = response.headers.get("Content-Type", "")
+                response_boundary = response_content_type.split("boundary=", 1)[-1].strip('"') if "boundary=" in response_content_type else boundary
+                body = response.content if isinstance(response.content, str) else str(response.content or "")
+                results.extend(_parse_batch_response(body, response_boundary, len(chunk)))
+            except Exception as e:
+                log_props["api_call_status"] = "exception"
+                log_props["chunk_start"] = chunk_start
+                log_props["chunk_size"] = len(chunk)
+                log_props["error"] = str(e)
+                logger.error(
+                    f"批次送出 Drive API 請求時發生錯誤 (第 {chunk_start} 至 {chunk_start + len(chunk) - 1} 項): {e}", exc_info=True,
+                    extra={"props": log_props}
+                )
+                results.extend([None] * len(chunk))
+        if any(request.method.upper() != "GET" for request in requests): # 僅在含寫入操作時使列表快取失效
+            self.invalidate_listing_cache()
+        log_props["api_call_status"] = "success"
+        logger.info("批次請求完成，共 %s 個結果。", len(results), extra={"props": log_props})
+        return results
+
+    async def get_files_metadata(self, file_ids: list, fields: str = DEFAULT_METADATA_FIELDS) -> list:
+        """
+        一次獲取多個 Drive 項目的元數據：已在快取中的項目直接返回，其餘以批次端點在單次往返中查詢
+        (每 100 個一批)，並寫入與 `get_file_metadata` 共用的快取。
+
+        Args:
+            file_ids (list): Drive 項目 ID 列表。
+            fields (str, optional): 要求返回的欄位。預設為 "mimeType,name,size,modifiedTime"。
+
+        Returns:
+            list: 與 `file_ids` 順序一致的列表，每個元素為元數據字典的副本；查詢失敗的項目為 None。
+        """
+        if not file_ids:
+            return []
+        now = time.monotonic()
+        found = {}
+        async with self._metadata_lock:
+            for file_id in file_ids:
+                cached = self._metadata_cache.get((file_id, fields))
+                if cached is not None and cached[0] > now:
+                    found[file_id] = cached[1]
+        missing = list(dict.fromkeys(file_id for file_id in file_ids if file_id not in found))
+        if missing:
+            try:
+                async with self.aiogoogle as google:
+                    drive_v3 = await self._drive(google)
+            except Exception as e:
+                logger.error(f"批次獲取元數據前發現 Drive API 失敗: {e}", exc_info=True, extra={"props": {"operation": "get_files_metadata", "api_call_status": "exception", "error": str(e)}})
+                drive_v3 = None
+            if drive_v3 is not None:
+                results = await self.batch_execute([drive_v3.files.get(fileId=file_id, fields=fields) for file_id in missing])
+                expires_at = time.monotonic() + self._metadata_cache_ttl
+                async with self._metadata_lock:
+                    for file_id, result in zip(missing, results):
+                        if result and result["status_code"] == 200 and isinstance(result["body"], dict):
+                            found[file_id] = result["body"]
+                            if self._metadata_cache_ttl > 0:
+                                self._metadata_cache[(file_id, fields)] = (expires_at, result["body"])
+        return [dict(found[file_id]) if file_id in found else None for file_id in file_ids]
+
+    async def batch_delete(self, file_ids: list) -> list:
+        """
+        以 Drive 批次端點永久刪除多個檔案或資料夾。
+
+        Args:
+            file_ids (list): 要刪除的 Drive 項目 ID 列表。
+
+        Returns:
+            list: 與 `file_ids` 順序一致的布林值列表，表示各項目是否刪除成功 (HTTP 200/204)。
+        """
+        if not file_ids:
+            return []
+        try:
+            async with self.aiogoogle as google:
+                drive_v3 = await self._drive(google)
+        except Exception as e:
+            logger.error(f"批次刪除前發現 Drive API 失敗: {e}", exc_info=True, extra={"props": {"operation": "batch_delete", "api_call_status": "exception", "error": str(e)}})
+            return [False] * len(file_ids)
+        results = await self.batch_execute([drive_v3.files.delete(fileId=file_id) for file_id in file_ids])
+        self._invalidate_metadata(file_ids)
+        return [bool(result) and result["status_code"] in (200, 204) for result in results]
+
+    async def move_files(self, moves: list) -> list:
+        """
+        以 Drive 批次端點在單次 HTTPS 往返中移動多個檔案 (每 100 個一批)，適用於大量搬移。
+
+        Args:
+            moves (list): `(file_id, new_parent_folder_id, old_parent_folder_id)` 元組的列表，
+                          `old_parent_folder_id` 可為 None，語意與 `move_file` 相同。
+
+        Returns:
+            list: 與 `moves` 順序一致的布林值列表，表示各檔案的 `files.update` 子請求是否返回 HTTP 200。
+        """
+        if not moves:
+            return []
+        try:
+            async with self.aiogoogle as google:
+                drive_v3 = await self._drive(google)
+        except Exception as e:
+            logger.error(f"批次移動前發現 Drive API 失敗: {e}", exc_info=True, extra={"props": {"operation": "move_files", "api_call_status": "exception", "error": str(e)}})
+            return [False] * len(moves)
+        requests = []
+        for file_id, new_parent_folder_id, old_parent_folder_id in moves:
+            update_kwargs = {'fileId': file_id, 'addParents': new_parent_folder_id, 'fields': 'id'}
+            if old_parent_folder_id:
+                update_kwargs['removeParents'] = old_parent_folder_id
+            requests.append(drive_v3.files.update(**update_kwargs))
+        results = await self.batch_execute(requests)
+        self._invalidate_metadata(file_id for file_id, _, _ in moves)
+        return [bool(result) and result["status_code"] == 200 for result in results]
+
 # __main__ block for testing (copied, no changes needed for 'extra' here as it's for testing)
 if __name__ == '__main__':
     import asyncio
+    import itertools
+    _NAME_BASE = time.time_ns() # 只取一次時間，搭配計數器產生同一次執行內不重複的測試名稱
+    _NAME_COUNTER = itertools.count()
     # ... (rest of __main__ block) ...
     async def test_main():
         SERVICE_ACCOUNT_FILE_FOR_TEST = 'your_service_account.json'
@@ -436,23 +1746,38 @@ if __name__ == '__main__':
             logger.error(f"初始化 DriveService 失敗: {e}")
             return
         logger.info("---- 開始 GoogleDriveService 功能測試 (將對 Drive 執行實際操作) ----")
-        new_folder_name = f"自動測試資料夾_{int(time.time())}"
-        logger.info(f"測試 create_folder: 準備創建資料夾 '{new_folder_name}'")
-        created_folder_id = await drive_service.create_folder(new_folder_name, parent_folder_id=TEST_PARENT_FOLDER_ID)
+        new_folder_name = f"自動測試資料夾_{_NAME_BASE}_{next(_NAME_COUNTER)}"
+        target_folder_name_for_move = f"目標移動資料夾_{_NAME_BASE}_{next(_NAME_COUNTER)}"
+        # 主測試資料夾與移動目標資料夾彼此獨立，並行創建
+        logger.info(f"測試 create_folder: 準備並行創建資料夾 '{new_folder_name}' 與 '{target_folder_name_for_move}'")
+        created_folder_id, target_folder_id_for_move = await asyncio.gather(
+            drive_service.create_folder(new_folder_name, parent_folder_id=TEST_PARENT_FOLDER_ID),
+            drive_service.create_folder(target_folder_name_for_move, parent_folder_id=TEST_PARENT_FOLDER_ID),
+        )
         if created_folder_id:
             logger.info(f"  ✅ 成功：資料夾已創建，ID: {created_folder_id}")
             list_target_folder_name = '根目錄' if not TEST_PARENT_FOLDER_ID else f"資料夾 ID '{TEST_PARENT_FOLDER_ID}'"
-            logger.info(f"測試 list_files (在 {list_target_folder_name} 中):")
-            files = await drive_service.list_files(folder_id=TEST_PARENT_FOLDER_ID if TEST_PARENT_FOLDER_ID else 'root', page_size=5)
-            found_our_folder = any(f['id'] == created_folder_id for f in files)
-            logger.info(f"  列出檔案完成。是否找到剛創建的資料夾: {found_our_folder}")
+
+            async def find_created_folder() -> bool:
+                async for f in drive_service.iter_files(folder_id=TEST_PARENT_FOLDER_ID if TEST_PARENT_FOLDER_ID else 'root', fields=FIELDS_MIN):
+                    if f['id'] == created_folder_id:
+                        return True # 找到後即停止，不再請求後續分頁
+                return False
+
             test_file_content = "這是來自蒼狼 AI V2.2 GoogleDriveService 即時測試的上傳內容！"
             local_test_file_path = "temp_gdrive_upload_test.txt"
             with open(local_test_file_path, "w", encoding='utf-8') as f: f.write(test_file_content)
-            logger.info(f"測試 upload_file: 準備上傳檔案 '{local_test_file_path}' 到資料夾 ID '{created_folder_id}'")
-            uploaded_file_id = await drive_service.upload_file(local_test_file_path, folder_id=created_folder_id)
+            # 列出檔案與上傳檔案都只依賴主測試資料夾，並行執行
+            logger.info(f"測試 list_files (在 {list_target_folder_name} 中) 與 upload_file (上傳 '{local_test_file_path}' 到資料夾 ID '{created_folder_id}')")
+            found_our_folder, uploaded_file_id = await asyncio.gather(
+                find_created_folder(),
+                drive_service.upload_file(local_test_file_path, folder_id=created_folder_id),
+            )
+            logger.info(f"  列出檔案完成。是否找到剛創建的資料夾: {found_our_folder}")
+            cleanup_ids = [created_folder_id]
             if uploaded_file_id:
                 logger.info(f"  ✅ 成功：檔案已上傳，ID: {uploaded_file_id}")
+                cleanup_ids.append(uploaded_file_id)
                 download_destination_path = "temp_gdrive_downloaded_test.txt"
                 logger.info(f"測試 download_file: 準備下載檔案 ID '{uploaded_file_id}' 到 '{download_destination_path}'")
                 download_success = await drive_service.download_file(uploaded_file_id, download_destination_path)
@@ -463,27 +1788,26 @@ if __name__ == '__main__':
                     logger.info("  ✅ 下載的檔案內容驗證成功！")
                     os.remove(download_destination_path)
                 else: logger.error("  ❌ 失敗：檔案下載失敗。")
-                target_folder_name_for_move = f"目標移動資料夾_{int(time.time())}"
-                target_folder_id_for_move = await drive_service.create_folder(target_folder_name_for_move, parent_folder_id=TEST_PARENT_FOLDER_ID)
                 if target_folder_id_for_move:
                     logger.info(f"  已創建用於移動測試的目標資料夾，ID: {target_folder_id_for_move}")
                     logger.info(f"測試 move_file: 準備移動檔案 ID '{uploaded_file_id}' 從 '{created_folder_id}' 到 '{target_folder_id_for_move}'")
                     move_success = await drive_service.move_file(uploaded_file_id, target_folder_id_for_move, old_parent_folder_id=created_folder_id)
                     logger.info(f"  移動操作 {'✅ 成功' if move_success else '❌ 失敗'}")
-                    logger.info(f"  準備刪除移動後的檔案 ID '{uploaded_file_id}' (在新位置)")
-                    await drive_service.delete_file(uploaded_file_id)
-                    logger.info(f"  準備刪除用於移動測試的目標資料夾 ID '{target_folder_id_for_move}'")
-                    await drive_service.delete_file(target_folder_id_for_move)
                 else:
                     logger.error("  ❌ 失敗：無法創建用於移動測試的目標資料夾。")
-                    logger.info(f"  準備刪除原始位置的上傳檔案 ID '{uploaded_file_id}'")
-                    await drive_service.delete_file(uploaded_file_id)
             else: logger.error("  ❌ 失敗：檔案上傳失敗。")
             if os.path.exists(local_test_file_path): os.remove(local_test_file_path)
-            logger.info(f"測試 delete_file: 準備刪除主測試資料夾 ID '{created_folder_id}'")
-            delete_folder_success = await drive_service.delete_file(created_folder_id)
-            logger.info(f"  刪除主測試資料夾 {'✅ 成功' if delete_folder_success else '❌ 失敗'}")
-        else: logger.error("  ❌ 失敗：初始資料夾創建失敗，後續依賴此資料夾的測試已跳過。")
+            if target_folder_id_for_move:
+                cleanup_ids.append(target_folder_id_for_move)
+            # 清理的刪除操作互不依賴，合併為單一批次請求 (一次 HTTPS 往返)
+            logger.info(f"測試 batch_delete: 準備以批次請求刪除測試項目 {cleanup_ids}")
+            delete_results = await drive_service.batch_delete(cleanup_ids)
+            logger.info(f"  刪除主測試資料夾 {'✅ 成功' if delete_results[0] else '❌ 失敗'}")
+        else:
+            logger.error("  ❌ 失敗：初始資料夾創建失敗，後續依賴此資料夾的測試已跳過。")
+            if target_folder_id_for_move:
+                await drive_service.delete_file(target_folder_id_for_move)
+        await drive_service.close()
         logger.info("---- GoogleDriveService 功能測試完畢 ----")
     if os.name == 'nt': asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     asyncio.run(test_main())
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import logging
+
+
+class PropsAdapter(logging.LoggerAdapter):
+    """
+    將每次記錄傳入的 `extra` 欄位併入建立時提供的基本 `props`。
+    `LoggerAdapter` 只在該日誌層級啟用時才呼叫 `process`，被過濾掉的記錄不會產生合併後的字典。
+
+    用法：`log = PropsAdapter(logger, {"props": {...基本屬性...}})`，之後每次記錄只需以 `extra` 傳入該步驟的欄位。
+    """
+    def process(self, msg, kwargs):
+        extra = kwargs.get("extra")
+        base_props = self.extra["props"]
+        kwargs["extra"] = {"props": {**base_props, **extra} if extra else base_props}
+        return msg, kwargs
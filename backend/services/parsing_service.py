@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 import os
+import mmap
 import logging
 
+from .log_utils import PropsAdapter
+
 logger = logging.getLogger(__name__)
 
+READ_BUFFER_SIZE = 1024 * 1024 # 讀取純文字檔案時使用的緩衝區大小
+MMAP_MIN_SIZE = 1024 * 1024 # 純文字檔案達到此大小時改以 mmap 讀取 (空檔案無法映射，小檔案的拷貝成本可忽略)
+
+
 class ParsingService:
     """
     提供從不同類型檔案中提取純文字內容的服務。
@@ -38,6 +45,14 @@ class ParsingService:
         執行任何其他預備步驟，這些邏輯將會被添加到此構造函數中。
         例如，可能會在這裡預先加載某些大型的解析模型或設定。
         """
+        # 副檔名 -> 解析函式的分派表；新增格式支援時只需在此註冊對應的處理函式
+        # 處理函式的簽名皆為 (file_path, file_extension, file_size, log)，file_size 可能為 None
+        self._handlers = {
+            ".txt": self._read_plain_text,
+            ".md": self._read_plain_text,
+            ".docx": self._unsupported_docx,
+            ".pdf": self._unsupported_pdf,
+        }
         # 記錄服務初始化的日誌訊息，有助於追蹤服務的生命週期。
         logger.info(
             "文字解析服務 (ParsingService) 已初始化。",
@@ -51,6 +66,44 @@ class ParsingService:
         # 使用 os.path.splitext 分割檔案名和副檔名，[1] 取副檔名部分，並轉換為小寫
         return os.path.splitext(file_name)[1].lower()
 
+    def _read_plain_text(self, file_path: str, file_extension: str, file_size: int | None, log: PropsAdapter) -> str:
+        """
+        以 UTF-8 編碼直接讀取純文字或 Markdown 檔案。先以二進位模式一次讀入再整體解碼，
+        省去文字模式以 8 KiB 緩衝區逐段增量解碼的開銷；不小於 `MMAP_MIN_SIZE` 的檔案改由 mmap 解碼。
+        換行符號的正規化與文字模式一致。`file_size` 為 None (事先取得大小失敗) 時，改由已開啟的檔案取得大小。
+        """
+        with open(file_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            if file_size is None:
+                file_size = os.fstat(f.fileno()).st_size
+            if file_size is not None and file_size >= MMAP_MIN_SIZE:
+                # 大型檔案直接從記憶體映射解碼，省去先複製成 bytes 物件的一次完整拷貝與峰值記憶體
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    content = str(mapped, 'utf-8')
+            else:
+                content = f.read().decode('utf-8')
+        if '\r' in content: # 與文字模式的通用換行相同：\r\n 與 \r 皆轉為 \n
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        log.info("成功解析純文字檔案: %s", file_path, extra={"parsing_status": "success_text_plain", "content_length": len(content)})
+        return content
+
+    def _unsupported_docx(self, file_path: str, file_extension: str, file_size: int | None, log: PropsAdapter) -> str:
+        """.docx 檔案的解析功能目前未實現，返回提示訊息。"""
+        log.warning("注意：.docx (%s) 內容解析功能待實現。", file_path, extra={"parsing_status": "unsupported_docx"})
+        return "[.docx 檔案內容解析功能待實現]"
+
+    def _unsupported_pdf(self, file_path: str, file_extension: str, file_size: int | None, log: PropsAdapter) -> str:
+        """.pdf 檔案的解析功能目前未實現，返回提示訊息。"""
+        log.warning("注意：.pdf (%s) 內容解析功能待實現。", file_path, extra={"parsing_status": "unsupported_pdf"})
+        return "[.pdf 檔案內容解析功能待實現]"
+
+    def _unsupported_other(self, file_path: str, file_extension: str, file_size: int | None, log: PropsAdapter) -> str:
+        """分派表中沒有對應處理函式的副檔名，返回不支援的提示訊息。"""
+        log.warning(
+            "不支援的檔案類型 '%s' (%s)。", file_extension, file_path,
+            extra={"parsing_status": "unsupported_other", "unsupported_extension": file_extension}
+        )
+        return f"[不支援的檔案類型: {file_extension}]"
+
     def extract_text_from_file(self, file_path: str) -> str:
         """
         從指定的本地檔案路徑中提取純文字內容。
@@ -78,72 +131,46 @@ class ParsingService:
         file_extension = self._get_file_extension(file_path)
         content = "" # 初始化內容字串
 
-        # 嘗試獲取檔案大小以用於日誌記錄，同時處理路徑無效或檔案不存在的早期錯誤
+        # 嘗試獲取檔案大小以用於日誌記錄；單次 os.stat 同時完成存在性檢查與取得大小
         file_size = None
         try:
-            # 在獲取大小前檢查檔案是否存在，避免因路徑問題導致 getsize 拋出異常
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-        except OSError: # 捕獲 os.path.exists 或 os.path.getsize 可能引發的作業系統相關錯誤
+            file_size = os.stat(file_path).st_size
+        except FileNotFoundError: # 檔案不存在時大小記為 None，實際錯誤由後續的讀取步驟回報
+            pass
+        except OSError: # 捕獲 os.stat 可能引發的其他作業系統相關錯誤 (如權限不足、路徑無效)
              logger.warning(f"無法獲取檔案大小或檢查檔案是否存在: {file_path}", extra={"props": {"file_path": file_path, "operation": "get_file_size", "error": "OSError"}})
 
-        # 準備用於結構化日誌的屬性字典
-        log_props = {
+        # 準備用於結構化日誌的屬性字典；每次記錄只需傳入額外欄位，合併由 PropsAdapter 在記錄確實輸出時進行
+        log = PropsAdapter(logger, {"props": {
             "file_path": file_path,
             "file_extension": file_extension,
             "file_size_bytes": file_size, # 可能為 None
             "operation": "extract_text_from_file"
-        }
+        }})
 
-        logger.info(
-            f"開始解析檔案 '{file_path}' (類型: {file_extension}, 大小: {file_size} bytes)...",
-            extra={"props": {**log_props, "parsing_status": "started"}}
+        log.info(
+            "開始解析檔案 '%s' (類型: %s, 大小: %s bytes)...", file_path, file_extension, file_size,
+            extra={"parsing_status": "started"}
         )
 
         try:
-            # 根據檔案副檔名選擇不同的處理方式
-            if file_extension in [".txt", ".md"]:
-                # 對於純文字或 Markdown 檔案，直接以 UTF-8 編碼讀取
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                logger.info(
-                    f"成功解析純文字檔案: {file_path}",
-                    extra={"props": {**log_props, "parsing_status": "success_text_plain", "content_length": len(content)}}
-                )
-            elif file_extension == ".docx":
-                # .docx 檔案的解析功能目前未實現
-                content = "[.docx 檔案內容解析功能待實現]" # 返回提示訊息
-                logger.warning(
-                    f"注意：.docx ({file_path}) 內容解析功能待實現。",
-                    extra={"props": {**log_props, "parsing_status": "unsupported_docx"}}
-                )
-            elif file_extension == ".pdf":
-                # .pdf 檔案的解析功能目前未實現
-                content = "[.pdf 檔案內容解析功能待實現]" # 返回提示訊息
-                logger.warning(
-                    f"注意：.pdf ({file_path}) 內容解析功能待實現。",
-                    extra={"props": {**log_props, "parsing_status": "unsupported_pdf"}}
-                )
-            else:
-                # 其他所有不支援的檔案類型
-                content = f"[不支援的檔案類型: {file_extension}]" # 返回不支援的提示訊息
-                logger.warning(
-                    f"不支援的檔案類型 '{file_extension}' ({file_path})。",
-                    extra={"props": {**log_props, "parsing_status": "unsupported_other", "unsupported_extension": file_extension}}
-                )
+            # 根據檔案副檔名從分派表選擇處理方式，沒有對應項目的副檔名視為不支援
+            # 處理函式所需的資料以參數明確傳入；log 僅用於記錄日誌
+            handler = self._handlers.get(file_extension, self._unsupported_other)
+            content = handler(file_path, file_extension, file_size, log)
         except FileNotFoundError:
             # 處理檔案未找到的異常
             content = f"[檔案未找到: {file_path}]" # 設定錯誤訊息
-            logger.error(
-                f"解析檔案 '{file_path}' 時失敗：檔案未找到。", exc_info=True, # 記錄異常信息
-                extra={"props": {**log_props, "parsing_status": "exception_file_not_found", "error": "FileNotFoundError"}}
+            log.error(
+                "解析檔案 '%s' 時失敗：檔案未找到。", file_path, exc_info=True, # 記錄異常信息
+                extra={"parsing_status": "exception_file_not_found", "error": "FileNotFoundError"}
             )
         except Exception as e:
             # 處理其他所有在解析過程中可能發生的異常
             content = f"[檔案內容解析錯誤: {str(e)}]" # 設定通用錯誤訊息
-            logger.error(
-                f"解析檔案 '{file_path}' 時發生錯誤: {e}", exc_info=True, # 記錄異常信息
-                extra={"props": {**log_props, "parsing_status": "exception_generic", "error": str(e)}}
+            log.error(
+                "解析檔案 '%s' 時發生錯誤: %s", file_path, e, exc_info=True, # 記錄異常信息
+                extra={"parsing_status": "exception_generic", "error": str(e)}
             )
 
         return content
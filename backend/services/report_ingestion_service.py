@@ -1,10 +1,13 @@
 import os
+import asyncio
+import hashlib
 import logging
 import shutil
-import json
+import orjson
 from datetime import datetime
 from typing import TYPE_CHECKING, Tuple, Optional, List
 
+from .log_utils import PropsAdapter
 from .parsing_service import ParsingService
 from .gemini_service import GeminiService
 
@@ -16,11 +19,46 @@ logger = logging.getLogger(__name__)
 
 SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
 BACKEND_DIR = os.path.dirname(SERVICE_DIR)
-TEMP_DOWNLOAD_DIR = os.path.join(BACKEND_DIR, 'data', 'temp_downloads')
 
-os.makedirs(TEMP_DOWNLOAD_DIR, exist_ok=True)
-# Initial log about TEMP_DOWNLOAD_DIR is at module level, might not be JSON unless root logger is configured before this module is imported.
-# This is usually fine, as critical operational logs will be from methods.
+def _resolve_temp_download_dir() -> str:
+    """
+    決定 Drive 下載暫存目錄：設定環境變數 `INGEST_TEMP_DIR` 時使用該目錄，否則使用 backend/data/temp_downloads。
+    tmpfs (例如 /dev/shm) 須明確以 `INGEST_TEMP_DIR` 啟用：其容量通常很小 (Docker 預設 64 MB)，
+    且佔用行程可用的記憶體，同時下載 `INGEST_CONCURRENCY` 個大型報告時容易空間不足。
+    """
+    configured_dir = os.getenv("INGEST_TEMP_DIR")
+    if configured_dir:
+        return configured_dir
+    return os.path.join(BACKEND_DIR, 'data', 'temp_downloads')
+
+TEMP_DOWNLOAD_DIR = _resolve_temp_download_dir()
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8")) # 批次擷取時同時處理的檔案數上限
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4")) # 同時進行中的 Gemini 分析請求上限
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "0")) # 每分鐘送出的 Gemini 分析請求上限 (0 表示不限制)
+INGEST_BATCH_SIZE = 64 # 從 Drive 資料夾擷取時，單次批次寫入資料庫的報告數上限
+PIPELINE_QUEUE_SIZE = 16 # 擷取管線各階段之間佇列的容量；佇列已滿時上游暫停，限制暫存於記憶體的項目數
+CONTENT_HASH_DIGEST_SIZE = 32 # 報告內容雜湊 (BLAKE2b) 的位元組數，用於辨識來源不同但內容相同的報告
+
+# 匯入模組時不建立 TEMP_DOWNLOAD_DIR：應用程式啟動時 (main.py 的 lifespan) 會建立一次，
+# 而 GoogleDriveService.download_file 在寫入前也會確認 (並快取) 目標資料夾存在。
+
+async def _iter_queue_batches(queue: asyncio.Queue, max_batch_size: int):
+    """
+    從佇列分批取出項目：等待第一個項目後，再取出佇列中已就緒的項目直到 `max_batch_size`，
+    不為湊滿批次而等待。取得哨兵值 None 時產出剩餘項目並結束。
+    """
+    while (item := await queue.get()) is not None:
+        batch = [item]
+        while len(batch) < max_batch_size:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is None:
+                yield batch
+                return
+            batch.append(item)
+        yield batch
 
 class ReportIngestionService:
     def __init__(self,
@@ -32,91 +70,140 @@ class ReportIngestionService:
         self.dal = dal
         self.parsing_service = parsing_service
         self.gemini_service = gemini_service
+        # 限制批次擷取時同時進行的檔案處理 (下載、解析、AI 分析、歸檔) 數量
+        self._ingest_sem = asyncio.Semaphore(INGEST_CONCURRENCY)
+        # Gemini 的配額與 Drive 無關：另行限制同時進行的分析請求數，並依 GEMINI_RPM 平均分配送出時間
+        self._gemini_sem = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        self._gemini_next_slot = 0.0 # 下一個可送出 Gemini 請求的事件迴圈時間
         # This log will be JSON formatted if main.py's lifespan configures logging before this service is instantiated.
         logger.info(
             "報告擷取服務 (ReportIngestionService) 已初始化。",
             extra={"props": {"service_name": "ReportIngestionService", "status": "initialized"}}
         )
 
-    async def _analyze_and_store_report(self, report_db_id: int, content: str, file_name: str):
+    async def _wait_for_gemini_slot(self) -> None:
+        """
+        依 `GEMINI_RPM` 將 Gemini 請求平均分散於每分鐘 (漏桶)：每次預約下一個間隔 60/RPM 秒的時段並等待至該時段。
+        預約與更新之間沒有 await，單一事件迴圈上無需加鎖。`GEMINI_RPM` 為 0 時不限制。
+        """
+        if GEMINI_RPM <= 0:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._gemini_next_slot)
+        self._gemini_next_slot = slot + 60.0 / GEMINI_RPM
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _run_report_analysis(self, report_db_id: int, content: str, file_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        執行 AI 分析但不寫入資料庫，返回 `(analysis_json, 分析狀態)`；內容為空或為錯誤訊息而跳過分析時返回 `(None, None)`。
+        結果由呼叫端與其他最終欄位一併寫入，避免為分析結果單獨進行一次資料庫寫入。
+        """
         log_props = {"report_db_id": report_db_id, "file_name": file_name, "operation": "analyze_and_store_report"}
+        log = PropsAdapter(logger, {"props": log_props})
         if not content or content.startswith("["):
-            logger.info(
-                f"報告 ID {report_db_id} ({file_name}) 的內容為空或為錯誤訊息，跳過 AI 分析。",
-                extra={"props": {**log_props, "analysis_skipped": True, "reason": "empty_or_error_content"}}
+            log.info(
+                "報告 ID %s (%s) 的內容為空或為錯誤訊息，跳過 AI 分析。", report_db_id, file_name,
+                extra={"analysis_skipped": True, "reason": "empty_or_error_content"}
             )
-            return
+            return None, None
         try:
-            logger.info(
-                f"開始為報告 ID {report_db_id} ({file_name}) 進行 AI 分析...",
-                extra={"props": {**log_props, "ai_analysis_status": "started"}}
+            log.info(
+                "開始為報告 ID %s (%s) 進行 AI 分析...", report_db_id, file_name,
+                extra={"ai_analysis_status": "started"}
             )
-            analysis_result = await self.gemini_service.analyze_report(content)
+            async with self._gemini_sem:
+                await self._wait_for_gemini_slot()
+                analysis_result = await self.gemini_service.analyze_report(content)
 
             if analysis_result and not analysis_result.get("錯誤"):
-                analysis_json = json.dumps(analysis_result, ensure_ascii=False)
-                await self.dal.update_report_analysis(report_db_id, analysis_json, "分析完成")
-                logger.info(
-                    f"報告 ID {report_db_id} ({file_name}) 的 AI 分析已完成並儲存。",
-                    extra={"props": {**log_props, "ai_analysis_status": "success"}}
-                )
-            else:
-                error_message = analysis_result.get("錯誤", "未知分析錯誤") if isinstance(analysis_result, dict) else "未知分析錯誤或服務未配置"
-                logger.warning(
-                    f"報告 ID {report_db_id} ({file_name}) 的 AI 分析失敗或 Gemini 服務未配置。錯誤: {error_message}",
-                    extra={"props": {**log_props, "ai_analysis_status": "failure", "error_detail": error_message, "analysis_result": analysis_result}}
+                log.info(
+                    "報告 ID %s (%s) 的 AI 分析已完成。", report_db_id, file_name,
+                    extra={"ai_analysis_status": "success"}
                 )
-                analysis_error_json = json.dumps({"錯誤": error_message, "原始分析結果": analysis_result}, ensure_ascii=False)
-                await self.dal.update_report_analysis(report_db_id, analysis_error_json, "分析失敗")
+                return orjson.dumps(analysis_result).decode('utf-8'), "分析完成"
+            error_message = analysis_result.get("錯誤", "未知分析錯誤") if isinstance(analysis_result, dict) else "未知分析錯誤或服務未配置"
+            log.warning(
+                "報告 ID %s (%s) 的 AI 分析失敗或 Gemini 服務未配置。錯誤: %s", report_db_id, file_name, error_message,
+                extra={"ai_analysis_status": "failure", "error_detail": error_message, "analysis_result": analysis_result}
+            )
+            return orjson.dumps({"錯誤": error_message, "原始分析結果": analysis_result}).decode('utf-8'), "分析失敗"
         except Exception as e:
-            logger.error(
-                f"為報告 ID {report_db_id} ({file_name}) 執行 AI 分析時發生意外錯誤: {e}",
-                exc_info=True, extra={"props": {**log_props, "ai_analysis_status": "exception", "error": str(e)}}
+            log.error(
+                "為報告 ID %s (%s) 執行 AI 分析時發生意外錯誤: %s", report_db_id, file_name, e,
+                exc_info=True, extra={"ai_analysis_status": "exception", "error": str(e)}
             )
-            error_json = json.dumps({"錯誤": f"分析過程中發生意外: {str(e)}"}, ensure_ascii=False)
+            return orjson.dumps({"錯誤": f"分析過程中發生意外: {str(e)}"}).decode('utf-8'), "分析失敗(系統異常)"
+
+    async def _analyze_and_store_report(self, report_db_id: int, content: str, file_name: str) -> Optional[str]:
+        """
+        執行 AI 分析並儲存結果，返回寫入資料庫的分析狀態；跳過分析時返回 None。
+        寫入分析結果失敗時不向外拋出，改為盡力記錄「分析失敗(系統異常)」。
+        """
+        analysis_json, analysis_status = await self._run_report_analysis(report_db_id, content, file_name)
+        if analysis_status is None:
+            return None
+        log = PropsAdapter(logger, {"props": {"report_db_id": report_db_id, "file_name": file_name, "operation": "analyze_and_store_report"}})
+        try:
+            await self.dal.update_report_analysis(report_db_id, analysis_json, analysis_status)
+            return analysis_status
+        except Exception as e:
+            log.error(
+                "儲存報告 ID %s (%s) 的 AI 分析結果時發生錯誤: %s", report_db_id, file_name, e,
+                exc_info=True, extra={"ai_analysis_status": "store_exception", "error": str(e)}
+            )
+            error_json = orjson.dumps({"錯誤": f"分析過程中發生意外: {str(e)}"}).decode('utf-8')
+        try:
             await self.dal.update_report_analysis(report_db_id, error_json, "分析失敗(系統異常)")
+        except Exception as e_record:
+            log.error(
+                "記錄報告 ID %s (%s) 的分析錯誤狀態時再次失敗: %s", report_db_id, file_name, e_record,
+                exc_info=True, extra={"ai_analysis_status": "store_error_status_failed", "error": str(e_record)}
+            )
+        return "分析失敗(系統異常)"
 
     async def _archive_file_in_drive(self, file_id: str, file_name: str, processed_folder_id: str, original_parent_folder_id: str) -> Optional[str]:
         log_props = {"file_id": file_id, "file_name": file_name, "processed_folder_id": processed_folder_id, "operation": "archive_file_in_drive"}
+        log = PropsAdapter(logger, {"props": log_props})
         if not self.drive_service:
-            logger.error("Drive Service 未初始化，無法執行歸檔操作。", extra={"props": {**log_props, "error": "drive_service_not_initialized"}})
+            log.error("Drive Service 未初始化，無法執行歸檔操作。", extra={"error": "drive_service_not_initialized"})
             return "error_drive_service_null"
 
-        logger.info(
-            f"準備從來源資料夾 '{original_parent_folder_id}' 刪除原始檔案 '{file_name}' (ID: {file_id})。",
-             extra={"props": {**log_props, "archive_step": "delete_original_start", "original_folder_id": original_parent_folder_id}}
+        log.info(
+            "準備從來源資料夾 '%s' 刪除原始檔案 '%s' (ID: %s)。", original_parent_folder_id, file_name, file_id,
+             extra={"archive_step": "delete_original_start", "original_folder_id": original_parent_folder_id}
         )
         try:
             if hasattr(self.drive_service, 'delete_file'):
                 delete_success = await self.drive_service.delete_file(file_id)
                 if delete_success:
-                    logger.info(f"成功刪除已處理的檔案 '{file_name}'。", extra={"props": {**log_props, "archive_step": "delete_original_success"}})
+                    log.info("成功刪除已處理的檔案 '%s'。", file_name, extra={"archive_step": "delete_original_success"})
                     return "deleted_from_inbox"
                 else:
-                    logger.warning(f"刪除檔案 '{file_name}' 操作未成功。", extra={"props": {**log_props, "archive_step": "delete_original_failed"}})
+                    log.warning("刪除檔案 '%s' 操作未成功。", file_name, extra={"archive_step": "delete_original_failed"})
                     return "delete_from_inbox_failed"
             else:
-                logger.warning("`GoogleDriveService` 未找到 `delete_file` 方法。檔案可能未被刪除。", extra={"props": {**log_props, "archive_step": "delete_method_missing"}})
+                log.warning("`GoogleDriveService` 未找到 `delete_file` 方法。檔案可能未被刪除。", extra={"archive_step": "delete_method_missing"})
                 return "delete_skipped_no_method"
         except Exception as e:
-            logger.error(f"歸檔 (刪除) 檔案 '{file_name}' 時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props, "archive_step": "delete_exception", "error": str(e)}})
+            log.error("歸檔 (刪除) 檔案 '%s' 時發生錯誤: %s", file_name, e, exc_info=True, extra={"archive_step": "delete_exception", "error": str(e)})
             return "delete_exception"
 
     async def ingest_single_drive_file(self, file_id: str, file_name: str, original_parent_folder_id: str, processed_folder_id: str) -> bool:
         """
         處理從 Google Drive 下載的單個報告檔案的完整擷取流程。
 
-        此方法是一個輔助方法，由 `ingest_reports_from_drive_folder` 調用，負責以下步驟：
+        此方法處理單一檔案並逐步寫入資料庫 (`ingest_reports_from_drive_folder` 則以相同步驟分批處理並合併資料庫寫入)，負責以下步驟：
         1.  **下載**: 使用 `drive_service` 從 Google Drive 下載指定的 `file_id` 到一個本地臨時路徑。
             如果下載失敗，則在資料庫中記錄錯誤狀態並返回 `False`。
         2.  **解析**: 使用 `parsing_service` 從下載的本地檔案中提取純文字內容。
         3.  **初步資料庫記錄**: 使用 `dal` (DataAccessLayer) 將報告的原始檔名、提取的內容（或錯誤訊息）、
             來源路徑 (標記為 `drive_id:{file_id}`) 和初始狀態 ("內容已解析" 或 "擷取錯誤(解析問題)")
             插入到資料庫中。如果插入失敗，記錄錯誤並返回 `False`。
-        4.  **AI 分析**: 如果內容成功解析 (狀態為 "內容已解析")，則調用私有方法 `_analyze_and_store_report`
-            將內容提交給 `gemini_service` 進行 AI 分析，並將分析結果更新回資料庫。
+        4.  **AI 分析**: 如果內容成功解析 (狀態為 "內容已解析")，則將內容提交給 `gemini_service` 進行 AI 分析；
+            分析結果於步驟 6 與歸檔結果一併寫回資料庫。
         5.  **歸檔至 Drive**: 使用 `drive_service` 將本地下載的檔案上傳到指定的 `processed_folder_id`
-            (已處理資料夾) 進行歸檔。
+            (已處理資料夾) 進行歸檔。此上傳與步驟 4 的 AI 分析互不依賴，兩者同時進行 (`_analyze_while_archiving`)。
         6.  **處理歸檔結果**:
             - 如果歸檔上傳成功，則調用私有方法 `_archive_file_in_drive` 從原始 Drive 資料夾中刪除該檔案。
             - 更新資料庫中報告的狀態為 "已歸檔至Drive" 或 "擷取部分成功(歸檔刪除失敗)" (取決於刪除步驟是否成功)，
@@ -139,23 +226,25 @@ class ReportIngestionService:
                   在任何關鍵步驟失敗時返回 `False`。
         """
         # 構造本地下載的臨時檔案路徑，確保檔案名中的特殊字元被替換
-        local_download_path = os.path.join(TEMP_DOWNLOAD_DIR, f"drive_{file_id}_{file_name.replace('/', '_')}")
+        local_download_path = self._drive_download_path(file_id, file_name)
         report_db_id = None  # 初始化資料庫中的報告 ID
         content = ""         # 初始化提取的內容
         final_status = False # 初始化最終處理狀態
         log_props_base = {"file_id": file_id, "file_name": file_name, "operation": "ingest_single_drive_file"}
+        # 每次記錄只傳入該步驟的欄位，由 PropsAdapter 於記錄確實輸出時才與基本屬性合併；後續對 log_props_base 的新增欄位同樣生效
+        log = PropsAdapter(logger, {"props": log_props_base})
 
         try:
-            logger.info(f"開始處理 Drive 檔案: '{file_name}' (ID: {file_id})。", extra={"props": {**log_props_base, "ingest_step": "start"}})
+            log.info("開始處理 Drive 檔案: '%s' (ID: %s)。", file_name, file_id, extra={"ingest_step": "start"})
 
             # 步驟 1: 下載檔案
             if not self.drive_service: # 檢查 Drive Service 是否已注入
-                 logger.error(f"Drive Service 未初始化，無法下載檔案 '{file_name}' (ID: {file_id})。", extra={"props": {**log_props_base, "ingest_step": "error_drive_service_null"}})
+                 log.error("Drive Service 未初始化，無法下載檔案 '%s' (ID: %s)。", file_name, file_id, extra={"ingest_step": "error_drive_service_null"})
                  return False
 
             download_success = await self.drive_service.download_file(file_id, local_download_path)
             if not download_success:
-                logger.error(f"下載 Drive 檔案 '{file_name}' (ID: {file_id}) 失敗。", extra={"props": {**log_props_base, "ingest_step": "download_failed"}})
+                log.error("下載 Drive 檔案 '%s' (ID: %s) 失敗。", file_name, file_id, extra={"ingest_step": "download_failed"})
                 # 如果下載失敗，嘗試在資料庫中記錄此錯誤狀態
                 await self.dal.insert_report_data(
                     original_filename=file_name, content=None,
@@ -165,11 +254,11 @@ class ReportIngestionService:
                 )
                 return False
 
-            logger.info(f"檔案 '{file_name}' (ID: {file_id}) 下載成功至 '{local_download_path}'。", extra={"props": {**log_props_base, "ingest_step": "download_success", "local_path": local_download_path}})
+            log.info("檔案 '%s' (ID: %s) 下載成功至 '%s'。", file_name, file_id, local_download_path, extra={"ingest_step": "download_success", "local_path": local_download_path})
 
             # 步驟 2: 解析檔案內容
-            # ParsingService 內部會記錄其解析過程的日誌
-            content = self.parsing_service.extract_text_from_file(local_download_path)
+            # ParsingService 內部會記錄其解析過程的日誌；讀取與解碼為阻塞操作，於工作執行緒中進行以免阻塞事件迴圈
+            content, content_hash = await asyncio.to_thread(self._parse_report_file, local_download_path)
 
             # 根據解析結果確定初始資料庫狀態
             initial_status = "內容已解析" if not content.startswith("[") else "擷取錯誤(解析問題)"
@@ -180,33 +269,31 @@ class ReportIngestionService:
             report_db_id = await self.dal.insert_report_data(
                 original_filename=file_name, content=content,
                 source_path=f"drive_id:{file_id}", # 標明來源為 Drive 檔案
-                metadata={"drive_file_id": file_id}, status=initial_status
+                metadata={"drive_file_id": file_id}, status=initial_status, content_hash=content_hash
             )
             log_props_base["report_db_id"] = report_db_id # 更新日誌屬性以便後續使用
 
             if not report_db_id: # 如果資料庫插入失敗
-                logger.error(f"將報告 '{file_name}' (ID: {file_id}) 存入資料庫失敗。", extra={"props": {**log_props_base, "ingest_step": "db_insert_failed"}})
+                log.error("將報告 '%s' (ID: %s) 存入資料庫失敗。", file_name, file_id, extra={"ingest_step": "db_insert_failed"})
                 return False # 關鍵步驟失敗，終止處理
 
-            logger.info(f"報告 '{file_name}' (ID: {file_id}) 已初步存入資料庫，記錄 ID: {report_db_id}，狀態: '{initial_status}'。", extra={"props": {**log_props_base, "ingest_step": "db_insert_success"}})
-
-            # 步驟 4: AI 分析 (如果內容有效)
-            if initial_status == "內容已解析":
-                # _analyze_and_store_report 方法內部會記錄其詳細日誌
-                await self._analyze_and_store_report(report_db_id, content, file_name)
+            log.info("報告 '%s' (ID: %s) 已初步存入資料庫，記錄 ID: %s，狀態: '%s'。", file_name, file_id, report_db_id, initial_status, extra={"ingest_step": "db_insert_success"})
 
-            # 步驟 5: 將處理過的檔案歸檔到 Drive 的指定資料夾
-            # drive_service.upload_file 方法內部應記錄其操作日誌
-            archived_file_drive_id = await self.drive_service.upload_file(
-                local_file_path=local_download_path,
-                folder_id=processed_folder_id,
-                file_name=file_name # 使用原始檔案名進行歸檔
+            # 步驟 4 與 5: AI 分析 (如果內容有效) 與歸檔上傳彼此獨立，同時進行；分析結果暫不寫入，於步驟 6 與歸檔結果一併提交
+            # 內容與先前已分析完成的報告相同 (例如 Drive 中被重新命名或複製的檔案) 時沿用其分析結果，不再呼叫 Gemini
+            # _run_report_analysis 與 drive_service.upload_file 內部會記錄其詳細日誌
+            reused_analysis_json = (await self.dal.get_analyses_by_content_hash([content_hash])).get(content_hash) if content_hash else None
+            analysis_json, analysis_status, archived_file_drive_id = await self._analyze_while_archiving(
+                report_db_id, content if initial_status == "內容已解析" else None, file_name, local_download_path, processed_folder_id,
+                reused_analysis_json
             )
+            # 內容已寫入資料庫且不再需要，釋放引用，避免大型報告在後續的歸檔刪除階段佔用記憶體
+            content = None
 
-            # 步驟 6: 處理歸檔結果
+            # 步驟 6: 處理歸檔結果，並以單次 finalize_report 寫入最終狀態、分析結果與 metadata
             if archived_file_drive_id:
-                logger.info(f"檔案 '{file_name}' (ID: {file_id}) 已成功上傳至歸檔資料夾 '{processed_folder_id}' (新 Drive ID: {archived_file_drive_id})。",
-                            extra={"props": {**log_props_base, "ingest_step": "archive_upload_success", "archived_drive_id": archived_file_drive_id, "target_folder_id": processed_folder_id}})
+                log.info("檔案 '%s' (ID: %s) 已成功上傳至歸檔資料夾 '%s' (新 Drive ID: %s)。", file_name, file_id, processed_folder_id, archived_file_drive_id,
+                            extra={"ingest_step": "archive_upload_success", "archived_drive_id": archived_file_drive_id, "target_folder_id": processed_folder_id})
 
                 # 從原始位置刪除檔案 (或標記為已處理)
                 # _archive_file_in_drive 方法內部記錄其操作日誌
@@ -217,25 +304,23 @@ class ReportIngestionService:
                 if "failed" in (archive_status_detail or "") or "exception" in (archive_status_detail or ""):
                     current_report_status_for_archive = "擷取部分成功(歸檔刪除失敗)"
 
-                # 僅當報告狀態未被AI分析步驟更新為最終狀態時，才更新為歸檔相關狀態
-                current_db_report = await self.dal.get_report_by_id(report_db_id)
-                if current_db_report and current_db_report['status'] not in ["分析完成", "分析失敗", "分析失敗(系統異常)"]:
-                     await self.dal.update_report_status(report_db_id, current_report_status_for_archive)
-
-                # 更新資料庫中報告的元數據，記錄歸檔後的 Drive ID 和歸檔操作的詳細狀態
-                await self.dal.update_report_metadata(report_db_id, {"archived_drive_file_id": archived_file_drive_id, "archive_status": archive_status_detail})
+                # AI 分析的最終狀態優先於歸檔狀態；metadata 於插入後未被其他步驟修改，可直接整體取代
+                await self.dal.finalize_report(
+                    report_db_id, analysis_status or current_report_status_for_archive, analysis_json,
+                    {"drive_file_id": file_id, "archived_drive_file_id": archived_file_drive_id, "archive_status": archive_status_detail}
+                )
                 final_status = True # 表示整個流程基本成功
             else:
                 # 如果歸檔上傳失敗
-                logger.error(f"歸檔檔案 '{file_name}' (ID: {file_id}) 至 '{processed_folder_id}' 失敗 (上傳步驟)。", extra={"props": {**log_props_base, "ingest_step": "archive_upload_failed"}})
-                await self.dal.update_report_status(report_db_id, "擷取錯誤(歸檔上傳失敗)")
+                log.error("歸檔檔案 '%s' (ID: %s) 至 '%s' 失敗 (上傳步驟)。", file_name, file_id, processed_folder_id, extra={"ingest_step": "archive_upload_failed"})
+                await self.dal.finalize_report(report_db_id, "擷取錯誤(歸檔上傳失敗)", analysis_json)
                 final_status = False # 標記流程失敗
 
             return final_status # 返回最終處理狀態
 
         # 步驟 7: 捕獲整個過程中的任何未預期異常
         except Exception as e:
-            logger.error(f"處理 Drive 檔案 '{file_name}' (ID: {file_id}) 時發生未預期錯誤: {e}", exc_info=True, extra={"props": {**log_props_base, "ingest_step": "unknown_exception", "error": str(e)}})
+            log.error("處理 Drive 檔案 '%s' (ID: %s) 時發生未預期錯誤: %s", file_name, file_id, e, exc_info=True, extra={"ingest_step": "unknown_exception", "error": str(e)})
             error_status = "擷取錯誤(處理異常)"
             if report_db_id: # 如果報告已存入資料庫，更新其狀態
                 await self.dal.update_report_status(report_db_id, error_status)
@@ -251,70 +336,332 @@ class ReportIngestionService:
 
         # 步驟 8: 清理本地下載的臨時檔案
         finally:
-            if os.path.exists(local_download_path):
+            # 直接嘗試刪除，省去事先以 os.path.exists 檢查的一次 stat；檔案不存在 (例如下載失敗) 時忽略
+            # unlink 為阻塞的系統呼叫，於工作執行緒中進行以免暫停事件迴圈上其他檔案的下載與分析
+            try:
+                await asyncio.to_thread(os.remove, local_download_path)
+                log.info("已清理暫存檔案: %s", local_download_path, extra={"cleanup_step": "temp_file_removed", "local_path": local_download_path})
+            except FileNotFoundError:
+                pass
+            except OSError as e_remove: # 如果刪除臨時檔案失敗
+                log.error("清理暫存檔案 '%s' 失敗: %s", local_download_path, e_remove, exc_info=True, extra={"cleanup_step": "temp_file_remove_failed", "local_path": local_download_path, "error": str(e_remove)})
+
+    def _parse_report_file(self, local_path: str) -> Tuple[str, Optional[str]]:
+        """
+        解析本地檔案並計算內容雜湊 (BLAKE2b)，返回 `(內容, 內容雜湊)`；內容為錯誤或提示訊息時雜湊為 None。
+        為同步方法，由呼叫端以 `asyncio.to_thread` 執行，雜湊計算與解析一同在工作執行緒中進行。
+        """
+        content = self.parsing_service.extract_text_from_file(local_path)
+        if content.startswith("["):
+            return content, None
+        return content, hashlib.blake2b(content.encode('utf-8'), digest_size=CONTENT_HASH_DIGEST_SIZE).hexdigest()
+
+    @staticmethod
+    def _drive_download_path(file_id: str, file_name: str) -> str:
+        """
+        Drive 檔案下載到本地的暫存路徑，檔案名中的 '/' 以 '_' 取代。
+        以 f-string 直接組合，省去每個檔案一次 `os.path.join` 的呼叫；TEMP_DOWNLOAD_DIR 於呼叫時讀取，測試可替換。
+        """
+        return f"{TEMP_DOWNLOAD_DIR}{os.sep}drive_{file_id}_{file_name.replace('/', '_')}"
+
+    async def _analyze_while_archiving(self, report_db_id: int, content: Optional[str], file_name: str, local_path: str, processed_folder_id: str,
+                                       reused_analysis_json: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        同時進行 AI 分析與歸檔上傳 (兩者互不依賴)，使 Gemini 的回應時間與 Drive 上傳重疊。
+
+        `content` 為 None 時 (內容未成功解析) 只進行上傳。提供 `reused_analysis_json` (內容相同之報告的已完成分析) 時
+        不呼叫 Gemini，直接以該結果作為「分析完成」返回。上傳拋出例外時視為上傳失敗 (歸檔 ID 為 None)，仍等待分析完成並返回其結果，
+        由呼叫端與錯誤狀態一併寫入，不丟棄已進行的 AI 分析；只有在本身被取消時才一併取消分析。
+
+        Returns:
+            Tuple[Optional[str], Optional[str], Optional[str]]: (分析結果 JSON, 分析狀態, 歸檔後的 Drive 檔案 ID)；
+            未分析時前兩者為 None，上傳失敗時歸檔 ID 為 None。
+        """
+        log_props = {"report_db_id": report_db_id, "file_name": file_name, "processed_folder_id": processed_folder_id, "operation": "analyze_while_archiving"}
+        log = PropsAdapter(logger, {"props": log_props})
+        if reused_analysis_json is not None and content is not None:
+            log.info(
+                "報告 ID %s (%s) 的內容與已分析完成的報告相同，沿用其分析結果並跳過 AI 分析。", report_db_id, file_name,
+                extra={"analysis_skipped": True, "reason": "duplicate_content"}
+            )
+            content = None
+        analysis = asyncio.ensure_future(self._run_report_analysis(report_db_id, content, file_name)) if content is not None else None
+        try:
+            archived_file_drive_id = await self.drive_service.upload_file(
+                local_file_path=local_path, folder_id=processed_folder_id, file_name=file_name # 使用原始檔案名進行歸檔
+            )
+        except Exception as e:
+            log.error(
+                "歸檔上傳報告 ID %s (%s) 時發生錯誤: %s", report_db_id, file_name, e, exc_info=True,
+                extra={"ingest_step": "archive_upload_exception", "error": str(e)}
+            )
+            archived_file_drive_id = None
+        except BaseException:
+            if analysis:
+                analysis.cancel()
+            raise
+        if analysis:
+            analysis_json, analysis_status = await analysis
+        elif reused_analysis_json is not None:
+            analysis_json, analysis_status = reused_analysis_json, "分析完成"
+        else:
+            analysis_json, analysis_status = None, None
+        return analysis_json, analysis_status, archived_file_drive_id
+
+    async def _analyze_and_archive_drive_report(self, entry: dict, report_db_id: int, inbox_folder_id: str, processed_folder_id: str) -> Tuple[bool, dict]:
+        """
+        對已寫入資料庫的報告進行 AI 分析並歸檔至 Drive，流程與 `ingest_single_drive_file` 的步驟 4–6 相同。
+        分析結果、最終狀態與 metadata 皆不在此寫入，而是以 `batch_update_report_status` 的更新項目返回，由呼叫端整批提交。
+        """
+        file_id, file_name = entry["file_id"], entry["file_name"]
+        log_props = {"file_id": file_id, "file_name": file_name, "report_db_id": report_db_id, "operation": "analyze_and_archive_drive_report"}
+        log = PropsAdapter(logger, {"props": log_props})
+        content = entry.pop("content") # 內容已寫入資料庫；自 entry 移除，分析完成後即可釋放
+        analysis_json, analysis_status, archived_file_drive_id = await self._analyze_while_archiving(
+            report_db_id, content if entry["status"] == "內容已解析" else None, file_name, entry["local_path"], processed_folder_id,
+            entry.get("reused_analysis_json")
+        )
+        del content
+        if not archived_file_drive_id:
+            log.error(
+                "歸檔檔案 '%s' (ID: %s) 至 '%s' 失敗 (上傳步驟)。", file_name, file_id, processed_folder_id,
+                extra={"ingest_step": "archive_upload_failed"}
+            )
+            return False, {"report_id": report_db_id, "status": "擷取錯誤(歸檔上傳失敗)", "analysis_json": analysis_json}
+
+        archive_status_detail = await self._archive_file_in_drive(file_id, file_name, processed_folder_id, inbox_folder_id)
+        archive_status = "已歸檔至Drive"
+        if "failed" in (archive_status_detail or "") or "exception" in (archive_status_detail or ""):
+            archive_status = "擷取部分成功(歸檔刪除失敗)"
+        # AI 分析的最終狀態優先於歸檔狀態；metadata 於插入後未被其他步驟修改，可直接整體取代
+        return True, {
+            "report_id": report_db_id,
+            "status": analysis_status or archive_status,
+            "analysis_json": analysis_json,
+            "metadata": {**entry["metadata"], "archived_drive_file_id": archived_file_drive_id, "archive_status": archive_status_detail},
+        }
+
+    async def _ingest_drive_pipeline(self, pending: List[Tuple[str, str]], inbox_folder_id: str, processed_folder_id: str) -> Tuple[int, int]:
+        """
+        以分段管線擷取一組 Drive 檔案：下載 → 解析 → 批次寫入資料庫 → AI 分析與歸檔 → 批次提交最終狀態。
+
+        各階段由常駐的 worker 組成，以容量為 `PIPELINE_QUEUE_SIZE` 的 `asyncio.Queue` 相連，
+        因此第 N+2 個檔案的下載、第 N+1 個的解析與第 N 個的 AI 分析可以同時進行；佇列已滿時上游會暫停，
+        限制暫存於記憶體的解析內容。下載、解析與分析/歸檔 worker 各有 `INGEST_CONCURRENCY` 個，
+        並共用 `self._ingest_sem` 限制同時對外 (Drive、Gemini) 的請求數。兩個資料庫階段各由單一 worker
+        把佇列中已就緒的項目合併為一次 `batch_insert_reports` / `batch_update_report_status` (每次最多 `INGEST_BATCH_SIZE` 筆)；
+        資料庫錯誤只使該批項目計為失敗，不會中斷其他階段。各階段以哨兵值 None 依序關閉。
+
+        Returns:
+            Tuple[int, int]: 成功與失敗的檔案數。
+        """
+        download_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        parse_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        insert_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        finalize_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        update_q: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        counts = {"success": 0, "fail": 0}
+        log = PropsAdapter(logger, {"props": {"inbox_folder_id": inbox_folder_id, "processed_folder_id": processed_folder_id, "operation": "ingest_drive_pipeline"}})
+
+        def exception_entry(file_id: str, file_name: str, e: Exception) -> dict:
+            log.error(
+                "處理 Drive 檔案 '%s' (ID: %s) 時發生未預期錯誤: %s", file_name, file_id, e, exc_info=True,
+                extra={"file_id": file_id, "file_name": file_name, "ingest_step": "unknown_exception", "error": str(e)}
+            )
+            return {
+                "file_id": file_id, "file_name": file_name, "local_path": self._drive_download_path(file_id, file_name),
+                "content": "[處理異常，內容未知]", "status": "擷取錯誤(處理異常)",
+                "metadata": {"error": "processing_exception_early", "detail": str(e), "drive_file_id": file_id},
+            }
+
+        async def download_worker():
+            while (item := await download_q.get()) is not None:
+                file_id, file_name = item
+                local_download_path = self._drive_download_path(file_id, file_name)
+                try:
+                    async with self._ingest_sem:
+                        downloaded = await self.drive_service.download_file(file_id, local_download_path)
+                except Exception as e:
+                    await insert_q.put(exception_entry(file_id, file_name, e))
+                    continue
+                entry = {"file_id": file_id, "file_name": file_name, "local_path": local_download_path, "content": None}
+                if downloaded:
+                    await parse_q.put(entry)
+                else:
+                    log.error("下載 Drive 檔案 '%s' (ID: %s) 失敗。", file_name, file_id, extra={"file_id": file_id, "file_name": file_name, "ingest_step": "download_failed"})
+                    entry.update(status="擷取錯誤(下載失敗)", metadata={"error": "download_failed", "drive_file_id": file_id})
+                    await insert_q.put(entry)
+
+        async def parse_worker():
+            while (entry := await parse_q.get()) is not None:
                 try:
-                    os.remove(local_download_path)
-                    logger.info(f"已清理暫存檔案: {local_download_path}", extra={"props": {**log_props_base, "cleanup_step": "temp_file_removed", "local_path": local_download_path}})
-                except OSError as e_remove: # 如果刪除臨時檔案失敗
-                    logger.error(f"清理暫存檔案 '{local_download_path}' 失敗: {e_remove}", exc_info=True, extra={"props": {**log_props_base, "cleanup_step": "temp_file_remove_failed", "local_path": local_download_path, "error": str(e_remove)}})
+                    content, content_hash = await asyncio.to_thread(self._parse_report_file, entry["local_path"])
+                except Exception as e:
+                    await insert_q.put(exception_entry(entry["file_id"], entry["file_name"], e))
+                    continue
+                entry.update(
+                    content=content, content_hash=content_hash, status="內容已解析" if not content.startswith("[") else "擷取錯誤(解析問題)",
+                    metadata={"drive_file_id": entry["file_id"]},
+                )
+                await insert_q.put(entry)
+
+        async def insert_worker():
+            async for entries in _iter_queue_batches(insert_q, INGEST_BATCH_SIZE):
+                # 資料庫錯誤只讓本批項目計為失敗，不向外拋出，以免 TaskGroup 取消其他階段仍在處理的檔案
+                try:
+                    report_ids = await self.dal.batch_insert_reports([
+                        {
+                            "original_filename": entry["file_name"], "content": entry["content"],
+                            "source_path": f"drive_id:{entry['file_id']}",
+                            "metadata": entry["metadata"], "status": entry["status"], "content_hash": entry.get("content_hash"),
+                        }
+                        for entry in entries
+                    ])
+                    # 整批以一次查詢找出內容與已分析完成之報告相同的項目，這些項目沿用既有分析結果而不呼叫 Gemini
+                    content_hashes = [entry["content_hash"] for entry in entries if entry.get("content_hash")]
+                    reused_analyses = await self.dal.get_analyses_by_content_hash(content_hashes) if content_hashes else {}
+                except Exception as e:
+                    log.error(
+                        "批次寫入 %s 筆報告到資料庫時發生錯誤: %s", len(entries), e, exc_info=True,
+                        extra={"ingest_step": "db_batch_insert_failed", "batch_size": len(entries), "error": str(e)}
+                    )
+                    report_ids, reused_analyses = [None] * len(entries), {}
+                for entry, report_db_id in zip(entries, report_ids):
+                    if not report_db_id or entry["status"] in ("擷取錯誤(下載失敗)", "擷取錯誤(處理異常)"):
+                        counts["fail"] += 1
+                        await self._remove_temp_file(entry["local_path"])
+                    else:
+                        entry["reused_analysis_json"] = reused_analyses.get(entry.get("content_hash"))
+                        await finalize_q.put((entry, report_db_id))
+
+        async def finalize_worker():
+            while (item := await finalize_q.get()) is not None:
+                entry, report_db_id = item
+                try:
+                    async with self._ingest_sem:
+                        archived, status_update = await self._analyze_and_archive_drive_report(entry, report_db_id, inbox_folder_id, processed_folder_id)
+                except Exception as e:
+                    log.error(
+                        "處理 Drive 檔案 '%s' (ID: %s) 時發生未預期錯誤: %s", entry['file_name'], entry['file_id'], e, exc_info=True,
+                        extra={"file_id": entry["file_id"], "file_name": entry["file_name"], "report_db_id": report_db_id, "ingest_step": "unknown_exception", "error": str(e)}
+                    )
+                    archived, status_update = False, {"report_id": report_db_id, "status": "擷取錯誤(處理異常)"}
+                finally:
+                    await self._remove_temp_file(entry["local_path"])
+                await update_q.put((archived, status_update))
+
+        async def update_worker():
+            # 成功與否在最終狀態確實寫入後才計數：寫入失敗 (拋出例外或未更新任何列) 時整批計為失敗，但不中斷管線
+            async for items in _iter_queue_batches(update_q, INGEST_BATCH_SIZE):
+                try:
+                    updated = await self.dal.batch_update_report_status([status_update for _, status_update in items])
+                except Exception as e:
+                    log.error(
+                        "批次提交 %s 筆報告的最終狀態時發生錯誤: %s", len(items), e, exc_info=True,
+                        extra={"ingest_step": "db_batch_update_failed", "batch_size": len(items), "error": str(e)}
+                    )
+                    updated = 0
+                if not updated:
+                    log.error(
+                        "%s 筆報告的最終狀態未能寫入資料庫，計為失敗。", len(items),
+                        extra={"ingest_step": "db_batch_update_failed", "batch_size": len(items), "report_ids": [update["report_id"] for _, update in items]}
+                    )
+                    counts["fail"] += len(items)
+                    continue
+                for archived, _ in items:
+                    counts["success" if archived else "fail"] += 1
+
+        async def feed_and_shut_down():
+            for item in pending:
+                await download_q.put(item)
+            for _ in download_tasks:
+                await download_q.put(None)
+            # 依序關閉各階段：上游 worker 全部結束後，才向下游的每個 worker 送出哨兵值
+            for stage_tasks, next_q, next_tasks in (
+                (download_tasks, parse_q, parse_tasks),
+                (parse_tasks, insert_q, [insert_task]),
+                ([insert_task], finalize_q, finalize_tasks),
+                (finalize_tasks, update_q, [update_task]),
+            ):
+                await asyncio.gather(*stage_tasks)
+                for _ in next_tasks:
+                    await next_q.put(None)
+
+        # 任何 worker 意外失敗時，TaskGroup 會取消其餘 worker，避免它們永久阻塞於已無消費者或生產者的佇列
+        try:
+            async with asyncio.TaskGroup() as tg:
+                download_tasks = [tg.create_task(download_worker()) for _ in range(INGEST_CONCURRENCY)]
+                parse_tasks = [tg.create_task(parse_worker()) for _ in range(INGEST_CONCURRENCY)]
+                insert_task = tg.create_task(insert_worker())
+                finalize_tasks = [tg.create_task(finalize_worker()) for _ in range(INGEST_CONCURRENCY)]
+                update_task = tg.create_task(update_worker())
+                tg.create_task(feed_and_shut_down())
+        except Exception as e:
+            # 保留已確實完成的成功計數，其餘尚未確認結果的檔案計為失敗
+            log.error(
+                "擷取管線意外中止: %s", e, exc_info=True,
+                extra={"ingest_step": "pipeline_aborted", "pending_count": len(pending), "success_count": counts["success"], "error": str(e)}
+            )
+            return counts["success"], len(pending) - counts["success"]
+        return counts["success"], counts["fail"]
+
+    async def _remove_temp_file(self, local_path: str) -> None:
+        """於工作執行緒中刪除本地暫存檔案 (不存在時忽略)，不阻塞事件迴圈；失敗時僅記錄日誌。"""
+        try:
+            await asyncio.to_thread(os.remove, local_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e_remove:
+            log = PropsAdapter(logger, {"props": {"local_path": local_path, "operation": "remove_temp_file"}})
+            log.error("清理暫存檔案 '%s' 失敗: %s", local_path, e_remove, exc_info=True, extra={"cleanup_step": "temp_file_remove_failed", "error": str(e_remove)})
 
     async def ingest_reports_from_drive_folder(self, inbox_folder_id: str, processed_folder_id: str) -> Tuple[int, int]:
         log_props_batch = {"inbox_folder_id": inbox_folder_id, "processed_folder_id": processed_folder_id, "operation": "ingest_reports_from_drive_folder"}
+        log = PropsAdapter(logger, {"props": log_props_batch})
         if not self.drive_service:
-            logger.error("Drive Service 未初始化，無法從 Drive 資料夾擷取報告。", extra={"props": {**log_props_batch, "error": "drive_service_not_initialized"}})
+            log.error("Drive Service 未初始化，無法從 Drive 資料夾擷取報告。", extra={"error": "drive_service_not_initialized"})
             return 0, 0
 
-        logger.info(f"開始從 Drive 資料夾 ID '{inbox_folder_id}' 擷取報告...", extra={"props": {**log_props_batch, "batch_status": "started"}})
+        log.info("開始從 Drive 資料夾 ID '%s' 擷取報告...", inbox_folder_id, extra={"batch_status": "started"})
         try:
-            files = await self.drive_service.list_files_in_folder(inbox_folder_id) # DriveService should log internally
+            files = await self.drive_service.list_files(inbox_folder_id) # DriveService should log internally
         except Exception as e_list:
-            logger.error(f"列出 Drive 資料夾 '{inbox_folder_id}' 中的檔案時發生錯誤: {e_list}", exc_info=True, extra={"props": {**log_props_batch, "batch_status": "list_files_failed", "error": str(e_list)}})
+            log.error("列出 Drive 資料夾 '%s' 中的檔案時發生錯誤: %s", inbox_folder_id, e_list, exc_info=True, extra={"batch_status": "list_files_failed", "error": str(e_list)})
             return 0,0
 
         if not files:
-            logger.info(f"在資料夾 ID '{inbox_folder_id}' 中沒有找到檔案。", extra={"props": {**log_props_batch, "batch_status": "no_files_found"}})
+            log.info("在資料夾 ID '%s' 中沒有找到檔案。", inbox_folder_id, extra={"batch_status": "no_files_found"})
             return 0, 0
 
         success_count = 0
         fail_count = 0
+        candidates = [] # 具備 ID 與名稱的檔案 (file_id, file_name)
 
         for file_item in files:
             file_id = file_item.get('id')
             file_name = file_item.get('name')
-            log_props_item = {**log_props_batch, "current_file_id": file_id, "current_file_name": file_name}
 
             if not file_id or not file_name:
-                logger.warning(f"從 Drive API 收到的檔案項目缺少 ID 或名稱: {file_item}，跳過此項目。", extra={"props": {**log_props_item, "error": "missing_file_id_or_name", "file_item": file_item}})
+                log.warning("從 Drive API 收到的檔案項目缺少 ID 或名稱: %s，跳過此項目。", file_item, extra={"current_file_id": file_id, "current_file_name": file_name, "error": "missing_file_id_or_name", "file_item": file_item})
                 fail_count +=1
                 continue
+            candidates.append((file_id, file_name))
+
+        # 以單次查詢找出已擷取過的來源，取代逐檔呼叫 check_report_exists_by_source_path
+        existing_source_paths = await self.dal.filter_existing_source_paths([f"drive_id:{file_id}" for file_id, _ in candidates]) # DAL logs internally
+        pending = [] # 尚未擷取的新檔案 (file_id, file_name)
+        for file_id, file_name in candidates:
+            if f"drive_id:{file_id}" in existing_source_paths:
+                log.info("報告來源 '%s' (Drive ID: %s) 已存在於資料庫中，跳過重複擷取。", file_name, file_id, extra={"current_file_id": file_id, "current_file_name": file_name, "skipped": "duplicate_by_source_path"})
+                continue
+            pending.append((file_id, file_name))
 
-            logger.info(f"準備處理 Drive 檔案 '{file_name}' (ID: {file_id})...", extra={"props": log_props_item})
-            try:
-                if await self.dal.check_report_exists_by_source_path(f"drive_id:{file_id}"): # DAL logs internally
-                    logger.info(f"報告來源 '{file_name}' (Drive ID: {file_id}) 已存在於資料庫中，跳過重複擷取。", extra={"props": {**log_props_item, "skipped": "duplicate_by_source_path"}})
-                    continue
+        if pending:
+            # 管線內部處理各階段的錯誤，並返回已確實完成的成功與失敗計數
+            success_count, pipeline_fail_count = await self._ingest_drive_pipeline(pending, inbox_folder_id, processed_folder_id)
+            fail_count += pipeline_fail_count
 
-                if await self.ingest_single_drive_file(file_id, file_name, inbox_folder_id, processed_folder_id): # This method logs extensively
-                    success_count += 1
-                    # logger.info(f"成功處理並歸檔 Drive 檔案 '{file_name}' (ID: {file_id})。", extra={"props": {**log_props_item, "ingest_status": "success"}}) # Redundant if ingest_single_drive_file logs its final success
-                else:
-                    fail_count += 1
-                    logger.warning(f"處理 Drive 檔案 '{file_name}' (ID: {file_id}) 未完全成功 (詳見先前日誌)。", extra={"props": {**log_props_item, "ingest_status": "failed"}})
-            except Exception as e_single_file:
-                fail_count += 1
-                logger.error(f"於排程任務中處理 Drive 檔案 '{file_name}' (ID: {file_id}) 時發生頂層錯誤: {e_single_file}", exc_info=True, extra={"props": {**log_props_item, "ingest_status": "loop_exception", "error": str(e_single_file)}})
-                if not await self.dal.check_report_exists_by_source_path(f"drive_id:{file_id}"):
-                    try:
-                        await self.dal.insert_report_data(
-                            original_filename=file_name, content=f"[排程處理時發生錯誤: {str(e_single_file)}]",
-                            source_path=f"drive_id:{file_id}",
-                            metadata={"error": "scheduler_loop_exception", "drive_file_id": file_id},
-                            status="擷取錯誤(排程異常)"
-                        )
-                    except Exception as db_e:
-                        logger.error(f"為錯誤檔案 '{file_name}' (ID: {file_id}) 寫入錯誤記錄到資料庫時再次失敗: {db_e}", exc_info=True, extra={"props": {**log_props_item, "db_error_logging_failed": str(db_e)}})
-
-        logger.info(f"從 Drive 資料夾 '{inbox_folder_id}' 擷取完成。成功: {success_count} 個, 失敗: {fail_count} 個。", extra={"props": {**log_props_batch, "batch_status": "completed", "success_count": success_count, "fail_count": fail_count}})
+        log.info("從 Drive 資料夾 '%s' 擷取完成。成功: %s 個, 失敗: %s 個。", inbox_folder_id, success_count, fail_count, extra={"batch_status": "completed", "success_count": success_count, "fail_count": fail_count})
         return success_count, fail_count
 
     async def ingest_uploaded_file(self, file_name: str, file_path: str) -> Optional[int]:
@@ -358,12 +705,13 @@ class ReportIngestionService:
                            則返回 `None`。
         """
         log_props_upload = {"file_name": file_name, "file_path": file_path, "operation": "ingest_uploaded_file"}
-        logger.info(f"開始處理上傳的檔案: '{file_name}'，路徑: '{file_path}'。", extra={"props": {**log_props_upload, "upload_step": "start"}})
+        log = PropsAdapter(logger, {"props": log_props_upload})
+        log.info("開始處理上傳的檔案: '%s'，路徑: '%s'。", file_name, file_path, extra={"upload_step": "start"})
         report_db_id = None # 初始化資料庫報告 ID
         try:
             # 步驟 1: 解析檔案內容
-            # ParsingService 內部會記錄其詳細的解析日誌
-            content = self.parsing_service.extract_text_from_file(file_path)
+            # ParsingService 內部會記錄其詳細的解析日誌；於工作執行緒中進行，避免大型文字檔阻塞事件迴圈
+            content = await asyncio.to_thread(self.parsing_service.extract_text_from_file, file_path)
 
             # 步驟 2: 根據解析結果確定初始狀態
             # ParsingService 在無法解析或檔案不受支持時會返回以 '[' 開頭的錯誤或提示訊息
@@ -383,10 +731,10 @@ class ReportIngestionService:
 
             # 步驟 4: 處理資料庫插入結果
             if not report_db_id: # 如果未能獲取到資料庫 ID，表示插入失敗
-                logger.error(f"處理上傳的檔案 '{file_name}' 後，存入資料庫失敗。", extra={"props": {**log_props_upload, "upload_step": "db_insert_failed"}})
+                log.error("處理上傳的檔案 '%s' 後，存入資料庫失敗。", file_name, extra={"upload_step": "db_insert_failed"})
                 return None # 返回 None 表示處理失敗
 
-            logger.info(f"上傳的檔案 '{file_name}' 已成功處理並存入資料庫，ID: {report_db_id}，狀態: '{initial_status}'。", extra={"props": {**log_props_upload, "upload_step": "db_insert_success"}})
+            log.info("上傳的檔案 '%s' 已成功處理並存入資料庫，ID: %s，狀態: '%s'。", file_name, report_db_id, initial_status, extra={"upload_step": "db_insert_success"})
 
             # 步驟 5: 如果內容已成功解析，則進行 AI 分析
             if initial_status == "內容已解析":
@@ -398,9 +746,12 @@ class ReportIngestionService:
 
         # 步驟 7: 捕獲處理過程中的任何未預期異常
         except Exception as e:
-            logger.error(f"處理上傳的檔案 '{file_name}' 時發生錯誤: {e}", exc_info=True, extra={"props": {**log_props_upload, "upload_step": "exception", "error": str(e)}})
+            log.error("處理上傳的檔案 '%s' 時發生錯誤: %s", file_name, e, exc_info=True, extra={"upload_step": "exception", "error": str(e)})
             if report_db_id: # 如果報告已存入資料庫，但後續步驟（如AI分析）出錯
                 # 更新資料庫中的分析結果為錯誤信息，並將狀態標記為系統異常
-                error_json = json.dumps({"錯誤": f"處理上傳檔案時發生意外: {str(e)}"}, ensure_ascii=False)
-                await self.dal.update_report_analysis(report_db_id, error_json, "擷取錯誤(系統異常)")
+                error_json = orjson.dumps({"錯誤": f"處理上傳檔案時發生意外: {str(e)}"}).decode('utf-8')
+                try:
+                    await self.dal.update_report_analysis(report_db_id, error_json, "擷取錯誤(系統異常)")
+                except Exception as e_record: # 僅盡力記錄，不讓資料庫錯誤從上傳端點拋出
+                    log.error("記錄上傳檔案 '%s' 的錯誤狀態時失敗: %s", file_name, e_record, exc_info=True, extra={"upload_step": "record_error_failed", "error": str(e_record)})
             return None # 返回 None 表示處理失敗
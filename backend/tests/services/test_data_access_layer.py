@@ -177,6 +177,107 @@ async def test_check_report_exists_by_source_path(dal_instance: DataAccessLayer)
     assert await dal_instance.check_report_exists_by_source_path(source_path_exists) is True
     assert await dal_instance.check_report_exists_by_source_path(source_path_not_exists) is False
 
+async def test_batch_insert_reports_returns_ids_in_order(dal_instance: DataAccessLayer):
+    reports = [
+        {"original_filename": f"批次報告_{i}.txt", "content": f"內容 {i}", "source_path": f"drive_id:batch_{i}",
+         "metadata": {"drive_file_id": f"batch_{i}"}, "status": "內容已解析"}
+        for i in range(3)
+    ]
+    reports.append({"original_filename": "下載失敗.txt", "content": None, "source_path": "drive_id:batch_err"})
+
+    report_ids = await dal_instance.batch_insert_reports(reports)
+    assert len(report_ids) == 4
+    assert len(set(report_ids)) == 4
+
+    for report, report_id in zip(reports, report_ids):
+        retrieved = await dal_instance.get_report_by_id(report_id)
+        assert retrieved["source_path"] == report["source_path"]
+    last = await dal_instance.get_report_by_id(report_ids[-1])
+    assert last["status"] == "已擷取待處理"
+    assert last["metadata"] is None
+    assert await dal_instance.batch_insert_reports([]) == []
+
+async def test_batch_insert_reports_rolls_back_on_error(dal_instance: DataAccessLayer):
+    reports = [
+        {"original_filename": "ok.txt", "content": "c", "source_path": "drive_id:rollback_ok"},
+        {"original_filename": None, "content": "c", "source_path": "drive_id:rollback_bad"}, # 違反 NOT NULL
+    ]
+    assert await dal_instance.batch_insert_reports(reports) == [None, None]
+    assert await dal_instance.check_report_exists_by_source_path("drive_id:rollback_ok") is False
+
+async def test_batch_update_report_status(dal_instance: DataAccessLayer):
+    first_id, second_id = await dal_instance.batch_insert_reports([
+        {"original_filename": "a.txt", "content": "a", "source_path": "drive_id:a", "metadata": {"drive_file_id": "a"}, "status": "內容已解析"},
+        {"original_filename": "b.txt", "content": "b", "source_path": "drive_id:b", "metadata": {"drive_file_id": "b"}, "status": "分析完成"},
+    ])
+
+    rows_affected = await dal_instance.batch_update_report_status([
+        {"report_id": first_id, "status": "已歸檔至Drive"},
+        {"report_id": second_id, "metadata": {"drive_file_id": "b", "archive_status": "deleted_from_inbox"}},
+        {"report_id": 99999, "status": "已歸檔至Drive"},
+    ])
+    assert rows_affected == 2
+
+    first = await dal_instance.get_report_by_id(first_id)
+    assert first["status"] == "已歸檔至Drive"
+    assert json.loads(first["metadata"]) == {"drive_file_id": "a"} # 未提供 metadata 時保留原值
+    second = await dal_instance.get_report_by_id(second_id)
+    assert second["status"] == "分析完成" # 未提供 status 時保留原值
+    assert json.loads(second["metadata"]) == {"drive_file_id": "b", "archive_status": "deleted_from_inbox"}
+    assert await dal_instance.batch_update_report_status([]) == 0
+
+async def test_finalize_report(dal_instance: DataAccessLayer):
+    report_id = await dal_instance.insert_report_data("f.txt", "content", "drive_id:f", {"drive_file_id": "f"}, "內容已解析")
+    analysis = json.dumps({"summary": "摘要"}, ensure_ascii=False)
+
+    assert await dal_instance.finalize_report(report_id, "分析完成", analysis, {"drive_file_id": "f", "archive_status": "deleted_from_inbox"})
+    report = await dal_instance.get_report_by_id(report_id)
+    assert report["status"] == "分析完成"
+    assert report["analysis_json"] == analysis
+    assert json.loads(report["metadata"]) == {"drive_file_id": "f", "archive_status": "deleted_from_inbox"}
+
+    assert await dal_instance.finalize_report(report_id, "已歸檔至Drive") # 未提供 analysis_json / metadata 時保留原值
+    report = await dal_instance.get_report_by_id(report_id)
+    assert report["status"] == "已歸檔至Drive"
+    assert report["analysis_json"] == analysis
+    assert not await dal_instance.finalize_report(99999, "分析完成")
+
+async def test_filter_existing_source_paths(dal_instance: DataAccessLayer):
+    await dal_instance.insert_report_data("q1.docx", "content", "drive_id:q1")
+    await dal_instance.insert_report_data("q3.docx", "content", "drive_id:q3")
+
+    existing = await dal_instance.filter_existing_source_paths(["drive_id:q1", "drive_id:q2", "drive_id:q3", "drive_id:q1"])
+    assert existing == {"drive_id:q1", "drive_id:q3"}
+    assert await dal_instance.filter_existing_source_paths([]) == set()
+
+async def test_get_analyses_by_content_hash(dal_instance: DataAccessLayer):
+    analysis = json.dumps({"summary": "摘要"}, ensure_ascii=False)
+    done_id = await dal_instance.insert_report_data("a.txt", "content", "drive_id:a", status="內容已解析", content_hash="hash_a")
+    await dal_instance.finalize_report(done_id, "分析完成", analysis)
+    await dal_instance.insert_report_data("b.txt", "content", "drive_id:b", status="內容已解析", content_hash="hash_b") # 尚未分析完成
+
+    assert await dal_instance.get_analyses_by_content_hash(["hash_a", "hash_b", "hash_c", "hash_a"]) == {"hash_a": analysis}
+    assert await dal_instance.get_analyses_by_content_hash([]) == {}
+
+async def test_initialize_databases_adds_content_hash_to_existing_table(tmp_path):
+    reports_path = str(tmp_path / "reports.sqlite")
+    async with aiosqlite.connect(reports_path) as conn: # 不含 content_hash 欄位的舊版 reports 表
+        await conn.execute(
+            "CREATE TABLE reports (id INTEGER PRIMARY KEY AUTOINCREMENT, original_filename TEXT NOT NULL, content TEXT, "
+            "source_path TEXT, processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, status TEXT DEFAULT 'pending', metadata TEXT, analysis_json TEXT)"
+        )
+        await conn.commit()
+
+    dal = DataAccessLayer(reports_path, str(tmp_path / "prompts.sqlite"))
+    try:
+        await dal.initialize_databases()
+        await dal.initialize_databases() # 重複初始化不應重複新增欄位
+        report_id = await dal.insert_report_data("old.txt", "content", "drive_id:old", content_hash="hash_old")
+        report = await dal.get_report_by_id(report_id)
+        assert report["content_hash"] == "hash_old"
+    finally:
+        await dal.close_connections()
+
 # --- Test Prompt Template CRUD Operations ---
 
 async def test_insert_prompt_template_success(dal_instance: DataAccessLayer):
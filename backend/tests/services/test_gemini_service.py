@@ -268,3 +268,19 @@ async def test_summarize_text_blocked_response(mock_settings_with_api_key, mock_
 
 # Add more tests for analyze_report for different scenarios like empty content, API failures etc.
 # similar to summarize_text tests.
+
+@pytest.mark.asyncio
+async def test_generative_model_reused_across_requests(mock_genai_configure, mock_generative_model, mocker):
+    """測試 GeminiService：多次請求共用同一個 GenerativeModel，不會每次重新建立。"""
+    mocker.patch('backend.services.gemini_service.settings', Settings(GOOGLE_API_KEY=SecretStr("test_api_key_12345")))
+    model_class = mocker.patch('google.generativeai.GenerativeModel', return_value=mock_generative_model)
+    mock_response = MagicMock()
+    mock_response.parts = [MagicMock(text='{"摘要": "結果"}')]
+    mock_generative_model.generate_content_async.return_value = mock_response
+    service = GeminiService()
+
+    await service.analyze_report("報告一")
+    await service.analyze_report("報告二")
+
+    model_class.assert_called_once_with(service.model_name)
+    assert mock_generative_model.generate_content_async.call_count == 2
@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 import pytest
+import asyncio
+import logging
 import json
+import hashlib
 import os
 from unittest.mock import MagicMock, AsyncMock, patch
 
 from backend.services.google_drive_service import GoogleDriveService, DRIVE_SCOPES
+from aiogoogle import Aiogoogle
 from aiogoogle.auth.creds import ServiceAccountCreds
 
 # 可重用的服務帳號資訊字典
@@ -63,6 +67,23 @@ def test_init_invalid_json_content_raises_value_error(invalid_service_account_fi
     with pytest.raises(ValueError, match=f"從 JSON 檔案 {invalid_service_account_file_bad_json} 初始化憑證失敗"):
         GoogleDriveService(service_account_json_path=invalid_service_account_file_bad_json)
 
+def test_init_json_path_parses_file_once_until_modified(valid_service_account_file: str, mocker):
+    """
+    測試以相同金鑰檔案建立多個實例時只解析一次 JSON，檔案修改後會重新讀取。
+    """
+    from backend.services.google_drive_service import _load_service_account_info
+    _load_service_account_info.cache_clear()
+    loads_spy = mocker.spy(__import__("orjson"), "loads")
+
+    GoogleDriveService(service_account_json_path=valid_service_account_file)
+    GoogleDriveService(service_account_json_path=valid_service_account_file)
+    assert loads_spy.call_count == 1
+
+    stat = os.stat(valid_service_account_file)
+    os.utime(valid_service_account_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    GoogleDriveService(service_account_json_path=valid_service_account_file)
+    assert loads_spy.call_count == 2
+
 @patch('aiogoogle.Aiogoogle') # Mock Aiogoogle 以避免實際的網路調用或憑證驗證
 @patch('aiogoogle.auth.creds.ServiceAccountCreds') # Mock ServiceAccountCreds
 def test_init_success_with_service_account_info(mock_sa_creds, mock_aiogoogle_constructor):
@@ -100,6 +121,26 @@ def test_init_success_with_json_path(mock_sa_creds, mock_aiogoogle_constructor,
     assert service.aiogoogle is not None
 
 # --- Mock Fixture for Aiogoogle and Drive API calls ---
+@pytest.mark.asyncio
+async def test_from_json_path_success(valid_service_account_file: str, mocker):
+    """
+    測試 from_json_path：以非同步方式讀取 JSON 檔案並將內容作為 service_account_info 傳入建構函數。
+    """
+    mock_init = mocker.patch.object(GoogleDriveService, "__init__", return_value=None)
+    service = await GoogleDriveService.from_json_path(valid_service_account_file)
+    assert isinstance(service, GoogleDriveService)
+    assert mock_init.call_args.kwargs["service_account_info"] == VALID_SERVICE_ACCOUNT_INFO
+
+@pytest.mark.asyncio
+async def test_from_json_path_errors(tmp_path, invalid_service_account_file_bad_json: str):
+    """
+    測試 from_json_path：檔案不存在時拋出 FileNotFoundError，JSON 無效時拋出 ValueError。
+    """
+    with pytest.raises(FileNotFoundError):
+        await GoogleDriveService.from_json_path(str(tmp_path / "missing.json"))
+    with pytest.raises(ValueError):
+        await GoogleDriveService.from_json_path(invalid_service_account_file_bad_json)
+
 @pytest.fixture
 def mock_aiogoogle_service_account(mocker):
     """
@@ -118,14 +159,15 @@ def mock_aiogoogle_service_account(mocker):
     # So, we make as_service_account an AsyncMock that returns a predefined response or another mock.
     mock_as_service_account_response = AsyncMock()
     mock_google.as_service_account = mock_as_service_account_response
+    mock_google.__aenter__.return_value = mock_google
 
     # Mock specific API methods on drive_v3.files (which itself needs to be a mock)
     mock_drive_v3_api.files = MagicMock()
-    mock_drive_v3_api.files.list = AsyncMock()
-    mock_drive_v3_api.files.get = AsyncMock()
-    mock_drive_v3_api.files.create = AsyncMock()
-    mock_drive_v3_api.files.update = AsyncMock()
-    mock_drive_v3_api.files.delete = AsyncMock()
+    mock_drive_v3_api.files.list = MagicMock()
+    mock_drive_v3_api.files.get = MagicMock()
+    mock_drive_v3_api.files.create = MagicMock()
+    mock_drive_v3_api.files.update = MagicMock()
+    mock_drive_v3_api.files.delete = MagicMock()
 
     # Patch the Aiogoogle constructor to return our main mock_google instance
     mocker.patch('backend.services.google_drive_service.Aiogoogle', return_value=mock_google)
@@ -170,13 +212,29 @@ async def test_list_files_success_no_pagination(valid_service: GoogleDriveServic
     # 驗證 drive_v3.files.list 是否以正確參數被調用
     mock_drive_v3_api.files.list.assert_called_once_with(
         q=f"'{folder_id_to_list}' in parents and trashed=false",
-        pageSize=100, # 預設 pageSize
+        pageSize=1000, # 預設 pageSize (API 上限)
         fields="nextPageToken, files(id, name, mimeType, modifiedTime, parents)", # 預設 fields
         pageToken=None,
-        corpora="user"
+        corpora="user",
+        spaces="drive"
     )
     mock_google.as_service_account.assert_called_once_with(mock_drive_v3_api.files.list.return_value)
 
+@pytest.mark.asyncio
+async def test_list_files_order_by_is_passed_and_cached_separately(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 list_files 的 order_by：指定時才傳入 orderBy，且不同排序的結果分別快取。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = {"files": [{"id": "a"}]}
+
+    await valid_service.list_files(folder_id="sorted", order_by="folder,modifiedTime desc")
+    await valid_service.list_files(folder_id="sorted")
+
+    assert mock_drive_v3_api.files.list.call_count == 2
+    assert mock_drive_v3_api.files.list.call_args_list[0].kwargs["orderBy"] == "folder,modifiedTime desc"
+    assert "orderBy" not in mock_drive_v3_api.files.list.call_args_list[1].kwargs
+
 
 @pytest.mark.asyncio
 async def test_list_files_success_with_pagination(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
@@ -228,6 +286,145 @@ async def test_list_files_empty_result(valid_service: GoogleDriveService, mock_a
     mock_drive_v3_api.files.list.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_iter_files_yields_lazily_and_stops_early(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 iter_files：逐頁產出項目，呼叫者提前結束時不會請求後續分頁。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.side_effect = [
+        {"files": [{"id": "a"}, {"id": "target"}], "nextPageToken": "p2"},
+        {"files": [{"id": "c"}]},
+    ]
+
+    seen = []
+    async for file_item in valid_service.iter_files(folder_id="folder", page_size=2):
+        seen.append(file_item["id"])
+        if file_item["id"] == "target":
+            break
+
+    assert seen == ["a", "target"]
+    assert mock_drive_v3_api.files.list.call_count == 1
+
+@pytest.mark.asyncio
+async def test_iter_files_prefetch_requests_next_page_before_yielding(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 iter_files(prefetch=True)：在呼叫者處理第一頁時，下一頁的請求已經送出。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.side_effect = [
+        {"files": [{"id": "a"}, {"id": "b"}], "nextPageToken": "p2"},
+        {"files": [{"id": "c"}]},
+    ]
+
+    seen = []
+    async for file_item in valid_service.iter_files(folder_id="folder", page_size=2, prefetch=True):
+        await asyncio.sleep(0) # 讓預先請求的背景任務有機會執行
+        seen.append((file_item["id"], mock_google.as_service_account.call_count))
+
+    assert seen == [("a", 2), ("b", 2), ("c", 2)]
+    assert mock_drive_v3_api.files.list.call_args_list[1].kwargs["pageToken"] == "p2"
+
+@pytest.mark.asyncio
+async def test_list_files_escapes_folder_id_in_query(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 list_files：資料夾 ID 中的單引號與反斜線會依 Drive 查詢語法跳脫。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = {"files": []}
+
+    await valid_service.list_files(folder_id="a'b\\c")
+
+    assert mock_drive_v3_api.files.list.call_args.kwargs["q"] == "'a\\'b\\\\c' in parents and trashed=false"
+
+@pytest.mark.asyncio
+async def test_list_files_coalesces_concurrent_calls_and_caches(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 list_files：同一資料夾的並行呼叫只走訪一次，結果在 TTL 內被快取，寫入操作後快取失效。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    async def slow_list(request, **kwargs):
+        await asyncio.sleep(0.01)
+        return {"files": [{"id": "f1"}]}
+    mock_google.as_service_account.side_effect = slow_list
+
+    results = await asyncio.gather(*(valid_service.list_files(folder_id="hot") for _ in range(5)))
+    assert all(r == [{"id": "f1"}] for r in results)
+    assert mock_drive_v3_api.files.list.call_count == 1
+
+    results[0].append({"id": "mutated"}) # 呼叫者修改返回的列表不應影響快取
+    assert await valid_service.list_files(folder_id="hot") == [{"id": "f1"}]
+    assert mock_drive_v3_api.files.list.call_count == 1
+
+    assert await valid_service.delete_file("f1") is True
+    await valid_service.list_files(folder_id="hot")
+    assert mock_drive_v3_api.files.list.call_count == 2
+
+@pytest.mark.asyncio
+async def test_list_files_parallel_shards_by_mime_type_and_dedups(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 list_files_parallel：預設按 mimeType 拆分為資料夾/非資料夾兩個分片，各自分頁，並依 id 去重合併。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    folder_id = "parallel_folder"
+    responses = {
+        (f"'{folder_id}' in parents and trashed=false and mimeType = 'application/vnd.google-apps.folder'", None): {"files": [{"id": "d1"}]},
+        (f"'{folder_id}' in parents and trashed=false and mimeType != 'application/vnd.google-apps.folder'", None): {"files": [{"id": "f1"}], "nextPageToken": "t2"},
+        (f"'{folder_id}' in parents and trashed=false and mimeType != 'application/vnd.google-apps.folder'", "t2"): {"files": [{"id": "f2"}, {"id": "f1"}]},
+    }
+    mock_drive_v3_api.files.list.side_effect = lambda **kwargs: (kwargs["q"], kwargs["pageToken"])
+    mock_google.as_service_account.side_effect = lambda key: responses[key]
+
+    files = await valid_service.list_files_parallel(folder_id=folder_id)
+
+    assert sorted(f["id"] for f in files) == ["d1", "f1", "f2"]
+    assert mock_drive_v3_api.files.list.call_count == 3
+
+@pytest.mark.asyncio
+async def test_list_files_parallel_unsupported_shard_field(valid_service: GoogleDriveService):
+    """
+    測試 list_files_parallel：不支援的 shard_field 且未提供 shards 時應拋出 ValueError。
+    """
+    with pytest.raises(ValueError):
+        await valid_service.list_files_parallel(folder_id="x", shard_field="name")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("page_size", [0, 1001])
+async def test_list_files_invalid_page_size_raises_value_error(valid_service: GoogleDriveService, mock_aiogoogle_service_account, page_size: int):
+    """
+    測試 list_files / iter_files / list_files_parallel：page_size 超出 1–1000 時拋出 ValueError，且不發出任何 API 請求。
+    """
+    _, mock_drive_v3_api = mock_aiogoogle_service_account
+    with pytest.raises(ValueError, match="page_size"):
+        await valid_service.list_files(folder_id="x", page_size=page_size)
+    with pytest.raises(ValueError, match="page_size"):
+        async for _ in valid_service.iter_files(folder_id="x", page_size=page_size):
+            pass
+    with pytest.raises(ValueError, match="page_size"):
+        await valid_service.list_files_parallel(folder_id="x", page_size=page_size)
+    mock_drive_v3_api.files.list.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_list_files_parallel_shards_by_modified_time(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 list_files_parallel(shard_field="modifiedTime")：依最舊/最新修改時間切出首尾開放、彼此互斥的時間分片。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    base = "'big' in parents and trashed=false"
+    responses = {
+        (base, "modifiedTime"): {"files": [{"modifiedTime": "2024-01-01T00:00:00.000Z"}]},
+        (base, "modifiedTime desc"): {"files": [{"modifiedTime": "2024-01-01T00:00:04.000Z"}]},
+        (f"{base} and modifiedTime < '2024-01-01T00:00:02'", None): {"files": [{"id": "old"}]},
+        (f"{base} and modifiedTime >= '2024-01-01T00:00:02'", None): {"files": [{"id": "new"}, {"id": "old"}]},
+    }
+    mock_drive_v3_api.files.list.side_effect = lambda **kwargs: (kwargs["q"], kwargs.get("orderBy", kwargs.get("pageToken")))
+    mock_google.as_service_account.side_effect = lambda key: responses[key]
+
+    files = await valid_service.list_files_parallel(folder_id="big", shard_field="modifiedTime", shard_count=2)
+
+    assert sorted(f["id"] for f in files) == ["new", "old"]
+    assert mock_drive_v3_api.files.list.call_count == 4
+
 @pytest.mark.asyncio
 async def test_list_files_api_call_exception(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
     """
@@ -269,7 +466,7 @@ async def test_download_file_success(valid_service: GoogleDriveService, mock_aio
 
     assert success is True
     # 驗證 get 元數據的調用
-    mock_drive_v3_api.files.get.assert_any_call(fileId=file_id, fields="mimeType, name")
+    mock_drive_v3_api.files.get.assert_any_call(fileId=file_id, fields="mimeType,name,size,modifiedTime")
     # 驗證 get 媒體內容的調用
     mock_drive_v3_api.files.get.assert_any_call(fileId=file_id, alt="media", download_file=str(destination_path))
     assert mock_google.as_service_account.call_count == 2
@@ -294,7 +491,7 @@ async def test_download_file_is_folder_error(valid_service: GoogleDriveService,
     success = await valid_service.download_file(folder_id, str(destination_path))
 
     assert success is False
-    mock_drive_v3_api.files.get.assert_called_once_with(fileId=folder_id, fields="mimeType, name")
+    mock_drive_v3_api.files.get.assert_called_once_with(fileId=folder_id, fields="mimeType,name,size,modifiedTime")
     mock_google.as_service_account.assert_called_once() # 只應調用元數據獲取
 
 @pytest.mark.asyncio
@@ -312,7 +509,7 @@ async def test_download_file_metadata_fetch_fails(valid_service: GoogleDriveServ
     success = await valid_service.download_file(file_id, str(destination_path))
 
     assert success is False
-    mock_drive_v3_api.files.get.assert_called_once_with(fileId=file_id, fields="mimeType, name")
+    mock_drive_v3_api.files.get.assert_called_once_with(fileId=file_id, fields="mimeType,name,size,modifiedTime")
     mock_google.as_service_account.assert_called_once()
 
 @pytest.mark.asyncio
@@ -350,16 +547,19 @@ async def test_download_file_media_download_exception(valid_service: GoogleDrive
 
     mock_metadata_response = {"mimeType": "text/plain", "name": file_name}
 
-    # 第一次調用 (元數據) 成功，第二次調用 (下載) 拋出異常
-    mock_google.as_service_account.side_effect = [
-        mock_metadata_response,
-        Exception("模擬下載媒體內容時的網路錯誤")
-    ]
+    # 第一次調用 (元數據) 成功，第二次調用 (下載) 在寫入部分內容後拋出異常
+    async def partial_download(request, **kwargs):
+        if kwargs.get("full_res"):
+            destination_path.write_bytes(b"partial")
+            raise Exception("模擬下載媒體內容時的網路錯誤")
+        return mock_metadata_response
+    mock_google.as_service_account.side_effect = partial_download
 
     success = await valid_service.download_file(file_id, str(destination_path))
 
     assert success is False
     assert mock_google.as_service_account.call_count == 2 # 兩次都被嘗試了
+    assert not destination_path.exists() # 不完整的檔案已被清除
 
 @pytest.mark.asyncio
 async def test_download_file_local_write_permission_error(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
@@ -390,6 +590,234 @@ async def test_download_file_local_write_permission_error(valid_service: GoogleD
     # 所以 as_service_account 只會因為元數據被調用一次
     mock_google.as_service_account.assert_called_once()
 
+@pytest.mark.asyncio
+async def test_download_file_large_file_uses_parallel_ranges(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 download_file：大型檔案會拆分為多個 Range 請求並行下載，並依位移寫入同一個檔案。
+    """
+    mocker.patch("backend.services.google_drive_service.DOWNLOAD_CHUNK_SIZE", 4)
+    mocker.patch("backend.services.google_drive_service.RANGED_DOWNLOAD_THRESHOLD", 8)
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    payload = b"0123456789"
+    destination_path = str(tmp_path / "large.bin")
+
+    from aiogoogle.models import Request
+    def files_get(**kwargs):
+        req = Request(method="GET", url="https://www.googleapis.com/drive/v3/files/big")
+        req.pipe_to = kwargs.get("pipe_to")
+        return req
+    mock_drive_v3_api.files.get.side_effect = files_get
+
+    async def as_service_account(req, full_res=False):
+        if req.pipe_to is None:
+            return {"mimeType": "application/octet-stream", "name": "large.bin", "size": str(len(payload))}
+        start, end = map(int, req.headers["Range"].removeprefix("bytes=").split("-"))
+        await req.pipe_to.write(payload[start:end + 1])
+        return MagicMock(status_code=206)
+    mock_google.as_service_account.side_effect = as_service_account
+
+    success = await valid_service.download_file("big", destination_path)
+
+    assert success is True
+    with open(destination_path, "rb") as f:
+        assert f.read() == payload
+    ranges = sorted(c.args[0].headers.get("Range") for c in mock_google.as_service_account.call_args_list if c.args[0].pipe_to)
+    assert ranges == ["bytes=0-3", "bytes=4-7", "bytes=8-9"]
+
+@pytest.mark.asyncio
+async def test_download_file_ranged_retries_only_failed_range(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 download_file：單一分段中途遇到暫時性錯誤時，只重新請求該分段，並覆蓋先前寫入的不完整資料。
+    """
+    from aiogoogle.excs import HTTPError
+    from aiogoogle.models import Request
+    mocker.patch("backend.services.google_drive_service.DOWNLOAD_CHUNK_SIZE", 4)
+    mocker.patch("backend.services.google_drive_service.RANGED_DOWNLOAD_THRESHOLD", 8)
+    mocker.patch("backend.services.google_drive_service.asyncio.sleep", new_callable=AsyncMock)
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    payload = b"0123456789"
+    destination_path = str(tmp_path / "flaky.bin")
+
+    def files_get(**kwargs):
+        req = Request(method="GET", url="https://www.googleapis.com/drive/v3/files/flaky")
+        req.pipe_to = kwargs.get("pipe_to")
+        return req
+    mock_drive_v3_api.files.get.side_effect = files_get
+
+    failed_once = []
+    async def as_service_account(req, full_res=False):
+        if req.pipe_to is None:
+            return {"mimeType": "application/octet-stream", "name": "flaky.bin", "size": str(len(payload))}
+        start, end = map(int, req.headers["Range"].removeprefix("bytes=").split("-"))
+        if start == 4 and not failed_once:
+            failed_once.append(True)
+            await req.pipe_to.write(b"XX")
+            await req.pipe_to.flush()
+            raise HTTPError("Service Unavailable", res=MagicMock(status_code=503))
+        await req.pipe_to.write(payload[start:end + 1])
+        return MagicMock(status_code=206)
+    mock_google.as_service_account.side_effect = as_service_account
+
+    assert await valid_service.download_file("flaky", destination_path) is True
+    with open(destination_path, "rb") as f:
+        assert f.read() == payload
+    ranges = [c.args[0].headers.get("Range") for c in mock_google.as_service_account.call_args_list if c.args[0].pipe_to]
+    assert sorted(ranges) == ["bytes=0-3", "bytes=4-7", "bytes=4-7", "bytes=8-9"]
+
+@pytest.mark.asyncio
+async def test_download_file_skip_folder_check_issues_single_request(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, caplog):
+    """
+    測試 download_file(skip_folder_check=True)：不發出元數據查詢，直接下載媒體內容。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = MagicMock(status_code=200)
+    destination_path = str(tmp_path / "fast.txt")
+
+    with caplog.at_level(logging.INFO, logger="backend.services.google_drive_service"):
+        assert await valid_service.download_file("fast_id", destination_path, skip_folder_check=True) is True
+    mock_drive_v3_api.files.get.assert_called_once_with(fileId="fast_id", alt="media", download_file=destination_path)
+    mock_google.as_service_account.assert_called_once()
+    assert any(getattr(r, "props", {}).get("file_name") == "fast.txt" for r in caplog.records) # 以本地檔名作為日誌名稱
+
+@pytest.mark.asyncio
+async def test_download_file_skip_folder_check_not_downloadable(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, caplog):
+    """
+    測試 skip_folder_check=True 遇到資料夾：API 回報 fileNotDownloadable 時返回 False，記錄為可預期的失敗且不留下檔案。
+    """
+    from aiogoogle.excs import HTTPError
+    mock_google, _ = mock_aiogoogle_service_account
+    error_body = {"error": {"errors": [{"reason": "fileNotDownloadable"}]}}
+    mock_google.as_service_account.side_effect = HTTPError("Forbidden", res=MagicMock(status_code=403, json=error_body))
+    destination_path = tmp_path / "folder_as_file"
+    destination_path.write_bytes(b'{"error": ...}') # 模擬 aiogoogle 已寫入的錯誤主體
+
+    with caplog.at_level(logging.ERROR, logger="backend.services.google_drive_service"):
+        assert await valid_service.download_file("folder_id", str(destination_path), skip_folder_check=True) is False
+    mock_google.as_service_account.assert_called_once() # 不可恢復的 403，不重試
+    assert not destination_path.exists()
+    record = next(r for r in caplog.records if r.props.get("error") == "not_downloadable")
+    assert record.exc_info is None
+
+@pytest.mark.asyncio
+async def test_download_file_with_metadata_uses_listed_metadata(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path):
+    """
+    測試 download_file_with_metadata：使用呼叫者提供的元數據判斷資料夾，不再查詢 API。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = MagicMock(status_code=200)
+    destination_path = str(tmp_path / "listed.txt")
+
+    folder_metadata = {"id": "d1", "name": "dir", "mimeType": "application/vnd.google-apps.folder"}
+    assert await valid_service.download_file_with_metadata("d1", destination_path, folder_metadata) is False
+    mock_google.as_service_account.assert_not_called()
+
+    file_metadata = {"id": "f1", "name": "listed.txt", "mimeType": "text/plain"}
+    assert await valid_service.download_file_with_metadata("f1", destination_path, file_metadata) is True
+    mock_drive_v3_api.files.get.assert_called_once_with(fileId="f1", alt="media", download_file=destination_path)
+
+@pytest.mark.asyncio
+async def test_download_file_verify_checksum(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path):
+    """
+    測試 verify_checksum=True：校驗碼相符時保留檔案，不符時刪除檔案並返回 False。
+    """
+    mock_google, _ = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = MagicMock(status_code=200)
+    destination_path = tmp_path / "checked.bin"
+    destination_path.write_bytes(b"payload") # 模擬 aiogoogle 已將內容寫入目標檔案
+
+    good = {"name": "checked.bin", "mimeType": "application/octet-stream", "sha256Checksum": hashlib.sha256(b"payload").hexdigest()}
+    assert await valid_service.download_file_with_metadata("f1", str(destination_path), good, verify_checksum=True) is True
+    assert destination_path.exists()
+
+    bad = {"name": "checked.bin", "mimeType": "application/octet-stream", "md5Checksum": hashlib.md5(b"other").hexdigest()}
+    assert await valid_service.download_file_with_metadata("f1", str(destination_path), bad, verify_checksum=True) is False
+    assert not destination_path.exists()
+
+@pytest.mark.asyncio
+async def test_get_file_metadata_caches_until_write(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 get_file_metadata：重複查詢使用快取，delete_file 成功後快取失效。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = {"mimeType": "text/plain", "name": "a.txt"}
+
+    first = await valid_service.get_file_metadata("meta_id")
+    first["name"] = "mutated"
+    second = await valid_service.get_file_metadata("meta_id")
+    assert second == {"mimeType": "text/plain", "name": "a.txt"}
+    mock_drive_v3_api.files.get.assert_called_once_with(fileId="meta_id", fields="mimeType,name,size,modifiedTime")
+
+    await valid_service.get_file_metadata("meta_id", fields="parents")
+    assert mock_drive_v3_api.files.get.call_count == 2 # 不同欄位組合使用不同的快取項目
+
+    assert await valid_service.delete_file("meta_id") is True
+    await valid_service.get_file_metadata("meta_id")
+    assert mock_drive_v3_api.files.get.call_count == 3
+
+@pytest.mark.asyncio
+async def test_download_file_creates_destination_dir_once(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 download_file：下載多個檔案到同一資料夾時，只呼叫一次 makedirs。
+    """
+    mock_google, _ = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = MagicMock(status_code=200)
+    makedirs_spy = mocker.spy(os, "makedirs")
+    dest_dir = tmp_path / "nested" / "dir"
+
+    for i in range(3):
+        assert await valid_service.download_file(f"id_{i}", str(dest_dir / f"f{i}.txt"), skip_folder_check=True) is True
+
+    assert [c.args[0] for c in makedirs_spy.call_args_list].count(str(dest_dir)) == 1
+    assert dest_dir.is_dir()
+
+    # 並行下載到另一個新資料夾時，首批請求共用同一次建立
+    other_dir = tmp_path / "parallel"
+    results = await asyncio.gather(*(valid_service.download_file(f"p_{i}", str(other_dir / f"f{i}.txt"), skip_folder_check=True) for i in range(5)))
+    assert all(results)
+    assert [c.args[0] for c in makedirs_spy.call_args_list].count(str(other_dir)) == 1
+
+@pytest.mark.asyncio
+async def test_range_writer_batches_small_chunks_into_single_pwrite(tmp_path, mocker):
+    """
+    測試 _RangeWriter：小資料塊會先累積於緩衝區，達到門檻或 flush 時才以單次 pwrite 寫入正確位移。
+    """
+    from backend.services import google_drive_service as gds
+    mocker.patch.object(gds, "RANGE_WRITE_BUFFER_SIZE", 6)
+    spy = mocker.spy(gds, "_pwrite_all")
+    path = str(tmp_path / "out.bin")
+    fd = gds._open_preallocated(path, 12)
+    try:
+        writer = gds._RangeWriter(fd, 2)
+        for piece in (b"ab", b"cd", b"ef", b"gh"):
+            await writer.write(piece)
+        assert spy.call_count == 1 # "abcdef" 達到門檻後一次寫入
+        await writer.flush()
+        assert spy.call_count == 2
+    finally:
+        os.close(fd)
+    with open(path, "rb") as f:
+        assert f.read() == b"\0\0abcdefgh\0\0"
+
+@pytest.mark.asyncio
+async def test_download_file_ranged_failure_removes_partial_file(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 download_file：任一分段未返回 206 時應返回 False 並刪除不完整的檔案。
+    """
+    mocker.patch("backend.services.google_drive_service.DOWNLOAD_CHUNK_SIZE", 4)
+    mocker.patch("backend.services.google_drive_service.RANGED_DOWNLOAD_THRESHOLD", 8)
+    mock_google, _ = mock_aiogoogle_service_account
+    destination_path = str(tmp_path / "broken.bin")
+    mock_google.as_service_account.side_effect = [
+        {"mimeType": "application/octet-stream", "name": "broken.bin", "size": "8"},
+        MagicMock(status_code=206),
+        MagicMock(status_code=200),
+    ]
+
+    success = await valid_service.download_file("broken", destination_path)
+
+    assert success is False
+    assert not os.path.exists(destination_path)
+
 # --- upload_file 測試 ---
 
 @pytest.mark.asyncio
@@ -427,6 +855,127 @@ async def test_upload_file_success(valid_service: GoogleDriveService, mock_aiogo
     mock_google.as_service_account.assert_called_once_with(mock_drive_v3_api.files.create.return_value)
 
 
+def _resumable_upload_mock(received: bytearray, fail_first_chunk_at: int = None):
+    """建立模擬 Drive 可續傳上傳工作階段的 as_service_account 替身，記錄收到的位元組。"""
+    state = {"failed": False}
+    async def as_service_account(req, full_res=False):
+        if req.method == "POST":
+            return MagicMock(status_code=200, headers={"Location": "https://upload.example/session"})
+        content_range = req.headers["Content-Range"]
+        total = int(content_range.rsplit("/", 1)[1])
+        if not content_range.startswith("bytes */"):
+            start = int(content_range.split(" ")[1].split("-")[0])
+            if start == fail_first_chunk_at and not state["failed"]:
+                state["failed"] = True
+                raise ConnectionError("模擬連線中斷")
+            assert start == len(received)
+            received.extend(req.data)
+        if len(received) == total:
+            return MagicMock(status_code=200, json={"id": "resumable_id", "name": "big.bin"})
+        return MagicMock(status_code=308, headers={"Range": f"bytes=0-{len(received) - 1}"} if received else {})
+    return as_service_account
+
+@pytest.mark.asyncio
+async def test_upload_file_large_file_uses_resumable_upload(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 upload_file：超過門檻的檔案以可續傳上傳分塊送出，並在分塊失敗後查詢進度並續傳。
+    """
+    mocker.patch("backend.services.google_drive_service.RESUMABLE_UPLOAD_THRESHOLD", 4)
+    mocker.patch("backend.services.google_drive_service.UPLOAD_CHUNK_SIZE", 4)
+    mock_sleep = mocker.patch("backend.services.google_drive_service.asyncio.sleep", new_callable=AsyncMock)
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    local_file = tmp_path / "big.bin"
+    local_file.write_bytes(b"abcdefghij")
+    received = bytearray()
+    mock_google.as_service_account.side_effect = _resumable_upload_mock(received, fail_first_chunk_at=4)
+
+    uploaded_file_id = await valid_service.upload_file(str(local_file), folder_id="target")
+
+    assert uploaded_file_id == "resumable_id"
+    assert bytes(received) == b"abcdefghij"
+    mock_drive_v3_api.files.create.assert_not_called()
+    mock_sleep.assert_awaited_once()
+    init_request = mock_google.as_service_account.call_args_list[0].args[0]
+    assert "uploadType=resumable" in init_request.url
+    assert init_request.json == {"name": "big.bin", "parents": ["target"]}
+
+@pytest.mark.asyncio
+async def test_upload_file_resumable_non_retryable_error(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 upload_file：可續傳上傳遇到 4xx (非 429) 錯誤時不重試，直接返回 None。
+    """
+    from aiogoogle.excs import HTTPError
+    mocker.patch("backend.services.google_drive_service.RESUMABLE_UPLOAD_THRESHOLD", 4)
+    mock_sleep = mocker.patch("backend.services.google_drive_service.asyncio.sleep", new_callable=AsyncMock)
+    mock_google, _ = mock_aiogoogle_service_account
+    local_file = tmp_path / "big.bin"
+    local_file.write_bytes(b"abcdefghij")
+    mock_google.as_service_account.side_effect = [
+        MagicMock(status_code=200, headers={"Location": "https://upload.example/session"}),
+        HTTPError("Bad Request", res=MagicMock(status_code=400)),
+    ]
+
+    assert await valid_service.upload_file(str(local_file)) is None
+    mock_sleep.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_upload_file_resumable_restarts_expired_session(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 upload_file：可續傳上傳的工作階段過期 (404) 時，建立新的工作階段並從頭重新上傳。
+    """
+    from aiogoogle.excs import HTTPError
+    mocker.patch("backend.services.google_drive_service.RESUMABLE_UPLOAD_THRESHOLD", 4)
+    mocker.patch("backend.services.google_drive_service.UPLOAD_CHUNK_SIZE", 4)
+    mock_google, _ = mock_aiogoogle_service_account
+    local_file = tmp_path / "big.bin"
+    local_file.write_bytes(b"abcdefghij")
+    received = bytearray()
+    fresh_session = _resumable_upload_mock(received)
+    calls = {"expired": 0}
+    async def as_service_account(req, full_res=False):
+        if req.url == "https://upload.example/old_session":
+            calls["expired"] += 1
+            raise HTTPError("Not Found", res=MagicMock(status_code=404))
+        return await fresh_session(req, full_res=full_res)
+    first_init = MagicMock(status_code=200, headers={"Location": "https://upload.example/old_session"})
+    inits = []
+    async def dispatch(req, full_res=False):
+        if req.method == "POST":
+            inits.append(req)
+            if len(inits) == 1:
+                return first_init
+        return await as_service_account(req, full_res=full_res)
+    mock_google.as_service_account.side_effect = dispatch
+
+    assert await valid_service.upload_file(str(local_file)) == "resumable_id"
+    assert bytes(received) == b"abcdefghij"
+    assert len(inits) == 2
+    assert calls["expired"] == 1
+
+@pytest.mark.asyncio
+async def test_upload_many_bounds_concurrency_and_isolates_failures(valid_service: GoogleDriveService, tmp_path, mocker):
+    """
+    測試 upload_many：同時進行的上傳數不超過 concurrency，單一檔案失敗只影響自己的結果。
+    """
+    paths = []
+    for i in range(5):
+        local_file = tmp_path / f"f{i}.txt"
+        local_file.write_text(str(i))
+        paths.append(str(local_file))
+    state = {"active": 0, "peak": 0}
+    async def fake_upload(local_file_path, folder_id=None, file_name=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return None if local_file_path.endswith("f3.txt") else f"id_{os.path.basename(local_file_path)}"
+    mocker.patch.object(valid_service, "upload_file", side_effect=fake_upload)
+
+    results = await valid_service.upload_many(paths, folder_id="target", concurrency=2)
+
+    assert results == ["id_f0.txt", "id_f1.txt", "id_f2.txt", None, "id_f4.txt"]
+    assert state["peak"] == 2
+
 @pytest.mark.asyncio
 async def test_upload_file_local_file_not_exists(valid_service: GoogleDriveService):
     """
@@ -510,16 +1059,18 @@ async def test_create_folder_api_call_exception(valid_service: GoogleDriveServic
     mock_google.as_service_account.assert_called_once()
 
 @pytest.mark.asyncio
-async def test_create_folder_api_returns_no_id(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+async def test_create_folder_api_returns_no_id(valid_service: GoogleDriveService, mock_aiogoogle_service_account, caplog):
     """
-    測試 create_folder 方法：當 API 呼叫成功但未返回資料夾 ID 時，應返回 None。
+    測試 create_folder 方法：當 API 呼叫成功但未返回資料夾 ID 時，應返回 None，且錯誤日誌仍包含回應內容。
     """
     mock_google, _ = mock_aiogoogle_service_account
     mock_google.as_service_account.return_value = {"name": "無ID資料夾"} #缺少 id
 
-    created_folder_id = await valid_service.create_folder("無ID資料夾", "parent_id")
+    with caplog.at_level(logging.ERROR, logger="backend.services.google_drive_service"):
+        created_folder_id = await valid_service.create_folder("無ID資料夾", "parent_id")
     assert created_folder_id is None
     mock_google.as_service_account.assert_called_once()
+    assert "{'name': '無ID資料夾'}" in caplog.text # 回應於格式化輸出時才字串化
 
 
 # --- move_file 測試 ---
@@ -544,7 +1095,7 @@ async def test_move_file_success(valid_service: GoogleDriveService, mock_aiogoog
     assert called_kwargs['fileId'] == file_id_to_move
     assert called_kwargs['addParents'] == new_parent_id
     assert called_kwargs['removeParents'] == old_parent_id
-    assert called_kwargs['fields'] == 'id, parents'
+    assert called_kwargs['fields'] == 'id'
     mock_google.as_service_account.assert_called_once_with(mock_drive_v3_api.files.update.return_value)
 
 @pytest.mark.asyncio
@@ -560,19 +1111,18 @@ async def test_move_file_api_call_exception(valid_service: GoogleDriveService, m
     mock_google.as_service_account.assert_called_once()
 
 @pytest.mark.asyncio
-async def test_move_file_parents_not_updated(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+async def test_move_file_success_without_parents_in_response(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
     """
-    測試 move_file 方法：API 呼叫成功但父資料夾列表未按預期更新。
+    測試 move_file 方法：只要求回應包含 id，成功與否由 HTTP 狀態判斷，不再比對回應中的 parents 列表。
     """
     mock_google, _ = mock_aiogoogle_service_account
-    file_id_to_move = "file_to_move_id_no_update"
-    new_parent_id = "new_parent_folder_id_no_update"
+    file_id_to_move = "file_to_move_id_no_parents"
+    new_parent_id = "new_parent_folder_id_no_parents"
 
-    # 模擬 API 回應中 'parents' 列表不包含 new_parent_id
-    mock_google.as_service_account.return_value = {"id": file_id_to_move, "parents": ["some_other_parent_id"]}
+    mock_google.as_service_account.return_value = {"id": file_id_to_move}
 
     success = await valid_service.move_file(file_id_to_move, new_parent_id)
-    assert success is False
+    assert success is True
     mock_google.as_service_account.assert_called_once()
 
 
@@ -606,3 +1156,361 @@ async def test_delete_file_api_call_exception(valid_service: GoogleDriveService,
     success = await valid_service.delete_file("file_id_to_delete_exception")
     assert success is False
     mock_google.as_service_account.assert_called_once()
+
+# --- 共用連線池測試 ---
+
+@pytest.mark.asyncio
+async def test_session_factory_reuses_client_session_until_close(valid_service: GoogleDriveService):
+    """
+    測試共用工作階段：aiogoogle 每次建立的工作階段都包裝同一個 ClientSession，
+    aiogoogle 關閉工作階段不會關閉連線池，只有 close() 會。
+    """
+    first = valid_service._session_factory()
+    async with first:
+        pass
+    await first.close()
+    second = valid_service._session_factory()
+    assert second._session is first._session
+    assert not first._session.closed
+    connector = first._session.connector
+    assert connector.limit == 100 and connector.limit_per_host == 30
+
+    await valid_service.close()
+    assert first._session.closed
+    assert valid_service._session_factory()._session is not first._session
+    await valid_service.close()
+
+@pytest.mark.asyncio
+async def test_discovery_document_fetched_once(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 Drive API 探索文件快取：多次 (含並行) 操作只呼叫一次 discover。
+    """
+    mock_google, _ = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = None
+
+    results = await asyncio.gather(*(valid_service.delete_file(f"id_{i}") for i in range(5)))
+    assert all(results)
+    assert await valid_service.delete_file("id_last") is True
+    mock_google.discover.assert_awaited_once_with('drive', 'v3')
+
+@pytest.mark.asyncio
+async def test_discovery_document_disk_cache(mock_aiogoogle_service_account, tmp_path):
+    """
+    測試 discovery_cache_path：第一個實例下載探索文件並連同 ETag 寫入磁碟，新實例直接讀取快取；
+    快取過期時以 If-None-Match 重新驗證，304 時沿用快取並更新其時間。
+    """
+    from aiogoogle.models import Request, Response
+    mock_google, _ = mock_aiogoogle_service_account
+    requests_sent = []
+    def get_rest(**kwargs):
+        requests_sent.append(Request(method="GET", url="https://www.googleapis.com/discovery/v1/apis/drive/v3/rest"))
+        return requests_sent[-1]
+    mock_google.discovery_service = MagicMock() # 實例屬性，不在 Aiogoogle 類別的 spec 中
+    mock_google.discovery_service.apis.getRest.side_effect = get_rest
+    mock_google.as_anon = AsyncMock(return_value=Response(status_code=200, headers={"ETag": '"v1"'}, json={"name": "drive", "version": "v3", "resources": {}}))
+    cache_path = tmp_path / "cache" / "drive_v3.json"
+
+    first = GoogleDriveService(service_account_info=VALID_SERVICE_ACCOUNT_INFO, discovery_cache_path=str(cache_path))
+    assert (await first._drive(mock_google)).discovery_document["name"] == "drive"
+    assert json.loads(cache_path.read_text())["etag"] == '"v1"'
+
+    second = GoogleDriveService(service_account_info=VALID_SERVICE_ACCOUNT_INFO, discovery_cache_path=str(cache_path))
+    assert (await second._drive(mock_google)).discovery_document["version"] == "v3"
+    assert mock_google.as_anon.await_count == 1 # 未過期的快取不發出請求
+
+    os.utime(cache_path, (0, 0)) # 讓快取過期
+    mock_google.as_anon.return_value = Response(status_code=304)
+    third = GoogleDriveService(service_account_info=VALID_SERVICE_ACCOUNT_INFO, discovery_cache_path=str(cache_path))
+    assert (await third._drive(mock_google)).discovery_document["name"] == "drive"
+    assert requests_sent[-1].headers["If-None-Match"] == '"v1"'
+    assert os.stat(cache_path).st_mtime > 0
+    mock_google.discover.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_shared_session_parses_json_with_orjson(valid_service: GoogleDriveService):
+    """
+    測試共用 ClientSession 的回應類別：回應為 _OrjsonClientResponse，`response.json()` 正確解析 UTF-8 內容。
+    """
+    from aiohttp import web
+    from backend.services.google_drive_service import _OrjsonClientResponse
+    async def handler(request):
+        return web.json_response({"files": [{"id": "a", "name": "報告"}]})
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        session = valid_service._session_factory()
+        async with session._session.get(f"http://127.0.0.1:{port}/") as response:
+            assert isinstance(response, _OrjsonClientResponse)
+            assert await response.json() == {"files": [{"id": "a", "name": "報告"}]}
+    finally:
+        await valid_service.close()
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_service_async_context_manager_closes_pool(valid_service: GoogleDriveService):
+    """
+    測試 `async with` 用法：區塊內共用同一個連線池，離開區塊時自動關閉。
+    """
+    async with valid_service as drive:
+        assert drive is valid_service
+        session = drive._session_factory()._session
+        assert drive._session_factory()._session is session
+    assert session.closed
+    await valid_service.close()
+
+# --- 並行上限與重試測試 ---
+
+@pytest.mark.asyncio
+async def test_send_retries_transient_errors_with_backoff(valid_service: GoogleDriveService, mock_aiogoogle_service_account, mocker):
+    """
+    測試 Drive API 請求：遇到 503 時以退避重試，成功後返回結果；一般異常則不重試。
+    """
+    from aiogoogle.excs import HTTPError
+    from aiogoogle.models import Request
+    mock_sleep = mocker.patch("backend.services.google_drive_service.asyncio.sleep", new_callable=AsyncMock)
+    mock_google, _ = mock_aiogoogle_service_account
+    mock_google.as_service_account.side_effect = [
+        HTTPError("Service Unavailable", res=MagicMock(status_code=503)),
+        HTTPError("Too Many Requests", res=MagicMock(status_code=429)),
+        {"id": "file_id", "name": "retry_file"},
+    ]
+
+    request = Request(method="GET", url="https://www.googleapis.com/drive/v3/files/file_id")
+    assert await valid_service._send(mock_google, request) == {"id": "file_id", "name": "retry_file"}
+    assert mock_google.as_service_account.call_count == 3
+    assert mock_sleep.await_count == 2
+
+    # 501 表示請求本身不受支援，不屬於暫時性錯誤
+    mock_sleep.reset_mock()
+    mock_google.as_service_account.side_effect = [HTTPError("Not Implemented", res=MagicMock(status_code=501))]
+    with pytest.raises(HTTPError):
+        await valid_service._send(mock_google, request)
+    mock_sleep.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_create_requests_are_not_retried(valid_service: GoogleDriveService, mock_aiogoogle_service_account, tmp_path, mocker):
+    """
+    測試 upload_file (簡單上傳) 與 create_folder：files.create 不具冪等性，遇到可重試的錯誤時也不重送，
+    以免 Drive 已建立項目後再建立一份重複的檔案或資料夾。
+    """
+    from aiogoogle.excs import HTTPError
+    mock_sleep = mocker.patch("backend.services.google_drive_service.asyncio.sleep", new_callable=AsyncMock)
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    local_file = tmp_path / "report.txt"
+    local_file.write_text("報告內容")
+
+    mock_google.as_service_account.side_effect = [HTTPError("Service Unavailable", res=MagicMock(status_code=503)), {"id": "dup_id"}]
+    assert await valid_service.upload_file(str(local_file), folder_id="processed") is None
+    mock_drive_v3_api.files.create.assert_called_once()
+    assert mock_google.as_service_account.call_count == 1
+
+    mock_drive_v3_api.files.create.reset_mock()
+    mock_google.as_service_account.reset_mock()
+    mock_google.as_service_account.side_effect = [asyncio.TimeoutError(), {"id": "dup_folder_id"}]
+    assert await valid_service.create_folder("archive", parent_folder_id="processed") is None
+    mock_drive_v3_api.files.create.assert_called_once()
+    assert mock_google.as_service_account.call_count == 1
+    mock_sleep.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_send_retries_rate_limit_403_and_honours_retry_after(valid_service: GoogleDriveService, mock_aiogoogle_service_account, mocker):
+    """
+    測試 Drive API 請求：以 403 回報的速率限制會重試並遵守 Retry-After；權限不足的 403 則立即失敗。
+    """
+    from aiogoogle.excs import HTTPError
+    from aiogoogle.models import Response
+    mock_sleep = mocker.patch("backend.services.google_drive_service.asyncio.sleep", new_callable=AsyncMock)
+    mock_google, _ = mock_aiogoogle_service_account
+    rate_limited = Response(status_code=403, headers={"Retry-After": "7"}, json={"error": {"errors": [{"reason": "userRateLimitExceeded"}]}})
+    forbidden = Response(status_code=403, json={"error": {"errors": [{"reason": "insufficientFilePermissions"}]}})
+
+    mock_google.as_service_account.side_effect = [HTTPError("Rate Limit", res=rate_limited), None]
+    assert await valid_service.delete_file("rate_limited_id") is True
+    mock_sleep.assert_awaited_once()
+    assert mock_sleep.await_args.args[0] >= 7
+
+    mock_sleep.reset_mock()
+    mock_google.as_service_account.side_effect = [HTTPError("Forbidden", res=forbidden)]
+    assert await valid_service.delete_file("forbidden_id") is False
+    mock_sleep.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_send_applies_idle_timeout_to_requests_without_one(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 _send：未指定逾時的請求會套用連線/讀取閒置逾時 (不限制總時長)，已指定的逾時保持不變。
+    """
+    from aiogoogle.models import Request
+    from backend.services.google_drive_service import REQUEST_TIMEOUT
+    mock_google, _ = mock_aiogoogle_service_account
+    mock_google.as_service_account.return_value = {}
+
+    request = Request(method="GET", url="https://www.googleapis.com/drive/v3/files/x")
+    await valid_service._send(mock_google, request)
+    assert request.timeout is REQUEST_TIMEOUT
+    assert REQUEST_TIMEOUT.total is None and REQUEST_TIMEOUT.sock_connect and REQUEST_TIMEOUT.sock_read
+
+    explicit = Request(method="GET", url="https://www.googleapis.com/drive/v3/files/y", timeout=5)
+    await valid_service._send(mock_google, explicit)
+    assert explicit.timeout == 5
+
+@pytest.mark.asyncio
+async def test_send_respects_max_concurrent_requests(mock_aiogoogle_service_account):
+    """
+    測試並行上限：同時進行中的 API 請求數不超過 max_concurrent_requests。
+    """
+    mock_google, _ = mock_aiogoogle_service_account
+    service = GoogleDriveService(service_account_info=VALID_SERVICE_ACCOUNT_INFO, max_concurrent_requests=2)
+    in_flight = {"current": 0, "peak": 0}
+    async def slow_call(request, **kwargs):
+        in_flight["current"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+        await asyncio.sleep(0.01)
+        in_flight["current"] -= 1
+        return None
+    mock_google.as_service_account.side_effect = slow_call
+
+    results = await asyncio.gather(*(service.delete_file(f"id_{i}") for i in range(6)))
+
+    assert all(results)
+    assert in_flight["peak"] == 2
+
+# --- batch_execute / batch_delete / move_files 測試 ---
+
+def _make_batch_response(boundary: str, parts: list) -> MagicMock:
+    """建立模擬的批次端點回應。parts 為 (content_id_index, status_line, body_str) 的列表。"""
+    lines = []
+    for index, status_line, body in parts:
+        lines += [f"--{boundary}", "Content-Type: application/http", f"Content-ID: <response-item{index}>", "",
+                  status_line, "Content-Type: application/json; charset=UTF-8", "", body]
+    lines.append(f"--{boundary}--")
+    response = MagicMock()
+    response.headers = {"Content-Type": f"multipart/mixed; boundary={boundary}"}
+    response.content = "\r\n".join(lines)
+    return response
+
+def _fake_drive_request(method: str):
+    from aiogoogle.models import Request
+    def _builder(fileId, **kwargs):
+        return Request(method=method, url=f"https://www.googleapis.com/drive/v3/files/{fileId}")
+    return _builder
+
+@pytest.mark.asyncio
+async def test_batch_delete_returns_per_item_results(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 batch_delete：單次批次請求送出所有刪除操作，並依 Content-ID 對應各項結果 (即使回應順序不同)。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_drive_v3_api.files.delete.side_effect = _fake_drive_request("DELETE")
+    mock_google.as_service_account.return_value = _make_batch_response("resp_b", [
+        (1, "HTTP/1.1 404 Not Found", '{"error": {"code": 404}}'),
+        (0, "HTTP/1.1 204 No Content", ""),
+    ])
+
+    results = await valid_service.batch_delete(["id_a", "id_b"])
+
+    assert results == [True, False]
+    mock_google.as_service_account.assert_called_once()
+    batch_request = mock_google.as_service_account.call_args.args[0]
+    assert batch_request.url == "https://www.googleapis.com/batch/drive/v3"
+    assert "DELETE /drive/v3/files/id_a HTTP/1.1" in batch_request.data
+    assert "Content-ID: <item1>" in batch_request.data
+
+@pytest.mark.asyncio
+async def test_get_files_metadata_batches_cache_misses(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 get_files_metadata：只為快取中沒有的項目送出一次批次請求，結果寫入快取，且唯讀批次不會使列表快取失效。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_drive_v3_api.files.get.side_effect = _fake_drive_request("GET")
+    mock_google.as_service_account.side_effect = [
+        {"mimeType": "text/plain", "name": "cached.txt"},
+        _make_batch_response("resp_m", [
+            (0, "HTTP/1.1 200 OK", '{"mimeType": "text/plain", "name": "b.txt"}'),
+            (1, "HTTP/1.1 404 Not Found", '{"error": {"code": 404}}'),
+        ]),
+    ]
+    await valid_service.get_file_metadata("id_a")
+    valid_service._listing_cache[("root", 1000, "f")] = (float("inf"), [])
+
+    results = await valid_service.get_files_metadata(["id_a", "id_b", "id_missing"])
+
+    assert results == [{"mimeType": "text/plain", "name": "cached.txt"}, {"mimeType": "text/plain", "name": "b.txt"}, None]
+    assert mock_google.as_service_account.call_count == 2
+    batch_request = mock_google.as_service_account.call_args.args[0]
+    assert "GET /drive/v3/files/id_b HTTP/1.1" in batch_request.data
+    assert "id_a" not in batch_request.data
+    assert await valid_service.get_file_metadata("id_b") == {"mimeType": "text/plain", "name": "b.txt"}
+    assert mock_google.as_service_account.call_count == 2
+    assert valid_service._listing_cache # 唯讀批次不影響列表快取
+
+@pytest.mark.asyncio
+async def test_coalesce_writes_merges_concurrent_deletes_and_moves(mock_aiogoogle_service_account):
+    """
+    測試 coalesce_writes：並行的 delete_file / move_file 呼叫會被合併為單一批次請求，各呼叫仍取得自己的結果。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_drive_v3_api.files.delete.side_effect = _fake_drive_request("DELETE")
+    mock_drive_v3_api.files.update.side_effect = _fake_drive_request("PATCH")
+    mock_google.as_service_account.return_value = _make_batch_response("resp_c", [
+        (0, "HTTP/1.1 204 No Content", ""),
+        (1, "HTTP/1.1 404 Not Found", '{"error": {"code": 404}}'),
+        (2, "HTTP/1.1 200 OK", '{"id": "id_c"}'),
+    ])
+    service = GoogleDriveService(service_account_info=VALID_SERVICE_ACCOUNT_INFO, coalesce_writes=True)
+
+    results = await asyncio.gather(
+        service.delete_file("id_a"),
+        service.delete_file("id_b"),
+        service.move_file("id_c", "new_parent"),
+    )
+
+    assert results == [True, False, True]
+    mock_google.as_service_account.assert_called_once()
+    assert mock_google.as_service_account.call_args.args[0].url == "https://www.googleapis.com/batch/drive/v3"
+    await service.close()
+    assert service._batch_task is None
+
+@pytest.mark.asyncio
+async def test_batch_execute_splits_into_chunks_of_100(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 batch_execute：超過 100 個子請求時，會拆分為多個批次送出。
+    """
+    mock_google, _ = mock_aiogoogle_service_account
+    build = _fake_drive_request("DELETE")
+    requests = [build(f"id_{i}") for i in range(150)]
+    mock_google.as_service_account.side_effect = [
+        _make_batch_response("r1", [(i, "HTTP/1.1 204 No Content", "") for i in range(100)]),
+        _make_batch_response("r2", [(i, "HTTP/1.1 204 No Content", "") for i in range(50)]),
+    ]
+
+    results = await valid_service.batch_execute(requests)
+
+    assert len(results) == 150
+    assert all(r["status_code"] == 204 for r in results)
+    assert mock_google.as_service_account.call_count == 2
+
+@pytest.mark.asyncio
+async def test_move_files_uses_batch_status(valid_service: GoogleDriveService, mock_aiogoogle_service_account):
+    """
+    測試 move_files：以單一批次送出所有移動，依子請求的 HTTP 狀態判斷成功；批次整體失敗時全部返回 False。
+    """
+    mock_google, mock_drive_v3_api = mock_aiogoogle_service_account
+    mock_drive_v3_api.files.update.side_effect = _fake_drive_request("PATCH")
+    mock_google.as_service_account.return_value = _make_batch_response("resp_m", [
+        (0, "HTTP/1.1 200 OK", '{"id": "f1"}'),
+        (1, "HTTP/1.1 404 Not Found", '{"error": {"code": 404}}'),
+    ])
+
+    results = await valid_service.move_files([("f1", "new", "old"), ("f2", "new", None)])
+    assert results == [True, False]
+    first_call_kwargs = mock_drive_v3_api.files.update.call_args_list[0].kwargs
+    assert first_call_kwargs["removeParents"] == "old"
+    assert first_call_kwargs["fields"] == "id"
+
+    mock_google.as_service_account.side_effect = Exception("模擬批次錯誤")
+    assert await valid_service.move_files([("f1", "new", None)]) == [False]
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
+import mmap
 import pytest
 from unittest.mock import mock_open # mocker comes from pytest-mock
-from backend.services.parsing_service import ParsingService
+from backend.services.parsing_service import ParsingService, MMAP_MIN_SIZE
 
 @pytest.fixture
 def parsing_service() -> ParsingService:
@@ -26,7 +27,7 @@ def test_extract_text_from_txt_file(parsing_service: ParsingService, mocker):
     """
     mock_content = "這是純文字檔案的內容。\n包含多行。"
     # 使用 mocker.patch 來模擬 builtins.open
-    mocker.patch('builtins.open', mocker.mock_open(read_data=mock_content))
+    mocker.patch('builtins.open', mocker.mock_open(read_data=mock_content.encode('utf-8'))) # 服務以二進位模式讀取
 
     extracted_text = parsing_service.extract_text_from_file("dummy/path/to/file.txt")
 
@@ -37,7 +38,7 @@ def test_extract_text_from_md_file(parsing_service: ParsingService, mocker):
     測試從 .md 檔案中提取文字。
     """
     mock_content = "# Markdown 標題\n\n這是一些 markdown *內容*。"
-    mocker.patch('builtins.open', mocker.mock_open(read_data=mock_content))
+    mocker.patch('builtins.open', mocker.mock_open(read_data=mock_content.encode('utf-8'))) # 服務以二進位模式讀取
 
     extracted_text = parsing_service.extract_text_from_file("any/file.md")
 
@@ -110,6 +111,45 @@ def test_extract_text_from_md_with_special_chars(parsing_service: ParsingService
     extracted_text = parsing_service.extract_text_from_file(str(file_path))
     assert extracted_text == mock_content, "提取的包含特殊字符的 .md 內容與預期不符。"
 
+def test_extract_text_normalizes_newlines(parsing_service: ParsingService, tmp_path):
+    """
+    測試以二進位讀取後，CRLF 與 CR 換行仍與文字模式一樣轉換為 LF。
+    """
+    file_path = tmp_path / "windows_newlines.txt"
+    file_path.write_bytes("第一行\r\n第二行\r第三行\n".encode('utf-8'))
+
+    assert parsing_service.extract_text_from_file(str(file_path)) == "第一行\n第二行\n第三行\n"
+
+def test_extract_text_large_file_uses_mmap(parsing_service: ParsingService, tmp_path, mocker):
+    """
+    測試達到 MMAP_MIN_SIZE 的純文字檔案改以 mmap 解碼，內容 (含換行正規化) 與一般讀取相同。
+    """
+    file_path = tmp_path / "large.txt"
+    line = "大型報告內容 large report line\r\n"
+    file_path.write_bytes((line * (MMAP_MIN_SIZE // len(line.encode('utf-8')) + 1)).encode('utf-8'))
+    mmap_spy = mocker.patch("backend.services.parsing_service.mmap.mmap", wraps=mmap.mmap)
+
+    content = parsing_service.extract_text_from_file(str(file_path))
+
+    mmap_spy.assert_called_once()
+    assert "\r" not in content
+    assert content.startswith("大型報告內容 large report line\n大型報告內容")
+
+def test_extract_text_large_file_when_stat_fails(parsing_service: ParsingService, tmp_path, mocker):
+    """
+    測試事先取得檔案大小失敗 (os.stat 引發 OSError) 時，純文字檔案仍能解析，且大型檔案依實際大小改以 mmap 解碼。
+    """
+    file_path = tmp_path / "large_no_stat.txt"
+    line = "大型報告內容\n"
+    file_path.write_bytes((line * (MMAP_MIN_SIZE // len(line.encode('utf-8')) + 1)).encode('utf-8'))
+    mocker.patch("backend.services.parsing_service.os.stat", side_effect=OSError("permission denied"))
+    mmap_spy = mocker.patch("backend.services.parsing_service.mmap.mmap", wraps=mmap.mmap)
+
+    content = parsing_service.extract_text_from_file(str(file_path))
+
+    mmap_spy.assert_called_once()
+    assert content.startswith("大型報告內容\n大型報告內容")
+
 def test_extract_text_with_unicode_decode_error(parsing_service: ParsingService, tmp_path, mocker):
     """
     測試當 .txt 檔案內容無法以 UTF-8 解碼時，服務是否返回預期的錯誤訊息。
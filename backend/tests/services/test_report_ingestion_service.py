@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
+import os
 import pytest
 import json
+import orjson
+import hashlib
+import asyncio
 from unittest.mock import MagicMock, AsyncMock, patch
+from typing import Optional
 
 from backend.services.report_ingestion_service import ReportIngestionService
 # 為類型提示導入依賴服務的類別，但我們將在測試中 mock 它們的實例
@@ -23,7 +28,9 @@ def mock_drive_service_optional() -> MagicMock:
 @pytest.fixture
 def mock_dal() -> AsyncMock:
     """提供一個 DataAccessLayer 的模擬實例。"""
-    return AsyncMock(spec=DataAccessLayer)
+    mock = AsyncMock(spec=DataAccessLayer)
+    mock.get_analyses_by_content_hash.return_value = {} # 預設沒有內容相同且已分析完成的報告
+    return mock
 
 @pytest.fixture
 def mock_parsing_service() -> MagicMock:
@@ -94,7 +101,7 @@ async def test_analyze_and_store_report_success(
     await report_ingestion_service._analyze_and_store_report(report_db_id, test_content, test_file_name)
 
     mock_gemini_service.analyze_report.assert_called_once_with(test_content)
-    expected_analysis_json = json.dumps(mock_analysis_result, ensure_ascii=False)
+    expected_analysis_json = orjson.dumps(mock_analysis_result).decode('utf-8')
     mock_dal.update_report_analysis.assert_called_once_with(report_db_id, expected_analysis_json, "分析完成")
 
 @pytest.mark.asyncio
@@ -138,7 +145,7 @@ async def test_analyze_and_store_report_gemini_returns_error(
     await report_ingestion_service._analyze_and_store_report(report_db_id, test_content, test_file_name)
 
     mock_gemini_service.analyze_report.assert_called_once_with(test_content)
-    expected_error_json = json.dumps({"錯誤": "Gemini分析時發生特定錯誤", "原始分析結果": gemini_error_response}, ensure_ascii=False)
+    expected_error_json = orjson.dumps({"錯誤": "Gemini分析時發生特定錯誤", "原始分析結果": gemini_error_response}).decode('utf-8')
     mock_dal.update_report_analysis.assert_called_once_with(report_db_id, expected_error_json, "分析失敗")
 
 @pytest.mark.asyncio
@@ -161,7 +168,7 @@ async def test_analyze_and_store_report_gemini_returns_none(
     mock_gemini_service.analyze_report.assert_called_once_with(test_content)
     # 根據 _analyze_and_store_report 的邏輯, 如果 analysis_result 為 None，error_message 會是 "未知分析錯誤或服務未配置"
     expected_error_message = "未知分析錯誤或服務未配置"
-    expected_error_json = json.dumps({"錯誤": expected_error_message, "原始分析結果": None}, ensure_ascii=False)
+    expected_error_json = orjson.dumps({"錯誤": expected_error_message, "原始分析結果": None}).decode('utf-8')
     mock_dal.update_report_analysis.assert_called_once_with(report_db_id, expected_error_json, "分析失敗")
 
 @pytest.mark.asyncio
@@ -183,7 +190,7 @@ async def test_analyze_and_store_report_gemini_raises_exception(
     await report_ingestion_service._analyze_and_store_report(report_db_id, test_content, test_file_name)
 
     mock_gemini_service.analyze_report.assert_called_once_with(test_content)
-    expected_error_json = json.dumps({"錯誤": f"分析過程中發生意外: {simulated_exception}"}, ensure_ascii=False)
+    expected_error_json = orjson.dumps({"錯誤": f"分析過程中發生意外: {simulated_exception}"}).decode('utf-8')
     mock_dal.update_report_analysis.assert_called_once_with(report_db_id, expected_error_json, "分析失敗(系統異常)")
 
 @pytest.mark.asyncio
@@ -215,7 +222,7 @@ async def test_analyze_and_store_report_dal_update_raises_exception(
     await report_ingestion_service._analyze_and_store_report(report_db_id, test_content, test_file_name)
 
     mock_gemini_service.analyze_report.assert_called_once_with(test_content)
-    expected_analysis_json = json.dumps(mock_analysis_result, ensure_ascii=False)
+    expected_analysis_json = orjson.dumps(mock_analysis_result).decode('utf-8')
     # 第一次嘗試更新（成功的分析結果）
     mock_dal.update_report_analysis.assert_any_call(report_db_id, expected_analysis_json, "分析完成")
 
@@ -355,12 +362,15 @@ async def test_ingest_single_drive_file_full_success(
     mock_dal: AsyncMock,
     mock_parsing_service: MagicMock,
     mock_gemini_service: AsyncMock,
-    tmp_path # 用於模擬下載路徑
+    tmp_path, # 用於模擬下載路徑
+    monkeypatch
 ):
     """
     測試 ingest_single_drive_file 的完整成功路徑。
     包括下載、解析、存儲、分析、歸檔上傳、從 Drive 原始位置刪除。
+    插入後的分析結果、最終狀態與歸檔 metadata 以單次 finalize_report 寫入。
     """
+    monkeypatch.setattr("backend.services.report_ingestion_service.TEMP_DOWNLOAD_DIR", str(tmp_path))
     file_id = "drive_file_id_001"
     file_name = "年度報告.pdf"
     original_folder = "inbox_folder"
@@ -372,16 +382,12 @@ async def test_ingest_single_drive_file_full_success(
     mock_parsing_service.extract_text_from_file.return_value = "這是報告的文本內容。"
     mock_dal.insert_report_data.return_value = 1 # 返回模擬的報告資料庫 ID
     mock_gemini_service.analyze_report.return_value = {"summary": "AI 分析摘要"}
-    mock_dal.update_report_analysis.return_value = True
+    mock_dal.finalize_report.return_value = True
     mock_drive_service_optional.upload_file.return_value = "archived_drive_file_id_001" # 歸檔後的 Drive ID
     mock_drive_service_optional.delete_file.return_value = True # 從原始位置刪除成功
-    mock_dal.get_report_by_id.return_value = {"status": "內容已解析"} # 讓狀態更新邏輯通過
-
-    # 使用 patch 來模擬 os.path.exists 和 os.remove，以驗證暫存檔案清理
-    with patch('backend.services.report_ingestion_service.os.path.exists') as mock_exists, \
-         patch('backend.services.report_ingestion_service.os.remove') as mock_remove:
 
-        mock_exists.return_value = True # 模擬暫存檔案存在以進行清理
+    # 使用 patch 來模擬 os.remove，以驗證暫存檔案清理
+    with patch('backend.services.report_ingestion_service.os.remove') as mock_remove:
 
         result = await report_ingestion_service.ingest_single_drive_file(
             file_id, file_name, original_folder, processed_folder
@@ -394,17 +400,23 @@ async def test_ingest_single_drive_file_full_success(
         mock_parsing_service.extract_text_from_file.assert_called_once_with(str(temp_file_path))
         mock_dal.insert_report_data.assert_called_once()
         mock_gemini_service.analyze_report.assert_called_once_with("這是報告的文本內容。")
-        mock_dal.update_report_analysis.assert_called_once()
         mock_drive_service_optional.upload_file.assert_called_once_with(
             local_file_path=str(temp_file_path),
             folder_id=processed_folder,
             file_name=file_name
         )
         mock_drive_service_optional.delete_file.assert_called_once_with(file_id) # 驗證原始檔案被刪除
-        mock_dal.update_report_metadata.assert_called_once() # 驗證元數據更新
+        # 插入之後只有一次寫入：分析結果、最終狀態與歸檔 metadata 一併提交
+        mock_dal.finalize_report.assert_called_once_with(
+            1, "分析完成", orjson.dumps({"summary": "AI 分析摘要"}).decode('utf-8'),
+            {"drive_file_id": file_id, "archived_drive_file_id": "archived_drive_file_id_001", "archive_status": "deleted_from_inbox"}
+        )
+        mock_dal.update_report_analysis.assert_not_called()
+        mock_dal.update_report_status.assert_not_called()
+        mock_dal.update_report_metadata.assert_not_called()
+        mock_dal.get_report_by_id.assert_not_called()
 
         # 驗證暫存檔案清理
-        mock_exists.assert_called_with(str(temp_file_path)) # 檢查 finally 中的 exists
         mock_remove.assert_called_once_with(str(temp_file_path)) # 驗證 remove 被調用
 
 
@@ -454,11 +466,13 @@ async def test_ingest_single_drive_file_parsing_fails(
     mock_drive_service_optional: AsyncMock,
     mock_parsing_service: MagicMock,
     mock_dal: AsyncMock,
-    tmp_path
+    tmp_path,
+    monkeypatch
 ):
     """
     測試 ingest_single_drive_file：當檔案解析失敗 (ParsingService 返回錯誤標記)。
     """
+    monkeypatch.setattr("backend.services.report_ingestion_service.TEMP_DOWNLOAD_DIR", str(tmp_path))
     file_id = "parse_fail_id"
     file_name = "report_parse_fail.xyz"
     temp_file_path = tmp_path / f"drive_{file_id}_{file_name}"
@@ -470,7 +484,6 @@ async def test_ingest_single_drive_file_parsing_fails(
     # 模擬 AI 分析不應該被調用，但歸檔流程應該繼續
     mock_drive_service_optional.upload_file.return_value = "archived_id_parse_fail"
     mock_drive_service_optional.delete_file.return_value = True
-    mock_dal.get_report_by_id.return_value = {"status": "擷取錯誤(解析問題)"}
 
 
     result = await report_ingestion_service.ingest_single_drive_file(
@@ -540,8 +553,10 @@ async def test_ingest_single_drive_file_archive_upload_fails(
     )
     assert result is False
     mock_drive_service_optional.upload_file.assert_called_once()
-    # 驗證資料庫狀態是否被更新為歸檔上傳失敗
-    mock_dal.update_report_status.assert_called_with(report_db_id, "擷取錯誤(歸檔上傳失敗)")
+    # 驗證資料庫狀態是否被更新為歸檔上傳失敗 (分析結果一併寫入)
+    mock_dal.finalize_report.assert_called_once_with(
+        report_db_id, "擷取錯誤(歸檔上傳失敗)", orjson.dumps({"summary": "分析結果"}).decode('utf-8')
+    )
 
 
 @pytest.mark.asyncio
@@ -562,12 +577,11 @@ async def test_ingest_single_drive_file_archive_source_delete_fails(
     archived_drive_id = "archived_drive_id_102"
 
     mock_drive_service_optional.download_file.return_value = True
-    mock_parsing_service.extract_text_from_file.return_value = "有效內容"
+    # 內容無法解析時不進行 AI 分析，最終狀態由歸檔結果決定
+    mock_parsing_service.extract_text_from_file.return_value = "[.pdf 檔案內容解析功能待實現]"
     mock_dal.insert_report_data.return_value = report_db_id
-    mock_gemini_service.analyze_report.return_value = {"summary": "分析結果"}
     mock_drive_service_optional.upload_file.return_value = archived_drive_id # 歸檔上傳成功
     mock_drive_service_optional.delete_file.return_value = False # 模擬從原始位置刪除失敗
-    mock_dal.get_report_by_id.return_value = {"status": "內容已解析"}
 
 
     result = await report_ingestion_service.ingest_single_drive_file(
@@ -575,14 +589,88 @@ async def test_ingest_single_drive_file_archive_source_delete_fails(
     )
     assert result is True # 即使刪除失敗，整個操作可能仍視為成功，但狀態會不同
 
-    # 驗證 DAL 更新狀態和元數據
-    mock_dal.update_report_status.assert_any_call(report_db_id, "擷取部分成功(歸檔刪除失敗)")
-    mock_dal.update_report_metadata.assert_called_with(
-        report_db_id,
-        {"archived_drive_file_id": archived_drive_id, "archive_status": "delete_from_inbox_failed"}
+    # 驗證 DAL 以單次寫入更新狀態和元數據
+    mock_gemini_service.analyze_report.assert_not_called()
+    mock_dal.finalize_report.assert_called_once_with(
+        report_db_id, "擷取部分成功(歸檔刪除失敗)", None,
+        {"drive_file_id": file_id, "archived_drive_file_id": archived_drive_id, "archive_status": "delete_from_inbox_failed"}
     )
 
 
+@pytest.mark.asyncio
+async def test_ingest_single_drive_file_overlaps_analysis_and_archive_upload(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_dal: AsyncMock,
+    mock_parsing_service: MagicMock,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 ingest_single_drive_file：AI 分析與歸檔上傳同時進行 (分析只有在上傳開始後才會完成)。
+    """
+    mock_drive_service_optional.download_file.return_value = True
+    mock_parsing_service.extract_text_from_file.return_value = "有效內容"
+    mock_dal.insert_report_data.return_value = 103
+    mock_drive_service_optional.delete_file.return_value = True
+
+    upload_started = asyncio.Event()
+    async def mock_analyze(content):
+        await upload_started.wait()
+        return {"summary": "分析結果"}
+    async def mock_upload(local_file_path, folder_id, file_name):
+        upload_started.set()
+        return "archived_overlap_id"
+    mock_gemini_service.analyze_report.side_effect = mock_analyze
+    mock_drive_service_optional.upload_file.side_effect = mock_upload
+
+    result = await asyncio.wait_for(
+        report_ingestion_service.ingest_single_drive_file("overlap_id", "overlap.txt", "orig_folder_id", "proc_folder_id"), timeout=5
+    )
+
+    assert result is True
+    mock_dal.finalize_report.assert_called_once_with(
+        103, "分析完成", orjson.dumps({"summary": "分析結果"}).decode('utf-8'),
+        {"drive_file_id": "overlap_id", "archived_drive_file_id": "archived_overlap_id", "archive_status": "deleted_from_inbox"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_ingest_single_drive_file_archive_upload_raises_keeps_analysis(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_dal: AsyncMock,
+    mock_parsing_service: MagicMock,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 ingest_single_drive_file：歸檔上傳拋出例外時，不取消仍在進行的 AI 分析，
+    而是等待其完成，並將分析結果與上傳失敗狀態一併寫入。
+    """
+    mock_drive_service_optional.download_file.return_value = True
+    mock_parsing_service.extract_text_from_file.return_value = "有效內容"
+    mock_dal.insert_report_data.return_value = 104
+
+    analysis_started, upload_failed = asyncio.Event(), asyncio.Event()
+    async def mock_analyze(content):
+        analysis_started.set()
+        await upload_failed.wait() # 分析在上傳失敗之後才完成
+        return {"摘要": "上傳失敗前的分析"}
+    async def mock_upload(local_file_path, folder_id, file_name):
+        await analysis_started.wait()
+        upload_failed.set()
+        raise Exception("模擬上傳連線中斷")
+    mock_gemini_service.analyze_report.side_effect = mock_analyze
+    mock_drive_service_optional.upload_file.side_effect = mock_upload
+
+    result = await report_ingestion_service.ingest_single_drive_file("cancel_id", "cancel.txt", "orig_folder_id", "proc_folder_id")
+
+    assert result is False
+    mock_dal.finalize_report.assert_called_once_with(
+        104, "擷取錯誤(歸檔上傳失敗)", orjson.dumps({"摘要": "上傳失敗前的分析"}).decode('utf-8')
+    )
+    mock_dal.update_report_status.assert_not_called()
+    mock_drive_service_optional.delete_file.assert_not_called()
+
 @pytest.mark.asyncio
 async def test_ingest_single_drive_file_general_exception_after_db_insert(
     report_ingestion_service: ReportIngestionService,
@@ -601,8 +689,8 @@ async def test_ingest_single_drive_file_general_exception_after_db_insert(
     mock_drive_service_optional.download_file.return_value = True
     mock_parsing_service.extract_text_from_file.return_value = "有效內容"
     mock_dal.insert_report_data.return_value = report_db_id
-    # 模擬 _analyze_and_store_report (或其內部的 Gemini 調用) 拋出異常
-    report_ingestion_service._analyze_and_store_report = AsyncMock(side_effect=Exception("模擬AI分析時的嚴重錯誤"))
+    # 模擬 _run_report_analysis (或其內部的 Gemini 調用) 拋出異常
+    report_ingestion_service._run_report_analysis = AsyncMock(side_effect=Exception("模擬AI分析時的嚴重錯誤"))
 
     result = await report_ingestion_service.ingest_single_drive_file(
         file_id, file_name, "orig", "proc"
@@ -643,7 +731,6 @@ async def test_ingest_single_drive_file_temp_file_cleanup(
     mock_gemini_service.analyze_report.return_value = {"summary": "分析成功"}
     mock_drive_service_optional.upload_file.return_value = "archived_id_201"
     mock_drive_service_optional.delete_file.return_value = True
-    mock_dal.get_report_by_id.return_value = {"status": "內容已解析"}
     mock_os_path_exists.return_value = True # 模擬檔案在 finally 檢查時存在
 
     await report_ingestion_service.ingest_single_drive_file(file_id, file_name, "orig", "proc")
@@ -670,6 +757,20 @@ async def test_ingest_single_drive_file_temp_file_cleanup(
     mock_os_remove.assert_called_once()
 
 
+def test_resolve_temp_download_dir(monkeypatch, tmp_path):
+    """
+    測試暫存目錄的選擇：設定 INGEST_TEMP_DIR 時使用該目錄 (tmpfs 須以此明確啟用)，否則為 backend/data/temp_downloads。
+    """
+    from backend.services import report_ingestion_service as ingestion_module
+
+    monkeypatch.setenv("INGEST_TEMP_DIR", str(tmp_path / "configured"))
+    assert ingestion_module._resolve_temp_download_dir() == str(tmp_path / "configured")
+
+    # 即使 /dev/shm 可寫入，未設定時也不會自動改用 tmpfs
+    monkeypatch.delenv("INGEST_TEMP_DIR")
+    assert ingestion_module._resolve_temp_download_dir() == os.path.join(ingestion_module.BACKEND_DIR, "data", "temp_downloads")
+
+
 # --- ingest_reports_from_drive_folder 測試 ---
 
 @pytest.mark.asyncio
@@ -719,32 +820,84 @@ async def test_ingest_reports_from_drive_folder_partial_success(
     report_ingestion_service: ReportIngestionService,
     mock_drive_service_optional: AsyncMock,
     mock_dal: AsyncMock,
-    mocker # 用於 mock ingest_single_drive_file
+    mock_gemini_service: AsyncMock
 ):
     """
     測試 ingest_reports_from_drive_folder：部分檔案成功，部分檔案失敗。
+    整批報告以一次 batch_insert_reports 寫入，最終狀態以一次 batch_update_report_status 提交。
     """
     mock_drive_service_optional.list_files.return_value = [
         {"id": "file1", "name": "report1.txt"},
-        {"id": "file2", "name": "report2.txt"}, # 這個會失敗
+        {"id": "file2", "name": "report2.txt"}, # 這個會下載失敗
         {"id": "file3", "name": "report3.txt"},
     ]
-    # 模擬 check_report_exists_by_source_path 總是返回 False (非重複)
-    mock_dal.check_report_exists_by_source_path.return_value = False
-
-    # mock ingest_single_drive_file 的行為
-    async def mock_ingest_single(file_id, file_name, orig_folder, proc_folder):
-        if file_id == "file2":
-            return False # 模擬 file2 處理失敗
-        return True # 其他成功
+    # 模擬沒有任何檔案已擷取過 (非重複)
+    mock_dal.filter_existing_source_paths.return_value = set()
 
-    mocker.patch.object(report_ingestion_service, 'ingest_single_drive_file', side_effect=mock_ingest_single)
+    async def mock_download(file_id, destination_path):
+        return file_id != "file2"
+    mock_drive_service_optional.download_file.side_effect = mock_download
+    mock_drive_service_optional.upload_file.return_value = "archived_id"
+    mock_drive_service_optional.delete_file.return_value = True
+    report_ids = {"drive_id:file1": 1, "drive_id:file2": 2, "drive_id:file3": 3}
+    mock_dal.batch_insert_reports.side_effect = lambda rows: [report_ids[row["source_path"]] for row in rows]
+    mock_gemini_service.analyze_report.return_value = {"摘要": "分析結果"}
 
     success, fail = await report_ingestion_service.ingest_reports_from_drive_folder("inbox", "processed")
 
     assert success == 2
     assert fail == 1
-    assert report_ingestion_service.ingest_single_drive_file.call_count == 3
+    mock_dal.insert_report_data.assert_not_called()
+    # 管線各階段完成的先後不固定，彙整所有批次寫入後再比對
+    inserted = {row["source_path"]: row for call in mock_dal.batch_insert_reports.call_args_list for row in call[0][0]}
+    assert set(inserted) == set(report_ids)
+    assert inserted["drive_id:file2"]["status"] == "擷取錯誤(下載失敗)"
+    assert inserted["drive_id:file1"]["status"] == "內容已解析"
+
+    updates = {update["report_id"]: update for call in mock_dal.batch_update_report_status.call_args_list for update in call[0][0]}
+    assert set(updates) == {1, 3}
+    # AI 分析結果不單獨寫入，與最終狀態及歸檔 metadata 一併批次提交
+    mock_dal.update_report_analysis.assert_not_called()
+    assert all(update["status"] == "分析完成" for update in updates.values())
+    assert updates[1]["analysis_json"] == orjson.dumps({"摘要": "分析結果"}).decode('utf-8')
+    assert updates[1]["metadata"] == {"drive_file_id": "file1", "archived_drive_file_id": "archived_id", "archive_status": "deleted_from_inbox"}
+
+
+@pytest.mark.asyncio
+async def test_ingest_reports_from_drive_folder_batch_update_raises(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_dal: AsyncMock,
+    mock_gemini_service: AsyncMock,
+    monkeypatch
+):
+    """
+    測試 ingest_reports_from_drive_folder：提交最終狀態的 batch_update_report_status 拋出例外時 (例如 database is locked)，
+    只有該批項目計為失敗，其他階段不被取消，其餘批次照常提交並計為成功。
+    """
+    monkeypatch.setattr("backend.services.report_ingestion_service.INGEST_BATCH_SIZE", 1) # 每筆各自成批，結果不受抵達時間影響
+    file_count = 5
+    mock_drive_service_optional.list_files.return_value = [{"id": f"f{i}", "name": f"r{i}.txt"} for i in range(1, file_count + 1)]
+    mock_dal.filter_existing_source_paths.return_value = set()
+    mock_drive_service_optional.download_file.return_value = True
+    mock_drive_service_optional.upload_file.return_value = "archived_id"
+    mock_drive_service_optional.delete_file.return_value = True
+    mock_dal.batch_insert_reports.side_effect = lambda rows: [int(row["source_path"].removeprefix("drive_id:f")) for row in rows]
+    mock_gemini_service.analyze_report.return_value = {"摘要": "分析結果"}
+
+    def batch_update(updates):
+        if any(update["report_id"] == 1 for update in updates):
+            raise Exception("database is locked")
+        return len(updates)
+    mock_dal.batch_update_report_status.side_effect = batch_update
+
+    success, fail = await report_ingestion_service.ingest_reports_from_drive_folder("inbox", "processed")
+
+    assert (success, fail) == (file_count - 1, 1) # 只有寫入失敗的報告 1 計為失敗
+    assert mock_dal.batch_update_report_status.call_count == file_count
+    # 其他階段未被取消：每個檔案都完成分析與歸檔
+    assert mock_gemini_service.analyze_report.await_count == file_count
+    assert mock_drive_service_optional.delete_file.await_count == file_count
 
 
 @pytest.mark.asyncio
@@ -752,7 +905,7 @@ async def test_ingest_reports_from_drive_folder_skips_existing(
     report_ingestion_service: ReportIngestionService,
     mock_drive_service_optional: AsyncMock,
     mock_dal: AsyncMock,
-    mocker
+    mock_parsing_service: MagicMock
 ):
     """
     測試 ingest_reports_from_drive_folder：跳過資料庫中已存在的報告。
@@ -762,26 +915,207 @@ async def test_ingest_reports_from_drive_folder_skips_existing(
         {"id": "file2_new", "name": "new_report.txt"},
     ]
 
-    async def mock_check_exists(source_path):
-        if source_path == "drive_id:file1_exist":
-            return True # 模擬 file1 已存在
-        return False
-    mock_dal.check_report_exists_by_source_path.side_effect = mock_check_exists
+    mock_dal.filter_existing_source_paths.return_value = {"drive_id:file1_exist"} # 模擬 file1 已存在
 
-    mock_ingest_single = mocker.patch.object(report_ingestion_service, 'ingest_single_drive_file', new_callable=AsyncMock)
-    mock_ingest_single.return_value = True # 假設新檔案處理成功
+    mock_drive_service_optional.download_file.return_value = True
+    mock_drive_service_optional.upload_file.return_value = "archived_id"
+    mock_drive_service_optional.delete_file.return_value = True
+    mock_parsing_service.extract_text_from_file.return_value = "[不支援的檔案類型: .txt]" # 解析問題：不進行 AI 分析但仍歸檔
+    mock_dal.batch_insert_reports.return_value = [7]
 
     success, fail = await report_ingestion_service.ingest_reports_from_drive_folder("inbox", "processed")
 
     assert success == 1 # 只有 new_report.txt 被處理
     assert fail == 0
-    mock_dal.check_report_exists_by_source_path.assert_any_call("drive_id:file1_exist")
-    mock_dal.check_report_exists_by_source_path.assert_any_call("drive_id:file2_new")
-    # ingest_single_drive_file 只應為 file2_new 被調用
-    report_ingestion_service.ingest_single_drive_file.assert_called_once_with(
-        "file2_new", "new_report.txt", "inbox", "processed"
+    # 以單次查詢取代逐檔檢查
+    mock_dal.filter_existing_source_paths.assert_called_once_with(["drive_id:file1_exist", "drive_id:file2_new"])
+    mock_dal.check_report_exists_by_source_path.assert_not_called()
+    # 只應下載 file2_new
+    mock_drive_service_optional.download_file.assert_called_once()
+    assert mock_drive_service_optional.download_file.call_args[0][0] == "file2_new"
+    updates = mock_dal.batch_update_report_status.call_args[0][0]
+    assert updates[0]["report_id"] == 7
+    assert updates[0]["status"] == "已歸檔至Drive"
+
+
+@pytest.mark.asyncio
+async def test_ingest_reports_from_drive_folder_reuses_analysis_for_duplicate_content(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_dal: AsyncMock,
+    mock_parsing_service: MagicMock,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 ingest_reports_from_drive_folder：來源路徑不同但內容與已分析完成之報告相同時 (例如 Drive 中被重新命名的檔案)，
+    沿用既有分析結果而不呼叫 Gemini，仍照常寫入資料庫並歸檔。
+    """
+    content = "重新命名後的相同內容"
+    content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=32).hexdigest()
+    existing_analysis = orjson.dumps({"摘要": "先前的分析結果"}).decode('utf-8')
+    mock_drive_service_optional.list_files.return_value = [{"id": "renamed", "name": "renamed.txt"}]
+    mock_dal.filter_existing_source_paths.return_value = set()
+    mock_drive_service_optional.download_file.return_value = True
+    mock_drive_service_optional.upload_file.return_value = "archived_id"
+    mock_drive_service_optional.delete_file.return_value = True
+    mock_parsing_service.extract_text_from_file.return_value = content
+    mock_dal.batch_insert_reports.return_value = [8]
+    mock_dal.get_analyses_by_content_hash.return_value = {content_hash: existing_analysis}
+
+    success, fail = await report_ingestion_service.ingest_reports_from_drive_folder("inbox", "processed")
+
+    assert (success, fail) == (1, 0)
+    assert mock_dal.batch_insert_reports.call_args[0][0][0]["content_hash"] == content_hash
+    mock_dal.get_analyses_by_content_hash.assert_called_once_with([content_hash])
+    mock_gemini_service.analyze_report.assert_not_called()
+    mock_drive_service_optional.upload_file.assert_called_once()
+    update = mock_dal.batch_update_report_status.call_args[0][0][0]
+    assert update["report_id"] == 8
+    assert update["status"] == "分析完成"
+    assert update["analysis_json"] == existing_analysis
+
+
+@pytest.mark.asyncio
+async def test_ingest_reports_from_drive_folder_runs_files_concurrently(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_dal: AsyncMock,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 ingest_reports_from_drive_folder：同一批檔案並行下載，且同時進行的數量不超過信號量的上限。
+    """
+    file_count = 6
+    mock_drive_service_optional.list_files.return_value = [{"id": f"file{i}", "name": f"report{i}.txt"} for i in range(file_count)]
+    mock_dal.filter_existing_source_paths.return_value = set()
+    mock_dal.batch_insert_reports.return_value = list(range(1, file_count + 1))
+    mock_drive_service_optional.upload_file.return_value = "archived_id"
+    mock_drive_service_optional.delete_file.return_value = True
+    mock_gemini_service.analyze_report.return_value = {"摘要": "分析結果"}
+    report_ingestion_service._ingest_sem = asyncio.Semaphore(3)
+
+    in_flight = 0
+    max_in_flight = 0
+    async def mock_download(file_id, destination_path):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return True
+    mock_drive_service_optional.download_file.side_effect = mock_download
+
+    success, fail = await report_ingestion_service.ingest_reports_from_drive_folder("inbox", "processed")
+
+    assert (success, fail) == (file_count, 0)
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_ingest_reports_from_drive_folder_pipeline_overlaps_stages(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_dal: AsyncMock,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 ingest_reports_from_drive_folder：分段管線讓先完成下載的檔案進入 AI 分析時，其他檔案仍在下載。
+    """
+    mock_drive_service_optional.list_files.return_value = [{"id": "fast", "name": "fast.txt"}, {"id": "slow", "name": "slow.txt"}]
+    mock_dal.filter_existing_source_paths.return_value = set()
+    mock_dal.batch_insert_reports.side_effect = lambda rows: [1 if row["source_path"] == "drive_id:fast" else 2 for row in rows]
+    mock_drive_service_optional.upload_file.return_value = "archived_id"
+    mock_drive_service_optional.delete_file.return_value = True
+
+    slow_download_released = asyncio.Event()
+    async def mock_download(file_id, destination_path):
+        if file_id == "slow":
+            await slow_download_released.wait()
+        return True
+    mock_drive_service_optional.download_file.side_effect = mock_download
+
+    async def mock_analyze(content):
+        slow_download_released.set() # 只有在 "slow" 仍在下載時分析 "fast"，才能解除其阻塞
+        return {"摘要": "分析結果"}
+    mock_gemini_service.analyze_report.side_effect = mock_analyze
+
+    success, fail = await asyncio.wait_for(
+        report_ingestion_service.ingest_reports_from_drive_folder("inbox", "processed"), timeout=5
     )
 
+    assert (success, fail) == (2, 0)
+    assert mock_dal.batch_insert_reports.call_count == 2 # 兩個檔案在不同時間抵達寫入階段
+
+
+
+@pytest.mark.asyncio
+async def test_analyze_and_archive_drive_report_releases_content_before_upload(
+    report_ingestion_service: ReportIngestionService,
+    mock_drive_service_optional: AsyncMock,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 _analyze_and_archive_drive_report：AI 分析完成後即自 entry 移除報告內容，歸檔上傳期間不再持有。
+    """
+    entry = {
+        "file_id": "big", "file_name": "big.txt", "local_path": "/tmp/drive_big_big.txt",
+        "content": "大型報告內容", "status": "內容已解析", "metadata": {"drive_file_id": "big"},
+    }
+    mock_gemini_service.analyze_report.return_value = {"摘要": "分析結果"}
+    async def mock_upload(local_file_path, folder_id, file_name):
+        assert "content" not in entry
+        return "archived_big"
+    mock_drive_service_optional.upload_file.side_effect = mock_upload
+    mock_drive_service_optional.delete_file.return_value = True
+
+    archived, update = await report_ingestion_service._analyze_and_archive_drive_report(entry, 7, "inbox", "processed")
+
+    assert archived is True
+    mock_gemini_service.analyze_report.assert_called_once_with("大型報告內容")
+    assert update["status"] == "分析完成"
+    assert update["metadata"] == {"drive_file_id": "big", "archived_drive_file_id": "archived_big", "archive_status": "deleted_from_inbox"}
+
+
+@pytest.mark.asyncio
+async def test_run_report_analysis_limits_concurrent_gemini_requests(
+    report_ingestion_service: ReportIngestionService,
+    mock_gemini_service: AsyncMock
+):
+    """
+    測試 _run_report_analysis：同時進行中的 Gemini 分析請求數不超過 `_gemini_sem` 的上限。
+    """
+    report_ingestion_service._gemini_sem = asyncio.Semaphore(2)
+    in_flight, max_in_flight = 0, 0
+    async def mock_analyze(content):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"摘要": content}
+    mock_gemini_service.analyze_report.side_effect = mock_analyze
+
+    results = await asyncio.gather(*[
+        report_ingestion_service._run_report_analysis(i, f"內容{i}", f"f{i}.txt") for i in range(6)
+    ])
+
+    assert all(status == "分析完成" for _, status in results)
+    assert max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_wait_for_gemini_slot_spaces_requests(report_ingestion_service: ReportIngestionService, monkeypatch):
+    """
+    測試 _wait_for_gemini_slot：設定 GEMINI_RPM 時，連續的請求依 60/RPM 秒的間隔排程。
+    """
+    monkeypatch.setattr("backend.services.report_ingestion_service.GEMINI_RPM", 1200) # 每 0.05 秒一個請求
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    await asyncio.gather(*[report_ingestion_service._wait_for_gemini_slot() for _ in range(3)])
+
+    assert loop.time() - start >= 0.1 - 0.01 # 第三個請求須等待兩個間隔
+    assert report_ingestion_service._gemini_next_slot >= start + 0.15 - 0.01
 
 # --- ingest_uploaded_file 測試 ---
 
@@ -815,7 +1149,7 @@ async def test_ingest_uploaded_file_success(
     assert kwargs_insert['source_path'] == f"upload:{file_name}"
     assert kwargs_insert['status'] == "內容已解析"
     mock_gemini_service.analyze_report.assert_called_once_with(report_content)
-    mock_dal.update_report_analysis.assert_called_once_with(db_id, json.dumps({"summary": "AI分析完成"}, ensure_ascii=False), "分析完成")
+    mock_dal.update_report_analysis.assert_called_once_with(db_id, orjson.dumps({"summary": "AI分析完成"}).decode('utf-8'), "分析完成")
 
 
 @pytest.mark.asyncio